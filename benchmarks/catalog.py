@@ -0,0 +1,43 @@
+import random
+
+SCHEMAS = ["public", "clinical", "billing", "staging", "reporting"]
+
+GENERIC_COLUMNS = ["id", "created_at", "updated_at", "status", "name", "description", "amount", "code", "type",
+                   "notes", "external_ref", "owner_id", "version", "is_active", "category", "quantity", "unit",
+                   "started_on", "ended_on", "comment"]
+
+SENSITIVE_COLUMNS = ["patient_id", "patient_name", "ssn", "dob", "home_address", "email_address", "phone_number",
+                     "medical_condition", "lab_result", "insurance_information", "patient_address",
+                     "healthcare_provider", "payment_information"]
+
+PRIVILEGES = ["SELECT", "INSERT", "UPDATE", "DELETE", "REFERENCES"]
+
+
+class SyntheticCatalog:
+    # A reproducible catalog of tables, columns, roles and grants of any size. Tables
+    # share their column names unless distinct_columns, which names every column apart.
+    def __init__(self, tables=1000, columns_per_table=20, grants=10000, roles=100, sensitive_ratio=0.02,
+                 public_ratio=0.05, seed=0, distinct_columns=False):
+        rng = random.Random(seed)
+        self.tables = [(rng.choice(SCHEMAS), f"table_{i}") for i in range(tables)]
+        self.columns = []
+        for n, (schema, table) in enumerate(self.tables):
+            for i in range(columns_per_table):
+                if rng.random() < sensitive_ratio:
+                    column = rng.choice(SENSITIVE_COLUMNS)
+                else:
+                    column = GENERIC_COLUMNS[i % len(GENERIC_COLUMNS)]
+                column = f"{column}_{i}" if i >= len(GENERIC_COLUMNS) else column
+                self.columns.append((schema, table, f"{column}_{n}" if distinct_columns else column))
+        self.roles = [f"role_{i}" for i in range(roles)]
+        self.role_members = [(rng.choice(self.roles), role) for role in self.roles if rng.random() < 0.5]
+        self.grants = []
+        for _ in range(grants):
+            schema, table = rng.choice(self.tables)
+            grantee = "PUBLIC" if rng.random() < public_ratio else rng.choice(self.roles)
+            self.grants.append((grantee, rng.choice(PRIVILEGES), schema, table))
+
+    def describe(self):
+        return {"tables": len(self.tables), "columns": len(self.columns),
+                "distinct_columns": len({column for _, _, column in self.columns}), "roles": len(self.roles),
+                "grants": len(self.grants)}
@@ -0,0 +1,170 @@
+import importlib.util
+import re
+import sys
+import time
+import types
+
+from src.connectors.findings import Grant
+from src.connectors.grant_summary import GrantSummary
+
+# Stand-in for a DB-API connection that answers the connectors' catalog queries
+# from a SyntheticCatalog. It does not parse SQL; it recognises each query by the
+# catalog view it reads and answers in the canonical row shapes the connectors
+# turn into Finding and Grant records.
+
+_PAGE_LIMIT = re.compile(r"fetch next (\d+) rows only|limit (\d+)")
+
+_TABLE_FILTER = re.compile(r"(?:table_name|TABNAME|relname)\s+IN\s+\(([^)]*)\)", re.I)
+
+# Views the connectors pull the column catalog from
+_COLUMN_CATALOGS = ["attname", "information_schema.columns", "syscat.columns", "all_tab_columns"]
+
+# Views the connectors pull the role graph from: memberships, then the read grants
+_ROLE_MEMBERSHIPS = ["pg_auth_members", "role_edges", "database_role_members", "syscat.roleauth", "dba_role_privs"]
+_READ_GRANTS = ["aclexplode", "table_privileges", "db_datareader", "syscat.dbauth", "dba_sys_privs"]
+
+# Configuration probes, recognised by a view only that dialect's probe reads: (columns, rows)
+_CONFIG_PROBES = [
+    ("pg_extension", (["log_statement", "pgcrypto", "pg_stat_activity"], [("all", True, True)])),
+    ("have_ssl", (["audit_log_enabled", "have_ssl", "activity_monitoring"], [(1, "YES", 1)])),
+    ("server_audits", (["enabled_audits", "encrypted_databases", "activity_monitoring_enabled"], [(1, 1, 1)])),
+    ("auditpolicies", (["AUDIT_POLICIES", "ACTIVITY_TABLES"], [(1, 1)])),
+    ("admin_get_encryption_info", (["ENCRYPTED_OBJECTS"], [(1,)])),
+    ("v$parameter", (["NAME", "VALUE"], [("audit_trail", "DB"), ("encrypt_new_tablespaces", "ALWAYS"),
+                                        ("statistics_level", "TYPICAL"),
+                                        ("control_management_pack_access", "DIAGNOSTIC+TUNING")])),
+]
+
+# The driver modules the connector modules import. The checks only talk to the
+# connection they are given, so without a driver an empty module lets the
+# connector load and run against a FakeConnection.
+DRIVER_MODULES = ["psycopg2", "mysql", "mysql.connector", "pyodbc", "ibm_db", "ibm_db_dbi", "cx_Oracle"]
+
+
+def install_driver_stubs():
+    # Returns the names of the drivers that are stand-ins rather than the real packages
+    stubs = []
+    for name in DRIVER_MODULES:
+        if name in sys.modules:
+            continue
+        parent = name.rpartition(".")[0]
+        if parent not in stubs and importlib.util.find_spec(name) is not None:
+            continue
+        module = sys.modules[name] = types.ModuleType(name)
+        if parent:
+            setattr(sys.modules[parent], name.rpartition(".")[2], module)
+        stubs.append(name)
+    return stubs
+
+
+class QueryStats:
+    def __init__(self):
+        self.round_trips = 0
+        self.rows = 0
+        self.bytes = 0
+
+    def as_dict(self):
+        return {"round_trips": self.round_trips, "rows": self.rows, "bytes": self.bytes}
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self.arraysize = 1
+        self.itersize = 2000
+        self.description = None
+        self._rows = []
+
+    def _round_trip(self, rows=()):
+        stats = self.connection.stats
+        stats.round_trips += 1
+        stats.rows += len(rows)
+        stats.bytes += sum(len(str(value)) for row in rows for value in row)
+        if self.connection.latency:
+            time.sleep(self.connection.latency)
+
+    def execute(self, query, *params):
+        self._round_trip()
+        columns, self._rows = self.connection.answer(query)
+        self.description = [(column,) for column in columns] if columns else None
+
+    def fetchall(self):
+        rows, self._rows = self._rows, []
+        self._round_trip(rows)
+        return rows
+
+    def fetchmany(self, size=None):
+        size = size or self.arraysize
+        rows, self._rows = self._rows[:size], self._rows[size:]
+        self._round_trip(rows)
+        return rows
+
+    def fetchone(self):
+        rows = self.fetchmany(1)
+        return rows[0] if rows else None
+
+    def close(self):
+        self._rows = []
+
+
+class FakeConnection:
+    def __init__(self, catalog, latency=0.0):
+        self.catalog = catalog
+        self.latency = latency
+        self.stats = QueryStats()
+
+    def cursor(self, name=None):
+        return FakeCursor(self)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+    def answer(self, query):
+        # Returns (column names or None, rows)
+        lowered = query.lower()
+        if any(catalog in lowered for catalog in _COLUMN_CATALOGS):
+            return None, self._columns(query)
+        for keyword, probe in _CONFIG_PROBES:
+            if keyword in lowered:
+                return probe
+        if "risk_score" in lowered or "group by grantee" in lowered:
+            return None, self._grant_summary(lowered)
+        if any(view in lowered for view in _ROLE_MEMBERSHIPS):
+            return None, list(self.catalog.role_members)
+        if any(view in lowered for view in _READ_GRANTS):
+            return None, [grant for grant in self.catalog.grants if grant[1] == "SELECT"]
+        if "database_permissions" in lowered:
+            return None, [grant + ("GRANT",) for grant in self._public_grants()]
+        if "tabauth" in lowered:
+            return None, [grant + ("U",) for grant in self.catalog.grants]
+        if "user_privileges" in lowered:
+            # MySQL global privileges are not tied to a table
+            return None, [grant[:2] for grant in self._public_grants()]
+        if "role_table_grants" in lowered or "dba_tab_privs" in lowered:
+            return None, self._public_grants()
+        return None, [(1,)]
+
+    def _grant_summary(self, lowered):
+        # Aggregated here, as the database would, so only the summary rows cross the wire
+        grants = self.catalog.grants if "tabauth" in lowered else self._public_grants()
+        if "risk_score" in lowered:
+            limit = next(int(group) for group in _PAGE_LIMIT.search(lowered).groups() if group)
+            return GrantSummary.from_grants((Grant(*grant) for grant in grants), limit).objects
+        summary = GrantSummary.from_grants(Grant(*grant) for grant in grants)
+        return [(field, value, count) for field, counter in summary.counts.items() for value, count in counter.items()]
+
+    def _public_grants(self):
+        return [grant for grant in self.catalog.grants if grant[0] == "PUBLIC"]
+
+    def _columns(self, query):
+        table_filter = _TABLE_FILTER.search(query)
+        if not table_filter:
+            return list(self.catalog.columns)
+        tables = set(re.findall(r"'([^']*)'", table_filter.group(1)))
+        return [column for column in self.catalog.columns if column[1] in tables]
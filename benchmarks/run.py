@@ -0,0 +1,134 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from functools import partial
+
+from src.connectors.check_runner import CHECKS, CONFIG_PROBE, STREAMING_CHECKS, RowSummary
+from src.connectors.connector_factory import get_connector_class, get_database_list
+from src.connectors.privileges import EXPOSURE_CHECK, check_role_exposure
+
+from .catalog import SyntheticCatalog
+from .fake_db import FakeConnection, install_driver_stubs
+
+RESULTS_DIRECTORY = os.path.join(os.path.dirname(__file__), "results")
+
+# check_access_controls in summary mode, measured next to the full grant list
+SUMMARY_CHECK = "summarize_access_controls"
+
+
+def run_check(db, check, catalog, latency, stream):
+    conn = FakeConnection(catalog, latency)
+    cursor = conn.cursor()
+    method = partial(check_role_exposure, db) if check == EXPOSURE_CHECK else getattr(db, check)
+    start = time.perf_counter()
+    if stream:
+        value = RowSummary(method(cursor, stream=True))
+    else:
+        value = method(cursor)
+    return time.perf_counter() - start, conn.stats, value
+
+
+def measure(db, check, catalog, latency, stream):
+    elapsed, stats, value = run_check(db, check, catalog, latency, stream)
+    # Peak memory is measured on a second run, as tracemalloc slows the first one down
+    tracemalloc.start()
+    run_check(db, check, catalog, 0, stream)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    result = {"wall_time": round(elapsed, 6), "peak_memory": peak}
+    result.update(stats.as_dict())
+    if check in STREAMING_CHECKS or check == EXPOSURE_CHECK:
+        result["findings"] = len(value)
+    return result
+
+
+def run_benchmarks(catalog, db_types=None, latency=0.0, stream=False):
+    results = {}
+    for db_type in db_types or get_database_list():
+        try:
+            db = get_connector_class(db_type)()
+        except RuntimeError as e:
+            # A connector registered by a plugin may need more than the known drivers
+            results[db_type] = {"skipped": str(e)}
+            continue
+        # The configuration probe is what a run executes in place of the three configuration checks
+        results[db_type] = {check: measure(db, check, catalog, latency, stream and check in STREAMING_CHECKS)
+                            for check in CHECKS + [CONFIG_PROBE, EXPOSURE_CHECK, SUMMARY_CHECK]}
+    return results
+
+
+def current_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(baseline_path, candidate_path, metrics=("wall_time", "round_trips", "rows", "peak_memory")):
+    with open(baseline_path) as f:
+        baseline = json.load(f)["results"]
+    with open(candidate_path) as f:
+        candidate = json.load(f)["results"]
+    print(f"{'database':12} {'check':28} {'metric':12} {'baseline':>14} {'candidate':>14} {'change':>8}")
+    for db_type, checks in candidate.items():
+        for check, result in checks.items():
+            before = baseline.get(db_type, {}).get(check)
+            if not isinstance(result, dict) or not isinstance(before, dict):
+                continue
+            for metric in metrics:
+                if metric not in result or metric not in before:
+                    continue
+                change = (result[metric] - before[metric]) / before[metric] * 100 if before[metric] else 0.0
+                print(f"{db_type:12} {check:28} {metric:12} {before[metric]:>14} {result[metric]:>14} {change:>7.1f}%")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run",
+                                     description="Benchmark the connector checks against a synthetic catalog.")
+    parser.add_argument("--tables", type=int, default=2000)
+    parser.add_argument("--columns", type=int, default=20, help="Columns per table")
+    parser.add_argument("--grants", type=int, default=50000)
+    parser.add_argument("--roles", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--distinct-columns", action="store_true",
+                        help="Name every column apart instead of repeating the names in each table")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Simulated network latency per round trip")
+    parser.add_argument("--stream", action="store_true", help="Use the streaming variants of the catalog checks")
+    parser.add_argument("--database", action="append", help="Only benchmark this database type (repeatable)")
+    parser.add_argument("--output", default=RESULTS_DIRECTORY, help="Directory to store the results in")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CANDIDATE"), help="Compare two stored results")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return 0
+
+    catalog = SyntheticCatalog(args.tables, args.columns, args.grants, args.roles, seed=args.seed,
+                               distinct_columns=args.distinct_columns)
+    commit = current_commit()
+    report = {
+        "commit": commit,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "catalog": catalog.describe(),
+        "latency_ms": args.latency_ms,
+        "stream": args.stream,
+        "driver_stubs": install_driver_stubs(),
+        "results": run_benchmarks(catalog, args.database, args.latency_ms / 1000, args.stream),
+    }
+    os.makedirs(args.output, exist_ok=True)
+    path = os.path.join(args.output, f"{commit}{'-stream' if args.stream else ''}.json")
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+    json.dump(report["results"], sys.stdout, indent=2)
+    sys.stdout.write(f"\nResults written to {path}\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,16 @@
+import time
+
 import streamlit as st
 from connectors.connector_factory import get_database, get_database_list
+from connectors.check_runner import CHECKS, run_checks
+from connectors.connection_pool import get_pool, pool_key
+from connectors.grant_summary import SUMMARY_FIELDS, GrantSummary
+from connectors.report import (FINDING_COUNTS, GRANT_COUNTS, ReportTable, filter_frame, page_count, page_of,
+                               sort_frame)
+from connectors.privileges import EXPOSURE_CHECK, check_role_exposure
+from connectors.result_cache import result_cache
+from connectors.sampling import SAMPLE_CHECK, sample_for_sensitive_data
+from connectors.tracing import Tracer
 
 st.set_page_config(page_title="Dr DB HIPAA Compliance Check", layout="wide")
 
@@ -16,6 +27,125 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 
+def format_age(seconds):
+    if seconds < 60:
+        return f"{int(seconds)} seconds"
+    if seconds < 3600:
+        return f"{int(seconds // 60)} minutes"
+    return f"{int(seconds // 3600)} hours"
+
+
+CHECK_LABELS = {
+    "scan_for_sensitive_data": "Sensitive Data Scan",
+    "check_access_controls": "Access Controls Check",
+    "check_audit_trail": "Audit Trail Check",
+    "check_encryption": "Encryption Check",
+    "check_activity_monitoring": "Database Activity Monitoring Check",
+    SAMPLE_CHECK: "Content Sampling",
+    EXPOSURE_CHECK: "Role Exposure",
+}
+
+# The report grids need every row, not the capped preview the CLI keeps
+REPORT_CONSUMERS = {
+    "scan_for_sensitive_data": lambda rows: ReportTable(rows, FINDING_COUNTS),
+    "check_access_controls": lambda rows: ReportTable(rows, GRANT_COUNTS),
+}
+
+PAGE_SIZES = [50, 100, 500, 1000]
+
+DEFAULT_CHECK_TIMEOUT = 60
+DEFAULT_RUN_TIMEOUT = 300
+
+
+def show_verdict(placeholder, result):
+    label = CHECK_LABELS[result.check]
+    if result.status == "timeout":
+        placeholder.markdown(f"⏱️ {label} - Timed out: {result.error}")
+    elif result.status == "cancelled":
+        placeholder.markdown(f"⏹️ {label} - Cancelled")
+    elif result.failed:
+        placeholder.markdown(f"⚠️ {label} - Error: {result.error}")
+    elif result.passed:
+        placeholder.markdown(f"✅ {label} - Passed")
+    else:
+        placeholder.markdown(f"❌ {label} - Failed")
+
+
+def show_grid(name, table, counted=()):
+    # One dataframe per report table; only the current page is sent to the browser
+    frame = table.frame()
+    filters = st.columns(1 + len(counted))
+    text = filters[0].text_input("Filter", key=f"{name}_filter")
+    selected = {}
+    for column, field in zip(filters[1:], counted):
+        selected[field] = column.multiselect(field.capitalize(), list(table.counts[field]), key=f"{name}_{field}")
+    frame = filter_frame(frame, text, selected)
+
+    controls = st.columns(4)
+    sort_column = controls[0].selectbox("Sort by", [None] + list(frame.columns), key=f"{name}_sort")
+    ascending = controls[1].selectbox("Order", ["Ascending", "Descending"], key=f"{name}_order") == "Ascending"
+    page_size = controls[2].selectbox("Rows per page", PAGE_SIZES, key=f"{name}_page_size")
+    pages = page_count(len(frame), page_size)
+    page = controls[3].number_input(f"Page (of {pages})", min_value=1, key=f"{name}_page")
+    frame = sort_frame(frame, sort_column, ascending)
+
+    st.dataframe(page_of(frame, min(page, pages), page_size), use_container_width=True, hide_index=True)
+    st.caption(f"{len(frame)} of {len(table)} rows")
+
+
+def show_grant_details(summary, details):
+    # A summary holds counts only; the grants behind them are fetched a page at a time on request
+    st.markdown("**Riskiest objects**")
+    st.dataframe(summary.as_dict()["top_objects"], use_container_width=True, hide_index=True)
+    controls = st.columns(len(SUMMARY_FIELDS) + 2)
+    selected = {}
+    for column, field in zip(controls, SUMMARY_FIELDS):
+        selected[field] = column.selectbox(field.capitalize(), [None] + [value for value, _ in summary.ranked(field)],
+                                           key=f"grants_{field}")
+    page_size = controls[-2].selectbox("Rows per page", PAGE_SIZES, key="grants_page_size")
+    page = controls[-1].number_input("Page", min_value=1, key="grants_page")
+    if st.checkbox("Load the matching grants", key="grants_load"):
+        filters = {field: value for field, value in selected.items() if value is not None}
+        grants = details(limit=page_size, offset=(page - 1) * page_size, **filters)
+        st.dataframe([grant.as_dict() for grant in grants], use_container_width=True, hide_index=True)
+
+
+def show_report(results, timings, details):
+    for check in ("scan_for_sensitive_data", "check_access_controls"):
+        table = results[check].value
+        if table is None or len(table) == 0:
+            continue
+        st.subheader(CHECK_LABELS[check])
+        counted = list(table.counts)
+        summaries = st.columns(len(counted))
+        for column, field in zip(summaries, counted):
+            column.markdown(f"**{len(table.counts[field])} distinct {field} values**")
+            column.dataframe(table.summary(field), use_container_width=True, hide_index=True, height=200)
+        if isinstance(table, GrantSummary):
+            show_grant_details(table, details)
+        else:
+            show_grid(check, table, counted)
+
+    if SAMPLE_CHECK in results and results[SAMPLE_CHECK].value:
+        st.subheader(CHECK_LABELS[SAMPLE_CHECK])
+        show_grid(SAMPLE_CHECK, ReportTable(results[SAMPLE_CHECK].value), ())
+
+    if EXPOSURE_CHECK in results and results[EXPOSURE_CHECK].value:
+        st.subheader(CHECK_LABELS[EXPOSURE_CHECK])
+        show_grid(EXPOSURE_CHECK, ReportTable(results[EXPOSURE_CHECK].value, GRANT_COUNTS), GRANT_COUNTS)
+
+    with st.expander("Query timing breakdown"):
+        st.table([{key: value for key, value in row.items() if key != "target"} for row in timings])
+
+    # If all checks pass, display success message
+    if all(result.passed for result in results.values()):
+        st.success(
+            "The database meets HIPAA compliance requirements.")
+    else:
+        st.error(
+            "The database does not meet HIPAA compliance requirements.")
+
+
 def main():
     st.image("logo.png", width=200)
     st.title("HIPAA Compliance Diagnoser")
@@ -26,7 +156,11 @@ def main():
     st.markdown(f"## Compliance Checks")
     st.write("The following checks are going to be performed.")
 
-    db = get_database(db_type)
+    try:
+        db = get_database(db_type)
+    except RuntimeError as e:
+        st.error(str(e))
+        return
     descriptions = db.get_description()
     for check, description in descriptions.items():
         st.markdown(f"#### {check}")
@@ -42,96 +176,101 @@ def main():
     database = st.text_input("Database name:")
     username = st.text_input("Username:")
     password = st.text_input("Password:", type="password")
+    sample_contents = st.checkbox(
+        "Sample table contents for PHI in innocuously named columns (reads a bounded number of rows)")
+    role_exposure = st.checkbox("List every user and role that can read tables with sensitive columns, through nested roles")
+    grant_summary = st.checkbox("Summarize grants in the database instead of loading them all (for very large grant lists)")
+    force_refresh = st.checkbox("Force refresh (ignore cached results)")
+    timeouts = st.columns(2)
+    check_timeout = timeouts[0].number_input("Time limit per check (seconds)", min_value=1, value=DEFAULT_CHECK_TIMEOUT)
+    run_timeout = timeouts[1].number_input("Time limit for all checks (seconds)", min_value=1, value=DEFAULT_RUN_TIMEOUT)
+
+    if st.session_state.pop("scan_cancelled", False):
+        st.warning("The scan was cancelled and its running queries were interrupted.")
+
+    checks = list(CHECKS)
+    overrides = {}
+    if sample_contents:
+        checks.append(SAMPLE_CHECK)
+        overrides[SAMPLE_CHECK] = lambda cursor: sample_for_sensitive_data(db, cursor)
+    if role_exposure:
+        checks.append(EXPOSURE_CHECK)
+        overrides[EXPOSURE_CHECK] = lambda cursor: check_role_exposure(db, cursor)
+    consumers = REPORT_CONSUMERS
+    if grant_summary:
+        overrides["check_access_controls"] = db.summarize_access_controls
+        consumers = {check: consumer for check, consumer in consumers.items() if check != "check_access_controls"}
+    report_key = pool_key(db, host, port, database, username, password) + tuple(checks) + (grant_summary,)
+
+    def grant_details(**filters):
+        with get_pool(db, host, port, database, username, password).connection() as conn:
+            cursor = conn.cursor()
+            try:
+                return db.access_control_details(cursor, **filters)
+            finally:
+                cursor.close()
 
     if st.button("Check Compliance"):
         try:
-            conn = None
+            # Connections are pooled per target, so reruns and repeated scans reuse warm sessions
+            pool = get_pool(db, host, port, database, username, password)
             with st.spinner("Connecting to the database..."):
-                conn = db.connect(host, port, database, username, password)
-                st.success("Connection successful! Generating report....")
-            if conn:
-                cursor = conn.cursor()
-
-                # Perform compliance checks
-                sensitive_data = None
-                try:
-                    sensitive_data = db.scan_for_sensitive_data(cursor)
-                except Exception as e:
-                    st.error(str(e))
-
-                access_controls = None
-                try:
-                    access_controls = db.check_access_controls(cursor)
-                except Exception as e:
-                    st.error(str(e))
-
-                audit_trail = None
-                try:
-                    audit_trail = db.check_audit_trail(cursor)
-                except Exception as e:
-                    st.error(str(e))
-
-                encryption = None
-                try:
-                    encryption = db.check_encryption(cursor)
-                except Exception as e:
-                    st.error(str(e))
-
-                activity_monitoring = None
-                try:
-                    activity_monitoring = db.check_activity_monitoring(cursor)
-                except Exception as e:
-                    st.error(str(e))
-
-                st.markdown(f"---")
-                # Generate compliance report
-                st.header("HIPAA Compliance Report")
-                sensitive_data_status = len(sensitive_data) == 0
-                access_controls_status = len(access_controls) == 0
-
-                if sensitive_data_status:
-                    st.markdown("✅ Sensitive Data Scan - Passed")
-                else:
-                    st.markdown("❌ Sensitive Data Scan - Failed")
-                if len(sensitive_data) > 0:
-                    for row in sensitive_data:
-                        st.write(f"Table: {row[0]}, Column: {row[1]}")
-
-                if access_controls_status:
-                    st.markdown("✅ Access Controls Check - Passed")
-                else:
-                    st.markdown("❌ Access Controls Check - Failed")
-                if len(access_controls) > 0:
-                    for row in access_controls:
-                        if db_type == "PostgreSQL":
-                            st.write(f"Grantee: {row[0]}, Privilege: {row[1]}")
-                        else:
-                            st.write(row)
-
-                if audit_trail:
-                    st.markdown("✅ Audit Trail Check - Passed")
-                else:
-                    st.markdown("❌ Audit Trail Check - Failed")
-
-                encryption_status_icon = "✅" if encryption else "❌"
-                st.markdown(
-                    f"{encryption_status_icon} Encryption Check - {'Passed' if encryption else 'Failed'}")
-
-                activity_monitoring_status_icon = "✅" if activity_monitoring else "❌"
-                st.markdown(
-                    f"{activity_monitoring_status_icon} Database Activity Monitoring Check - {'Passed' if activity_monitoring else 'Failed'}")
-
-                # If all checks pass, display success message
-                if sensitive_data_status and access_controls_status and audit_trail and encryption and activity_monitoring:
-                    st.success(
-                        "The database meets HIPAA compliance requirements.")
-                else:
-                    st.error(
-                        "The database does not meet HIPAA compliance requirements.")
-
-                conn.close()
+                with pool.connection():
+                    st.success("Connection successful! Generating report....")
+
+            st.markdown(f"---")
+            st.header("HIPAA Compliance Report")
+            # Verdicts appear as each check finishes
+            verdicts = {check: st.empty() for check in checks}
+            for check, placeholder in verdicts.items():
+                placeholder.markdown(f"⏳ {CHECK_LABELS[check]} - Running")
+            # Pressing Cancel reruns the script, which stops it at its next Streamlit call. The
+            # progress line below makes one every poll, and run_checks then interrupts the queries.
+            st.button("Cancel", on_click=lambda: st.session_state.update(scan_cancelled=True))
+            progress = st.empty()
+            started = time.monotonic()
+
+            def show_progress():
+                progress.caption(f"Running for {time.monotonic() - started:.0f} seconds")
+
+            def scan():
+                tracer = Tracer()
+                results = run_checks(db, checks=checks, pool=pool, overrides=overrides, stream=True,
+                                     consumers=consumers, tracer=tracer, target=host,
+                                     on_result=lambda result: show_verdict(verdicts[result.check], result),
+                                     check_timeout=check_timeout, run_timeout=run_timeout,
+                                     on_wait=show_progress)
+                return results, tracer.breakdown()
+
+            # Perform compliance checks concurrently, each on its own connection. Results are
+            # shared between sessions, and identical scans already running are joined.
+            cached = result_cache.get_or_compute(
+                report_key,
+                scan,
+                refresh=force_refresh,
+                cacheable=lambda value: not any(result.failed for result in value[0].values()))
+            results, timings = cached.value
+            progress.empty()
+            for check, placeholder in verdicts.items():
+                show_verdict(placeholder, results[check])
+            if cached.hit:
+                st.info(f"Showing cached results from {format_age(cached.age)} ago. "
+                        "Select 'Force refresh' to scan again.")
+            # Kept in the session so paging and filtering the grids does not scan again
+            st.session_state["report"] = (report_key, results, timings)
         except Exception as e:
             st.error(str(e))
+            return
+    elif st.session_state.get("report", (None,))[0] == report_key:
+        _, results, timings = st.session_state["report"]
+        st.markdown(f"---")
+        st.header("HIPAA Compliance Report")
+        for check in checks:
+            show_verdict(st.empty(), results[check])
+    else:
+        return
+
+    show_report(results, timings, grant_details)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,264 @@
+import argparse
+import json
+import signal
+import sys
+import threading
+
+from .connectors import fleet, monitor
+from .connectors.connection_pool import close_pools
+from .connectors.grant_summary import DETAIL_ROWS
+from .connectors.history import DEFAULT_HISTORY_PATH, History
+
+EXIT_PASSED = 0
+EXIT_FAILED = 1
+EXIT_ERROR = 2
+
+STATUS_LABELS = {"passed": "PASS", "failed": "FAIL", "error": "ERROR", "timeout": "TIMEOUT", "cancelled": "CANCEL"}
+
+
+def print_text(report):
+    print(f"{report['name']}: {report['status'].upper()}")
+    if report["error"]:
+        print(f"  error: {report['error']}")
+    for database in report.get("databases", []):
+        print_text(database)
+    for check, result in report["checks"].items():
+        status = STATUS_LABELS[result["status"]]
+        print(f"  {status:7} {check} ({result['elapsed']}s)")
+        if result["error"]:
+            print(f"          {result['error']}")
+
+
+def exit_code(statuses):
+    if any(status in ("error", "timeout") for status in statuses):
+        return EXIT_ERROR
+    if any(status == "failed" for status in statuses):
+        return EXIT_FAILED
+    return EXIT_PASSED
+
+
+def target_from_args(args):
+    target = {
+        "type": args.type,
+        "host": args.host,
+        "port": args.port,
+        "database": args.database,
+        "username": args.username,
+        "credential": args.credential,
+    }
+    target["name"] = args.name or f"{args.type}://{args.host}:{args.port}/{args.database}"
+    return target
+
+
+def scan(args, target=None):
+    if target is None:
+        target = target_from_args(args)
+        target["instance"] = args.instance
+    tracer = fleet.start_tracing(args)
+    options = fleet.scan_options(args, tracer)
+    try:
+        report = fleet.scan_any(target, args.timeout, **options)
+    finally:
+        fleet.close_exports(options)
+    if args.trace:
+        tracer.write_json(args.trace)
+    if args.format == "text":
+        print_text(report)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    return exit_code([report["status"]])
+
+
+def scan_fleet(args):
+    tracer = fleet.start_tracing(args)
+    options = fleet.scan_options(args, tracer)
+    try:
+        reports = fleet.scan_fleet(fleet.load_inventory(args.inventory, args.instance), args.threads, args.processes,
+                                   args.timeout, args.async_concurrency, **options)
+    finally:
+        fleet.close_exports(options)
+    fleet.write_results(reports, args.output)
+    if args.trace:
+        tracer.write_json(args.trace)
+    return exit_code([report["status"] for report in reports])
+
+
+def monitor_fleet(args):
+    tracer = fleet.start_tracing(args)
+    options = fleet.scan_options(args, tracer)
+    events = sys.stdout if args.events == "-" else open(args.events, "a")
+    lock = threading.Lock()
+
+    def write_event(event):
+        # One JSON object per line, flushed so a tailing SIEM forwarder sees it at once
+        with lock:
+            events.write(json.dumps(event) + "\n")
+            events.flush()
+
+    daemon = monitor.Monitor(fleet.load_inventory(args.inventory, args.instance), args.interval, args.min_interval,
+                             args.max_interval, args.concurrency, args.jitter, args.timeout, on_event=write_event,
+                             **options)
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: daemon.stop())
+    try:
+        daemon.run()
+    finally:
+        fleet.close_exports(options)
+        if events is not sys.stdout:
+            events.close()
+    if args.trace:
+        tracer.write_json(args.trace)
+    return EXIT_PASSED
+
+
+def capture_snapshot(args):
+    meta = fleet.capture_target(target_from_args(args), args.output)
+    json.dump(dict(meta, path=args.output), sys.stdout, indent=2, default=str)
+    sys.stdout.write("\n")
+    return EXIT_PASSED
+
+
+def scan_snapshot(args):
+    target = {"type": "Snapshot", "host": None, "port": None, "database": args.snapshot,
+              "name": args.name or args.snapshot}
+    return scan(args, target)
+
+
+def list_grants(args):
+    filters = {field: getattr(args, field) for field in ("grantee", "privilege", "schema", "object")}
+    grants = fleet.grant_details(target_from_args(args), args.limit, args.offset, **filters)
+    json.dump([grant.as_dict() for grant in grants], sys.stdout, indent=2)
+    sys.stdout.write("\n")
+    return EXIT_PASSED
+
+
+def query_history(args):
+    history = History(args.db)
+    try:
+        if args.query == "runs":
+            rows = history.runs(args.target, args.limit)
+        elif args.query == "new-findings":
+            rows = history.new_findings(args.target, args.check)
+        elif args.query == "removed-findings":
+            rows = history.removed_findings(args.target, args.check)
+        elif args.query == "flips":
+            rows = history.flipped_checks(args.check, args.since)
+        else:
+            rows = {"deleted_runs": history.prune(args.days, args.keep)}
+            if args.compact:
+                history.compact()
+    finally:
+        history.close()
+    json.dump(rows, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+    return EXIT_PASSED
+
+
+def add_target_arguments(parser):
+    parser.add_argument("--type", required=True, help="Database type, e.g. PostgreSQL, MySQL, SQL Server, DB2, Oracle")
+    parser.add_argument("--host", required=True)
+    parser.add_argument("--port", required=True)
+    parser.add_argument("--database", required=True)
+    parser.add_argument("--username", required=True)
+    parser.add_argument("--credential", default="env:HIPAA_DB_PASSWORD",
+                        help="Password reference, env:VARIABLE or file:/path (default: env:HIPAA_DB_PASSWORD)")
+    parser.add_argument("--name", help="Name to report the target under")
+
+
+def add_report_arguments(parser):
+    parser.add_argument("--timeout", type=float, default=fleet.DEFAULT_TIMEOUT, help="Timeout in seconds")
+    parser.add_argument("--format", choices=["json", "text"], default="json")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m src.cli", description="Headless HIPAA compliance checks.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    scan_parser = subparsers.add_parser("scan", help="Check a single database")
+    add_target_arguments(scan_parser)
+    add_report_arguments(scan_parser)
+    scan_parser.add_argument("--instance", action="store_true",
+                             help="Scan every database on the server, connecting through --database")
+    fleet.add_scan_options(scan_parser)
+    scan_parser.set_defaults(func=scan)
+
+    fleet_parser = subparsers.add_parser("fleet", help="Check every database in an inventory file")
+    fleet.build_parser(fleet_parser)
+    fleet_parser.set_defaults(func=scan_fleet)
+
+    monitor_parser = subparsers.add_parser("monitor", help="Rescan an inventory continuously and report verdict changes")
+    monitor_parser.add_argument("inventory", help="CSV or JSON inventory, as for fleet")
+    monitor_parser.add_argument("--events", default="-", help="Append verdict changes here as JSON Lines (default: stdout)")
+    monitor_parser.add_argument("--interval", type=float, default=monitor.DEFAULT_INTERVAL,
+                                help="Seconds between the first scans of a target")
+    monitor_parser.add_argument("--min-interval", type=float, default=monitor.DEFAULT_MIN_INTERVAL,
+                                help="Shortest interval, used after a verdict changes")
+    monitor_parser.add_argument("--max-interval", type=float, default=monitor.DEFAULT_MAX_INTERVAL,
+                                help="Longest interval a stable target stretches to")
+    monitor_parser.add_argument("--jitter", type=float, default=monitor.DEFAULT_JITTER,
+                                help="Random spread of every interval, as a fraction of it")
+    monitor_parser.add_argument("--concurrency", type=int, default=monitor.DEFAULT_CONCURRENCY,
+                                help="Targets scanned at the same time")
+    monitor_parser.add_argument("--timeout", type=float, default=fleet.DEFAULT_TIMEOUT, help="Per-target timeout in seconds")
+    monitor_parser.add_argument("--instance", action="store_true", help="Scan every database on each target's server")
+    fleet.add_scan_options(monitor_parser)
+    monitor_parser.set_defaults(func=monitor_fleet)
+
+    snapshot_parser = subparsers.add_parser("snapshot", help="Capture a catalog snapshot, or check one offline")
+    snapshot_actions = snapshot_parser.add_subparsers(dest="action", required=True)
+    capture_parser = snapshot_actions.add_parser("capture", help="Save a database's catalog metadata to a file")
+    add_target_arguments(capture_parser)
+    capture_parser.add_argument("-o", "--output", required=True, help="Snapshot file to write")
+    capture_parser.set_defaults(func=capture_snapshot)
+    offline_parser = snapshot_actions.add_parser("scan", help="Run the checks against a snapshot file")
+    offline_parser.add_argument("snapshot", help="Snapshot file written by 'snapshot capture'")
+    offline_parser.add_argument("--name", help="Name to report the target under (default: the file name)")
+    add_report_arguments(offline_parser)
+    fleet.add_scan_options(offline_parser)
+    offline_parser.set_defaults(func=scan_snapshot)
+
+    grants_parser = subparsers.add_parser("grants", help="List the grants behind a --grant-summary count, a page at a time")
+    add_target_arguments(grants_parser)
+    for field in ("grantee", "privilege", "schema", "object"):
+        grants_parser.add_argument(f"--{field}", help=f"Only grants with this {field}")
+    grants_parser.add_argument("--limit", type=int, default=DETAIL_ROWS, help="Grants per page")
+    grants_parser.add_argument("--offset", type=int, default=0, help="Grants to skip")
+    grants_parser.set_defaults(func=list_grants)
+
+    history_parser = subparsers.add_parser("history", help="Query results recorded with --history")
+    history_parser.add_argument("--db", default=DEFAULT_HISTORY_PATH, help=f"History database (default: {DEFAULT_HISTORY_PATH})")
+    history_parser.set_defaults(func=query_history)
+    queries = history_parser.add_subparsers(dest="query", required=True)
+    runs_parser = queries.add_parser("runs", help="List recent runs")
+    runs_parser.add_argument("--target", help="Only runs of this target")
+    runs_parser.add_argument("--limit", type=int, default=20)
+    for name, description in (("new-findings", "Findings that appeared since the previous run of a target"),
+                              ("removed-findings", "Findings that disappeared since the previous run of a target")):
+        diff_parser = queries.add_parser(name, help=description)
+        diff_parser.add_argument("--target", required=True)
+        diff_parser.add_argument("--check", default="scan_for_sensitive_data")
+    flips_parser = queries.add_parser("flips", help="Targets whose verdict for a check changed between runs")
+    flips_parser.add_argument("--check", required=True, help="e.g. check_encryption")
+    flips_parser.add_argument("--since", help="Only changes at or after this ISO timestamp")
+    prune_parser = queries.add_parser("prune", help="Apply retention; the latest run of every target is kept")
+    prune_parser.add_argument("--days", type=float, help="Delete runs older than this many days")
+    prune_parser.add_argument("--keep", type=int, help="Keep at most this many runs per target")
+    prune_parser.add_argument("--compact", action="store_true", help="Reclaim the freed space afterwards")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        return args.func(args)
+    except Exception as e:
+        print(f"error: {e}", file=sys.stderr)
+        return EXIT_ERROR
+    finally:
+        # Log the pooled sessions off rather than leaving them to the process exit
+        close_pools()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
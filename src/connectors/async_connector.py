@@ -0,0 +1,149 @@
+import asyncio
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from .check_runner import (CANCEL_GRACE, CHECKS, STREAMING_CHECKS, CheckResult, CheckTimeout, RowSummary,
+                           _interrupt, expand_result, plan_checks, run_check)
+
+# Blocking database calls in flight at once across every event loop task
+DEFAULT_CONCURRENCY = 64
+
+_concurrency = DEFAULT_CONCURRENCY
+_limiters = weakref.WeakKeyDictionary()
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def set_concurrency(limit):
+    # Takes effect for event loops that have not run a call yet; calls already on
+    # the previous executor finish there
+    global _concurrency, _executor
+    with _executor_lock:
+        _concurrency = limit
+        executor, _executor = _executor, None
+    _limiters.clear()
+    if executor is not None:
+        executor.shutdown(wait=False)
+
+
+def limiter():
+    # The global semaphore; asyncio primitives belong to one loop, so each loop gets its own
+    loop = asyncio.get_running_loop()
+    semaphore = _limiters.get(loop)
+    if semaphore is None:
+        semaphore = _limiters[loop] = asyncio.Semaphore(_concurrency)
+    return semaphore
+
+
+def executor():
+    # One worker per semaphore slot, so a call that holds a slot never queues for a thread
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=_concurrency, thread_name_prefix="hipaa-async")
+        return _executor
+
+
+def _start(semaphore, function):
+    # Runs function on the executor with a slot already taken. The slot is given back
+    # when the worker thread is done, not when the caller stops waiting, so calls the
+    # caller abandoned still count and a call holding a slot never queues for a thread.
+    try:
+        future = asyncio.get_running_loop().run_in_executor(executor(), function)
+    except BaseException:
+        semaphore.release()
+        raise
+    future.add_done_callback(partial(_release, semaphore))
+    return future
+
+
+def _release(semaphore, future):
+    semaphore.release()
+    if not future.cancelled():
+        # Retrieved, so nobody is told about the error of a call that was abandoned
+        future.exception()
+
+
+async def run_blocking(function, *args, **kwargs):
+    semaphore = limiter()
+    await semaphore.acquire()
+    return await asyncio.shield(_start(semaphore, partial(function, *args, **kwargs)))
+
+
+class AsyncConnector:
+    # The asyncio face of a DBConnector. Every connector speaks DB-API, which blocks,
+    # so its calls run on a shared executor while the event loop multiplexes the
+    # checks of any number of targets; the global limiter bounds how many calls,
+    # and so how many threads and open statements, are in flight at once.
+    def __init__(self, db):
+        self.db = db
+
+    async def connect(self, host, port, database, username, password):
+        return await run_blocking(self.db.connect, host, port, database, username, password)
+
+    async def run_check(self, check, connections, implementation=None, consume=None, tracer=None, target=None,
+                        deadline=None, cancel=None, active=None):
+        return await run_blocking(run_check, self.db, check, connections, implementation, consume, tracer, target,
+                                  deadline, cancel, active)
+
+    async def run_checks(self, pool, checks=None, overrides=None, stream=False, consumers=None, on_result=None,
+                         tracer=None, target=None, check_timeout=None, run_timeout=None):
+        # The coroutine counterpart of check_runner.run_checks on a shared pool. Each
+        # check is a task of its own; cancelling the run interrupts the statements
+        # that are still executing.
+        db = self.db
+        checks = list(checks or CHECKS)
+        overrides = overrides or {}
+        if consumers is None:
+            consumers = {check: RowSummary for check in STREAMING_CHECKS} if stream else {}
+        run_deadline = time.monotonic() + run_timeout if run_timeout else None
+        cancel = threading.Event()
+        active = {}
+        tasks, config_checks, overrides = plan_checks(db, checks, overrides)
+        results = {}
+
+        def deadline():
+            check_deadline = time.monotonic() + check_timeout if check_timeout else None
+            deadlines = [d for d in (run_deadline, check_deadline) if d is not None]
+            return min(deadlines) if deadlines else None
+
+        async def run(check):
+            semaphore = limiter()
+            await semaphore.acquire()
+            # The budget starts once the check has a slot, not while it queues for one
+            check_deadline = deadline()
+            call = asyncio.shield(_start(semaphore, partial(
+                run_check, db, check, pool, overrides.get(check), consumers.get(check), tracer, target,
+                check_deadline, cancel, active)))
+            try:
+                if check_deadline is None:
+                    result = await call
+                else:
+                    # The driver did not stop the statement in time; interrupt it and move on.
+                    # The worker keeps its slot until it returns.
+                    result = await asyncio.wait_for(call, max(check_deadline - time.monotonic(), 0) + CANCEL_GRACE)
+            except asyncio.TimeoutError:
+                running = active.get(check)
+                if running:
+                    _interrupt(db, running)
+                if check_deadline == run_deadline:
+                    error = CheckTimeout(f"The run did not finish within its {run_timeout:.0f} second time budget.")
+                else:
+                    error = CheckTimeout(f"{check} did not finish within its {check_timeout:.0f} second time budget.")
+                result = CheckResult(check, error=error, elapsed=time.monotonic() - running[2] if running else 0.0)
+            except asyncio.CancelledError:
+                cancel.set()
+                running = active.get(check)
+                if running:
+                    _interrupt(db, running)
+                raise
+            for result in expand_result(db, result, config_checks):
+                results[result.check] = result
+                if on_result:
+                    on_result(result)
+
+        await asyncio.gather(*(run(check) for check in tasks))
+        return {check: results[check] for check in checks}
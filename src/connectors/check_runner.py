@@ -0,0 +1,319 @@
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from .connection_pool import PoolTimeout
+from .db_connector import DBConnector
+
+CHECKS = ["scan_for_sensitive_data", "check_access_controls", "check_audit_trail",
+          "check_encryption", "check_activity_monitoring"]
+
+# Checks that pass when they find nothing; the others pass when they return a truthy value
+FINDING_CHECKS = ["scan_for_sensitive_data", "check_access_controls", "sample_for_sensitive_data",
+                  "check_role_exposure"]
+
+# Checks whose connector methods can stream their rows with stream=True
+STREAMING_CHECKS = ["scan_for_sensitive_data", "check_access_controls"]
+
+# Checks evaluated from the connector's configuration snapshot, mapped to the evaluator.
+# A run takes the snapshot once, as the configuration probe, and evaluates them in memory.
+CONFIG_CHECKS = {"check_audit_trail": "audit_trail_enabled", "check_encryption": "encryption_enabled",
+                 "check_activity_monitoring": "activity_monitoring_enabled"}
+CONFIG_PROBE = "probe_configuration"
+
+PREVIEW_ROWS = 1000
+
+# How often the calling thread looks at deadlines and cancellation while checks run
+POLL_INTERVAL = 0.2
+# Time a driver gets to report its own statement timeout before the check is abandoned
+CANCEL_GRACE = 2.0
+
+
+def has_configuration_probe(db):
+    return getattr(type(db), CONFIG_PROBE) is not getattr(DBConnector, CONFIG_PROBE)
+
+
+def check_passed(check, value):
+    if check in FINDING_CHECKS:
+        return value is not None and len(value) == 0
+    return bool(value)
+
+
+class CheckTimeout(RuntimeError):
+    pass
+
+
+class CheckCancelled(RuntimeError):
+    pass
+
+
+class CheckResult:
+    def __init__(self, check, value=None, error=None, elapsed=0.0):
+        self.check = check
+        self.value = value
+        self.error = error
+        self.elapsed = elapsed
+
+    @property
+    def failed(self):
+        return self.error is not None
+
+    @property
+    def passed(self):
+        return not self.failed and check_passed(self.check, self.value)
+
+    @property
+    def status(self):
+        # A check that ran out of time or was cancelled has no verdict of its own
+        if isinstance(self.error, CheckTimeout):
+            return "timeout"
+        if isinstance(self.error, CheckCancelled):
+            return "cancelled"
+        if self.failed:
+            return "error"
+        return "passed" if self.passed else "failed"
+
+
+class RowSummary:
+    # Counts a row stream and keeps only the first rows, so memory stays flat
+    # however large the catalog is. Iterating yields the preview rows.
+    def __init__(self, rows, preview=PREVIEW_ROWS):
+        self.rows = []
+        self.count = 0
+        for row in rows:
+            if self.count < preview:
+                self.rows.append(row)
+            self.count += 1
+
+    @property
+    def truncated(self):
+        return self.count > len(self.rows)
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        return iter(self.rows)
+
+
+class RunConnections:
+    # Small per-run pool: checks borrow a connection, run on their own cursor
+    # and hand the connection back, so no cursor is shared between threads.
+    def __init__(self, connect, connections=None):
+        self._connect = connect
+        self._lock = threading.Lock()
+        self._idle = list(connections or [])
+        self._all = list(self._idle)
+
+    def acquire(self, timeout=None):
+        # Opens a connection whenever none is idle, so it never waits for one
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        conn = self._connect()
+        with self._lock:
+            self._all.append(conn)
+        return conn
+
+    def release(self, conn):
+        with self._lock:
+            self._idle.append(conn)
+
+    def close(self):
+        with self._lock:
+            connections, self._all, self._idle = self._all, [], []
+        for conn in connections:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+
+def run_check(db, check, connections, implementation=None, consume=None, tracer=None, target=None,
+              deadline=None, cancel=None, active=None):
+    started = time.time()
+    start = time.monotonic()
+    if cancel is not None and cancel.is_set():
+        return CheckResult(check, error=CheckCancelled("The run was cancelled before this check started."))
+    timeout = None
+    if deadline is not None:
+        timeout = deadline - start
+        if timeout <= 0:
+            return CheckResult(check, error=CheckTimeout("The time budget ran out before this check started."))
+    try:
+        # A full pool counts against the budget like a slow statement
+        conn = connections.acquire(timeout)
+    except PoolTimeout:
+        return CheckResult(check, error=CheckTimeout(
+            f"{check} found no free connection within its {timeout:.0f} second time budget."),
+            elapsed=time.monotonic() - start)
+    if deadline is not None:
+        timeout = max(deadline - time.monotonic(), 0.001)
+    cursor = None
+    try:
+        if timeout is not None:
+            db.set_query_timeout(conn, timeout)
+        cursor = conn.cursor()
+        if active is not None:
+            # Lets the calling thread interrupt the statement on cancellation
+            active[check] = (conn, cursor, start)
+        if cancel is not None and cancel.is_set():
+            raise CheckCancelled("The run was cancelled before this check started.")
+        if tracer is not None:
+            cursor = tracer.wrap(cursor, target, check)
+        try:
+            if implementation is not None:
+                value = implementation(cursor)
+            elif consume is not None:
+                value = getattr(db, check)(cursor, stream=True)
+            else:
+                value = getattr(db, check)(cursor)
+            # Streamed rows have to be consumed while the connection is still held
+            if consume is not None:
+                value = consume(value)
+        finally:
+            cursor.close()
+        result = CheckResult(check, value=value, elapsed=time.monotonic() - start)
+    except Exception as e:
+        try:
+            conn.rollback()
+        except Exception:
+            pass
+        if timeout is not None and db.is_timeout_error(e):
+            error = CheckTimeout(f"{check} did not finish within its {timeout:.0f} second time budget.")
+            error.__cause__ = e
+            e = error
+        result = CheckResult(check, error=e, elapsed=time.monotonic() - start)
+    finally:
+        if active is not None:
+            active.pop(check, None)
+        if timeout is not None:
+            try:
+                db.set_query_timeout(conn, None)
+            except Exception:
+                pass
+        connections.release(conn)
+    if tracer is not None:
+        tracer.end_span(target, check, started, result.elapsed, result.error)
+    return result
+
+
+def evaluate_config_check(db, check, probe):
+    if probe.failed:
+        return CheckResult(check, error=probe.error, elapsed=probe.elapsed)
+    try:
+        return CheckResult(check, value=getattr(db, CONFIG_CHECKS[check])(probe.value), elapsed=probe.elapsed)
+    except Exception as e:
+        return CheckResult(check, error=e, elapsed=probe.elapsed)
+
+
+def plan_checks(db, checks, overrides):
+    # Returns the tasks to run, the configuration checks folded into the probe task
+    # and the overrides including the probe. Configuration checks without an
+    # override share a single probe of the server settings.
+    config_checks = [check for check in checks if check in CONFIG_CHECKS and check not in overrides]
+    if len(config_checks) < 2 or not has_configuration_probe(db):
+        config_checks = []
+    tasks = [check for check in checks if check not in config_checks]
+    if config_checks:
+        tasks.append(CONFIG_PROBE)
+        overrides = dict(overrides, **{CONFIG_PROBE: db.probe_configuration})
+    return tasks, config_checks, overrides
+
+
+def expand_result(db, result, config_checks):
+    # The probe task yields one result per configuration check it stands for
+    if result.check == CONFIG_PROBE:
+        return [evaluate_config_check(db, check, result) for check in config_checks]
+    return [result]
+
+
+def _interrupt(db, running):
+    try:
+        db.cancel_query(*running[:2])
+    except Exception:
+        pass
+
+
+def run_checks(db, connect=None, checks=None, max_workers=None, connections=None, on_result=None, pool=None,
+               overrides=None, stream=False, consumers=None, tracer=None, target=None, check_timeout=None,
+               run_timeout=None, cancel=None, on_wait=None):
+    checks = list(checks or CHECKS)
+    # overrides maps a check name to a function(cursor) that replaces the connector method
+    overrides = overrides or {}
+    # consumers map a streaming check to a function(rows) that reduces the stream to its result
+    if consumers is None:
+        consumers = {check: RowSummary for check in STREAMING_CHECKS} if stream else {}
+    # check_timeout bounds each check and run_timeout all of them, both in seconds and
+    # enforced by the connector's native statement timeout. Setting the cancel event
+    # (a threading.Event) stops the run; on_wait is called while waiting and may raise
+    # to abandon it.
+    run_deadline = time.monotonic() + run_timeout if run_timeout else None
+    cancel = cancel or threading.Event()
+    active = {}
+
+    def deadline():
+        check_deadline = time.monotonic() + check_timeout if check_timeout else None
+        deadlines = [d for d in (run_deadline, check_deadline) if d is not None]
+        return min(deadlines) if deadlines else None
+
+    # A shared ConnectionPool outlives the run; a per-run pool is closed at the end
+    owns_pool = pool is None
+    if owns_pool:
+        pool = RunConnections(connect, connections)
+    results = {}
+
+    tasks, config_checks, overrides = plan_checks(db, checks, overrides)
+
+    def finish(result):
+        for result in expand_result(db, result, config_checks):
+            results[result.check] = result
+            if on_result:
+                on_result(result)
+
+    executor = ThreadPoolExecutor(max_workers=max_workers or len(tasks), thread_name_prefix="hipaa-check")
+    futures = {executor.submit(lambda check=check: run_check(
+        db, check, pool, overrides.get(check), consumers.get(check), tracer, target, deadline(), cancel, active)): check
+        for check in tasks}
+    pending = set(futures)
+    abandoned = False
+    try:
+        # Results are handed to on_result in the calling thread as they complete
+        while pending:
+            done, pending = wait(pending, timeout=POLL_INTERVAL, return_when=FIRST_COMPLETED)
+            for future in done:
+                finish(future.result())
+            now = time.monotonic()
+            for future in list(pending):
+                check = futures[future]
+                running = active.get(check)
+                error = None
+                if cancel.is_set():
+                    error = CheckCancelled("The run was cancelled.")
+                elif run_deadline is not None and now > run_deadline + CANCEL_GRACE:
+                    error = CheckTimeout(f"The run did not finish within its {run_timeout:.0f} second time budget.")
+                elif check_timeout and running and now > running[2] + check_timeout + CANCEL_GRACE:
+                    error = CheckTimeout(f"{check} did not finish within its {check_timeout:.0f} second time budget.")
+                if error is None:
+                    continue
+                # The driver did not stop the statement in time; interrupt it and move on
+                abandoned = True
+                pending.discard(future)
+                future.cancel()
+                if running:
+                    _interrupt(db, running)
+                finish(CheckResult(check, error=error, elapsed=now - running[2] if running else 0.0))
+            if pending and on_wait:
+                on_wait()
+    finally:
+        if pending:
+            # Abandoned by an exception (e.g. the UI stopping the script): stop the rest
+            abandoned = True
+            cancel.set()
+            for running in list(active.values()):
+                _interrupt(db, running)
+        # Abandoned checks are not waited for; they release their connection when they return
+        executor.shutdown(wait=not abandoned, cancel_futures=True)
+        if owns_pool:
+            pool.close()
+    return {check: results[check] for check in checks}
@@ -0,0 +1,184 @@
+import hashlib
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_MAX_SIZE = 5
+DEFAULT_IDLE_TIMEOUT = 300
+DEFAULT_HEALTH_CHECK_INTERVAL = 30
+REAPER_INTERVAL = 30
+
+
+class PoolTimeout(RuntimeError):
+    pass
+
+
+class ConnectionPool:
+    def __init__(self, db, connect, max_size=DEFAULT_MAX_SIZE, idle_timeout=DEFAULT_IDLE_TIMEOUT,
+                 health_check_interval=DEFAULT_HEALTH_CHECK_INTERVAL):
+        self.db = db
+        self._connect = connect
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.health_check_interval = health_check_interval
+        self._cond = threading.Condition()
+        # Idle connections as (connection, last_used) pairs, most recently used last
+        self._idle = []
+        self._size = 0
+        self._closed = False
+
+    @property
+    def size(self):
+        return self._size
+
+    @property
+    def idle_count(self):
+        return len(self._idle)
+
+    def acquire(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            conn, last_used = self._checkout(deadline)
+            if conn is None:
+                return self._open()
+            if time.monotonic() - last_used < self.health_check_interval or self.db.is_alive(conn):
+                return conn
+            self._discard(conn)
+
+    def release(self, conn):
+        try:
+            # End the read-only transaction the checks opened so the session is clean
+            conn.rollback()
+        except Exception:
+            self._discard(conn)
+            return
+        with self._cond:
+            if self._closed:
+                self._size -= 1
+                _close(conn)
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self, timeout=None):
+        conn = self.acquire(timeout)
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def evict_idle(self):
+        now = time.monotonic()
+        with self._cond:
+            expired = [conn for conn, last_used in self._idle if now - last_used >= self.idle_timeout]
+            self._idle = [(conn, last_used) for conn, last_used in self._idle if now - last_used < self.idle_timeout]
+        for conn in expired:
+            self._discard(conn)
+
+    def shrink(self, keep_idle):
+        with self._cond:
+            keep = len(self._idle) - keep_idle
+            surplus = [conn for conn, _ in self._idle[:keep]] if keep > 0 else []
+            self._idle = self._idle[len(surplus):]
+        for conn in surplus:
+            self._discard(conn)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._discard(conn)
+
+    def _checkout(self, deadline):
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError("Connection pool is closed.")
+                if self._idle:
+                    return self._idle.pop()
+                if self._size < self.max_size:
+                    self._size += 1
+                    return None, None
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise PoolTimeout(f"No connection available within the pool limit of {self.max_size}.")
+                self._cond.wait(remaining)
+
+    def _open(self):
+        try:
+            return self._connect()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+
+    def _discard(self, conn):
+        _close(conn)
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+
+def _close(conn):
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+_reaper = None
+
+
+def pool_key(db, host, port, database, username, password):
+    # Key on a digest so the registry never holds passwords in its keys
+    digest = hashlib.sha256((password or "").encode()).hexdigest()
+    return (type(db).__name__, host, str(port), database, username, digest)
+
+
+def get_pool(db, host, port, database, username, password, **kwargs):
+    key = pool_key(db, host, port, database, username, password)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = ConnectionPool(db, lambda: db.connect(host, port, database, username, password), **kwargs)
+            _pools[key] = pool
+            _start_reaper()
+        return pool
+
+
+def close_pool(pool):
+    # Closes one pool and forgets it; the next get_pool for its target opens a new one
+    with _pools_lock:
+        for key, registered in list(_pools.items()):
+            if registered is pool:
+                del _pools[key]
+    pool.close()
+
+
+def close_pools():
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+def _reap():
+    while True:
+        time.sleep(REAPER_INTERVAL)
+        with _pools_lock:
+            pools = list(_pools.values())
+        for pool in pools:
+            pool.evict_idle()
+
+
+def _start_reaper():
+    global _reaper
+    if _reaper is None:
+        _reaper = threading.Thread(target=_reap, name="hipaa-pool-reaper", daemon=True)
+        _reaper.start()
@@ -1,24 +1,96 @@
-from .postgresql_connector import PostgreSQLConnector
-from .mysql_connector import MySQLConnector
-from .sqlserver_connector import SQLServerConnector
-from .db2_connector import DB2Connector
-from .oracle_connector import OracleConnector
+import importlib
 
+# Entry point group third-party packages can use to ship additional connectors
+ENTRY_POINT_GROUP = "hipaa_diagnoser.connectors"
 
-def get_database(db_type):
-    if db_type == "PostgreSQL":
-        return PostgreSQLConnector()
-    elif db_type == "MySQL":
-        return MySQLConnector()
-    elif db_type == "SQL Server":
-        return SQLServerConnector()
-    elif db_type == "DB2":
-        return DB2Connector()
-    elif db_type == "Oracle":
-        return OracleConnector()
+# Connectors are registered as "module:Class" references and only imported the
+# first time their database type is requested, so a missing driver only breaks
+# the database type that needs it.
+_registry = {
+    "PostgreSQL": ".postgresql_connector:PostgreSQLConnector",
+    "MySQL": ".mysql_connector:MySQLConnector",
+    "SQL Server": ".sqlserver_connector:SQLServerConnector",
+    "DB2": ".db2_connector:DB2Connector",
+    "Oracle": ".oracle_connector:OracleConnector",
+    # Catalog snapshot files taken from any of the above; the database is the file's path
+    "Snapshot": ".snapshot:SnapshotConnector",
+}
+# Types that can be requested by name but are left out of get_database_list, which is
+# what the web app offers. A snapshot's database is a path on the machine running the
+# tool, so snapshots are only opened from the command line and inventories.
+_unlisted = {"Snapshot"}
+_loaded = {}
+_unavailable = {}
+_entry_points_loaded = False
+
+
+def register_database(db_type, connector, listed=True):
+    _registry[db_type] = connector
+    if listed:
+        _unlisted.discard(db_type)
+    else:
+        _unlisted.add(db_type)
+    _loaded.pop(db_type, None)
+    _unavailable.pop(db_type, None)
+
+
+def _load_entry_points():
+    global _entry_points_loaded
+    if _entry_points_loaded:
+        return
+    _entry_points_loaded = True
+    # importlib.metadata is slow to import, so only pay for it when it is needed
+    from importlib import metadata
+    entry_points = metadata.entry_points()
+    if hasattr(entry_points, "select"):
+        entry_points = entry_points.select(group=ENTRY_POINT_GROUP)
     else:
+        entry_points = entry_points.get(ENTRY_POINT_GROUP, [])
+    for entry_point in entry_points:
+        _registry.setdefault(entry_point.name, entry_point)
+
+
+def _load_connector(db_type):
+    connector = _registry[db_type]
+    if isinstance(connector, str):
+        module_name, _, class_name = connector.partition(":")
+        return getattr(importlib.import_module(module_name, __package__), class_name)
+    if isinstance(connector, type):
+        return connector
+    return connector.load()
+
+
+def get_connector_class(db_type):
+    _load_entry_points()
+    if db_type not in _registry:
         raise RuntimeError("Unsupported database type.")
+    if db_type not in _loaded:
+        try:
+            _loaded[db_type] = _load_connector(db_type)
+        except ImportError as e:
+            _unavailable[db_type] = str(e)
+            raise RuntimeError(f"The {db_type} driver is not available: {e}")
+        _unavailable.pop(db_type, None)
+    return _loaded[db_type]
+
+
+def get_database(db_type):
+    return get_connector_class(db_type)()
 
 
 def get_database_list():
-    return ["PostgreSQL", "MySQL", "SQL Server", "DB2", "Oracle"]
+    _load_entry_points()
+    return [db_type for db_type in _registry if db_type not in _unlisted]
+
+
+def get_driver_status():
+    # Imports every registered connector; returns None for usable types and the
+    # import error for the ones whose driver is missing.
+    status = {}
+    for db_type in get_database_list():
+        try:
+            get_connector_class(db_type)
+            status[db_type] = None
+        except RuntimeError:
+            status[db_type] = _unavailable.get(db_type)
+    return status
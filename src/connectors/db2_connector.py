@@ -1,52 +1,127 @@
+import math
 import ibm_db
 import ibm_db_dbi
 from .db_connector import DBConnector
+from .findings import Grant
+
+# TABAUTH has one Y/G/N flag per privilege; they are folded into a single privilege list
+PRIVILEGES = """
+    RTRIM(CASE WHEN CONTROLAUTH = 'Y' THEN 'CONTROL ' ELSE '' END
+        || CASE WHEN SELECTAUTH <> 'N' THEN 'SELECT ' ELSE '' END
+        || CASE WHEN INSERTAUTH <> 'N' THEN 'INSERT ' ELSE '' END
+        || CASE WHEN UPDATEAUTH <> 'N' THEN 'UPDATE ' ELSE '' END
+        || CASE WHEN DELETEAUTH <> 'N' THEN 'DELETE ' ELSE '' END
+        || CASE WHEN ALTERAUTH <> 'N' THEN 'ALTER ' ELSE '' END
+        || CASE WHEN INDEXAUTH <> 'N' THEN 'INDEX ' ELSE '' END
+        || CASE WHEN REFAUTH <> 'N' THEN 'REFERENCES' ELSE '' END)
+"""
 
 
 class DB2Connector(DBConnector):
+    dialect = "db2"
+
+    health_check_query = "SELECT 1 FROM SYSIBM.SYSDUMMY1"
+
+    # Folded like check_access_controls, so a summary counts the grants the full list holds
+    grant_query = f"""
+        SELECT GRANTEE AS grantee, {PRIVILEGES} AS privilege, TABSCHEMA AS object_schema, TABNAME AS object_name
+        FROM SYSCAT.TABAUTH
+        WHERE TABSCHEMA NOT LIKE 'SYS%' AND TABNAME NOT LIKE 'SYS%'
+    """
+
     def connect(self, host, port, database, username, password):
         return ibm_db_dbi.Connection(ibm_db.connect(
             f"DATABASE={database};HOSTNAME={host};PORT={port};PROTOCOL=TCPIP;UID={username};PWD={password};",
             "", ""
         ))
 
-    def scan_for_sensitive_data(self, cursor):
-        cursor.execute(
-            "SELECT TABSCHEMA, TABNAME, COLNAME FROM SYSCAT.COLUMNS WHERE COLNAME LIKE '%PATIENT%' AND TABSCHEMA NOT LIKE 'SYS%' AND TABNAME NOT LIKE 'SYS%'")
-        sensitive_data = cursor.fetchall()
+    def list_databases(self, cursor):
+        # The databases of a DB2 instance are only listed in its database directory,
+        # which SQL cannot read, so an instance scan covers the connected database
+        cursor.execute("SELECT CURRENT SERVER FROM SYSIBM.SYSDUMMY1")
+        return [cursor.fetchone()[0].strip()]
+
+    def set_query_timeout(self, conn, seconds):
+        # QueryTimeout set on the connection becomes the default for its statements
+        conn.set_option({ibm_db.SQL_ATTR_QUERY_TIMEOUT: 0 if seconds is None else max(1, math.ceil(seconds))})
 
-        additional_terms = ["MEDICAL CONDITION", "SSN", "DOB", "ADDRESS", "PHONE NUMBER", "EMAIL ADDRESS",
-                            "MEDICAL PROCEDURE", "HEALTHCARE PROVIDER", "MEDICATION NAME", "INSURANCE INFORMATION",
-                            "LAB RESULT", "GENETIC INFORMATION", "PAYMENT INFORMATION"]
-        for term in additional_terms:
-            cursor.execute(
-                f"SELECT TABSCHEMA, TABNAME, COLNAME FROM SYSCAT.COLUMNS WHERE COLNAME LIKE '%{term}%' AND TABSCHEMA NOT LIKE 'SYS%' AND TABNAME NOT LIKE 'SYS%'")
-            sensitive_data.extend(cursor.fetchall())
+    def is_timeout_error(self, error):
+        # SQL0952N: processing was cancelled due to an interrupt
+        return "SQLSTATE=57014" in str(error)
 
-        return sensitive_data
+    def get_columns(self, cursor, tables=None, stream=False):
+        return self.fetch_rows(cursor, f"""
+            SELECT c.TABSCHEMA, c.TABNAME, c.COLNAME FROM SYSCAT.COLUMNS c
+            WHERE c.TABSCHEMA NOT LIKE 'SYS%' AND c.TABNAME NOT LIKE 'SYS%' AND {self.table_filter("c.TABNAME", tables)}
+        """, stream)
 
-    def check_access_controls(self, cursor):
+    def get_table_versions(self, cursor):
         cursor.execute(
-            "SELECT GRANTEETYPE, TABNAME  FROM SYSCAT.TABAUTH WHERE TABSCHEMA NOT LIKE 'SYS%' AND TABNAME NOT LIKE 'SYS%'")
+            "SELECT TABSCHEMA, TABNAME, VARCHAR(ALTER_TIME) FROM SYSCAT.TABLES WHERE TABSCHEMA NOT LIKE 'SYS%' AND TABNAME NOT LIKE 'SYS%'")
         return cursor.fetchall()
 
-    def check_audit_trail(self, cursor):
-        cursor.execute("SELECT CASE WHEN COUNT(*) > 0 THEN 1 ELSE 0 END AS has_audit_policy FROM SYSCAT.AUDITPOLICIES")
-        result = cursor.fetchone()
-        return bool(result[0])
-
-    def check_encryption(self, cursor):
+    def get_sampling_candidates(self, cursor):
         cursor.execute("""
-            SELECT CASE WHEN COUNT(*) > 0 THEN 1 ELSE 0 END AS encryption_enabled
-            FROM TABLE (SYSPROC.ADMIN_GET_ENCRYPTION_INFO()) AS ENCRYPTION_INFO
-            WHERE ALGORITHM IS NOT NULL
+            SELECT c.TABSCHEMA, c.TABNAME, t.CARD, c.COLNAME
+            FROM SYSCAT.COLUMNS c
+            JOIN SYSCAT.TABLES t ON t.TABSCHEMA = c.TABSCHEMA AND t.TABNAME = c.TABNAME
+            WHERE t.TYPE = 'T' AND c.TABSCHEMA NOT LIKE 'SYS%' AND c.TABNAME NOT LIKE 'SYS%'
+            AND c.TYPENAME IN ('CHARACTER', 'VARCHAR', 'CLOB', 'GRAPHIC', 'VARGRAPHIC')
+            ORDER BY t.CARD DESC
+        """)
+        return cursor.fetchall()
+
+    def sample_query(self, schema, table, columns, limit, percent=None):
+        sample = f" TABLESAMPLE SYSTEM ({percent})" if percent else ""
+        return f"SELECT {self.column_list(columns)} FROM {self.qualified_name(schema, table)}{sample} FETCH FIRST {int(limit)} ROWS ONLY"
+
+    def check_access_controls(self, cursor, stream=False):
+        return self.fetch_rows(cursor, f"""
+            SELECT GRANTEE, {PRIVILEGES} AS PRIVILEGES, TABSCHEMA, TABNAME, GRANTEETYPE
+            FROM SYSCAT.TABAUTH
+            WHERE TABSCHEMA NOT LIKE 'SYS%' AND TABNAME NOT LIKE 'SYS%'
+        """, stream, Grant.from_row)
+
+    def get_role_graph(self, cursor):
+        memberships = self.fetch_rows(cursor, "SELECT GRANTEE, ROLENAME FROM SYSCAT.ROLEAUTH")
+        # DATAACCESS reads every table without a table privilege
+        grants = self.fetch_rows(cursor, """
+            SELECT GRANTEE, CASE WHEN CONTROLAUTH = 'Y' THEN 'CONTROL' ELSE 'SELECT' END, TABSCHEMA, TABNAME
+            FROM SYSCAT.TABAUTH
+            WHERE (SELECTAUTH <> 'N' OR CONTROLAUTH = 'Y') AND TABSCHEMA NOT LIKE 'SYS%'
+            UNION ALL
+            SELECT GRANTEE, 'DATAACCESS', CAST(NULL AS VARCHAR(128)), CAST(NULL AS VARCHAR(128))
+            FROM SYSCAT.DBAUTH WHERE DATAACCESSAUTH = 'Y'
         """)
-        result = cursor.fetchone()
-        return bool(result[0])
+        return memberships, grants
+
+    def probe_configuration(self, cursor):
+        config = self.fetch_facts(cursor, """
+            SELECT (SELECT COUNT(*) FROM SYSCAT.AUDITPOLICIES) AS AUDIT_POLICIES,
+                (SELECT COUNT(*) FROM SYSIBM.SYSTABLES WHERE NAME LIKE 'ACTIVITYSTMT_%') AS ACTIVITY_TABLES
+            FROM SYSIBM.SYSDUMMY1
+        """)
+        # ADMIN_GET_ENCRYPTION_INFO is missing from some editions, needs EXECUTE and can be
+        # slow, so it runs on its own and its failure only fails the encryption check
+        try:
+            config.update(self.fetch_facts(cursor, """
+                SELECT COUNT(*) AS ENCRYPTED_OBJECTS FROM TABLE (SYSPROC.ADMIN_GET_ENCRYPTION_INFO()) AS ENCRYPTION_INFO
+                WHERE ALGORITHM IS NOT NULL
+            """))
+        except Exception as e:
+            config["encryption_error"] = e
+        return config
+
+    def audit_trail_enabled(self, config):
+        return config["audit_policies"] > 0
+
+    def encryption_enabled(self, config):
+        if "encryption_error" in config:
+            raise config["encryption_error"]
+        return config["encrypted_objects"] > 0
 
-    def check_activity_monitoring(self, cursor):
-        cursor.execute("SELECT CASE WHEN COUNT(*) > 0 THEN 1 ELSE 0 END AS activity_monitoring_enabled FROM SYSIBM.SYSTABLES WHERE NAME LIKE 'ACTIVITYSTMT_%'")
-        return cursor.fetchone()[0]
+    def activity_monitoring_enabled(self, config):
+        return config["activity_tables"] > 0
 
     def get_description(self):
         return {
@@ -1,29 +1,216 @@
+from .findings import Grant
+from .grant_summary import DETAIL_ROWS, TOP_OBJECTS, GrantSummary, risk_expression
+from .terms import DEFAULT_DICTIONARY
+
+# Rows fetched per round trip when streaming catalog results
+FETCH_BATCH_SIZE = 1000
+
+
 class DBConnector:
+    # Column names are classified client-side by the dictionary compiled for the dialect
+    term_dictionary = DEFAULT_DICTIONARY
+    dialect = None
+    health_check_query = "SELECT 1"
+    # Whether one connection's catalog already covers every database on the instance
+    catalog_spans_instance = False
+    # The grants check_access_controls reports, one row per grantee, privilege and object
+    # with columns named grantee, privilege, object_schema and object_name. Summary mode
+    # aggregates it in the database instead of fetching it.
+    grant_query = None
 
     def connect(self, host, port, database, username, password):
         raise NotImplementedError(
             "connect method must be implemented by subclasses")
 
-    def scan_for_sensitive_data(self, cursor):
+    def get_columns(self, cursor, tables=None, stream=False):
+        # (schema, table, column) for every user column, or only those of the named tables
+        raise NotImplementedError(
+            "get_columns method must be implemented by subclasses")
+
+    def term_matcher(self):
+        return self.term_dictionary.compile(self.dialect)
+
+    def scan_for_sensitive_data(self, cursor, tables=None, stream=False):
+        # One pull of the column catalog, classified in-process as the rows stream in
+        findings = self.term_matcher().findings(self.get_columns(cursor, tables, stream=True))
+        return findings if stream else list(findings)
+
+    def get_table_versions(self, cursor):
+        raise NotImplementedError(
+            "get_table_versions method must be implemented by subclasses")
+
+    def get_sampling_candidates(self, cursor):
+        raise NotImplementedError(
+            "get_sampling_candidates method must be implemented by subclasses")
+
+    def sample_query(self, schema, table, columns, limit, percent=None):
         raise NotImplementedError(
-            "scan_for_sensitive_data method must be implemented by subclasses")
+            "sample_query method must be implemented by subclasses")
 
-    def check_access_controls(self, cursor):
+    def check_access_controls(self, cursor, stream=False):
         raise NotImplementedError(
             "check_access_controls method must be implemented by subclasses")
 
-    def check_audit_trail(self, cursor):
+    def summarize_access_controls(self, cursor, top=TOP_OBJECTS):
+        # Two small result sets whatever the number of grants: the counts, and the top objects
+        query = self._grant_query()
+        counts = self.fetch_rows(cursor, f"""
+            SELECT 'grantee', grantee, COUNT(*) FROM ({query}) g GROUP BY grantee
+            UNION ALL
+            SELECT 'privilege', privilege, COUNT(*) FROM ({query}) g GROUP BY privilege
+            UNION ALL
+            SELECT 'schema', object_schema, COUNT(*) FROM ({query}) g GROUP BY object_schema
+        """)
+        objects = self.fetch_rows(cursor, f"""
+            SELECT object_schema, object_name, COUNT(*) AS grant_count, SUM({risk_expression("privilege")}) AS risk_score
+            FROM ({query}) g
+            WHERE object_name IS NOT NULL
+            GROUP BY object_schema, object_name
+            ORDER BY risk_score DESC, grant_count DESC, object_schema, object_name
+            {self.page_clause(top)}
+        """)
+        return GrantSummary(counts, objects)
+
+    def access_control_details(self, cursor, grantee=None, privilege=None, schema=None, object=None,
+                               limit=DETAIL_ROWS, offset=0):
+        # One page of the grants behind a summary count
+        filters = [self.value_filter(column, [value]) for column, value in
+                   (("grantee", grantee), ("privilege", privilege), ("object_schema", schema), ("object_name", object))
+                   if value is not None]
+        return self.fetch_rows(cursor, f"""
+            SELECT grantee, privilege, object_schema, object_name FROM ({self._grant_query()}) g
+            WHERE {" AND ".join(filters) or "1 = 1"}
+            ORDER BY object_schema, object_name, grantee, privilege
+            {self.page_clause(limit, offset)}
+        """, row_factory=Grant.from_row)
+
+    def _grant_query(self):
+        if self.grant_query is None:
+            raise NotImplementedError("grant_query must be set by subclasses")
+        return self.grant_query
+
+    def get_role_graph(self, cursor):
+        # Role memberships as (member, role) and read grants as (grantee, privilege,
+        # schema, table), each pulled in one query; a None schema or table covers all
         raise NotImplementedError(
-            "check_audit_trail method must be implemented by subclasses")
+            "get_role_graph method must be implemented by subclasses")
 
-    def check_encryption(self, cursor):
+    # The audit, encryption and monitoring checks are evaluated in memory from one
+    # configuration snapshot; run_checks takes it once and shares it between the three.
+    def probe_configuration(self, cursor):
         raise NotImplementedError(
-            "check_encryption method must be implemented by subclasses")
+            "probe_configuration method must be implemented by subclasses")
 
-    def check_activity_monitoring(self, cursor):
+    def audit_trail_enabled(self, config):
         raise NotImplementedError(
-            "check_activity_monitoring method must be implemented by subclasses")
+            "audit_trail_enabled method must be implemented by subclasses")
+
+    def encryption_enabled(self, config):
+        raise NotImplementedError(
+            "encryption_enabled method must be implemented by subclasses")
+
+    def activity_monitoring_enabled(self, config):
+        raise NotImplementedError(
+            "activity_monitoring_enabled method must be implemented by subclasses")
+
+    def check_audit_trail(self, cursor):
+        return self.audit_trail_enabled(self.probe_configuration(cursor))
+
+    def check_encryption(self, cursor):
+        return self.encryption_enabled(self.probe_configuration(cursor))
+
+    def check_activity_monitoring(self, cursor):
+        return self.activity_monitoring_enabled(self.probe_configuration(cursor))
 
     def get_description(self):
         raise NotImplementedError(
-            "get_description method must be implemented by subclasses")
\ No newline at end of file
+            "get_description method must be implemented by subclasses")
+
+    def list_databases(self, cursor):
+        # Databases (or pluggable containers) on the connected instance that can be scanned
+        raise NotImplementedError(
+            "list_databases method must be implemented by subclasses")
+
+    def set_query_timeout(self, conn, seconds):
+        # Native per-statement timeout for the connection; None removes it again
+        raise NotImplementedError(
+            "set_query_timeout method must be implemented by subclasses")
+
+    def is_timeout_error(self, error):
+        return False
+
+    def cancel_query(self, conn, cursor):
+        # Interrupts a statement running on another thread. Drivers without a way to
+        # do that rely on the statement timeout alone.
+        pass
+
+    def is_alive(self, conn):
+        try:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(self.health_check_query)
+                cursor.fetchone()
+            finally:
+                cursor.close()
+            return True
+        except Exception:
+            return False
+
+    def fetch_facts(self, cursor, query):
+        # One row of named facts, keyed by lower case column name whatever case the driver reports
+        cursor.execute(query)
+        row = cursor.fetchone()
+        return {column[0].lower(): value for column, value in zip(cursor.description, row)}
+
+    def fetch_rows(self, cursor, query, stream=False, row_factory=None):
+        # With stream=True the rows come back as a lazy iterator read in batches, so the
+        # caller must consume it before the cursor is closed. row_factory turns driver
+        # rows into Finding/Grant records as they arrive.
+        if not stream:
+            cursor.execute(query)
+            rows = cursor.fetchall()
+            return [row_factory(row) for row in rows] if row_factory else rows
+        rows = self._stream_rows(cursor, query)
+        return map(row_factory, rows) if row_factory else rows
+
+    def open_stream_cursor(self, cursor):
+        return cursor
+
+    def _stream_rows(self, cursor, query):
+        stream_cursor = self.open_stream_cursor(cursor)
+        try:
+            stream_cursor.arraysize = FETCH_BATCH_SIZE
+            stream_cursor.execute(query)
+            while True:
+                batch = stream_cursor.fetchmany(FETCH_BATCH_SIZE)
+                if not batch:
+                    break
+                yield from batch
+        finally:
+            if stream_cursor is not cursor:
+                stream_cursor.close()
+
+    def quote_identifier(self, name):
+        return '"' + name.replace('"', '""') + '"'
+
+    def qualified_name(self, schema, table):
+        return f"{self.quote_identifier(schema)}.{self.quote_identifier(table)}"
+
+    def column_list(self, columns):
+        return ", ".join(self.quote_identifier(column) for column in columns)
+
+    def page_clause(self, limit, offset=0):
+        return f"OFFSET {int(offset)} ROWS FETCH NEXT {int(limit)} ROWS ONLY"
+
+    def table_filter(self, column, tables):
+        return self.value_filter(column, tables)
+
+    def value_filter(self, column, values):
+        if values is None:
+            return "1 = 1"
+        if not values:
+            return "1 = 0"
+        quoted = ["'" + str(value).replace("'", "''") + "'" for value in values]
+        # Oracle allows at most 1000 expressions in an IN list
+        chunks = [", ".join(quoted[i:i + 1000]) for i in range(0, len(quoted), 1000)]
+        return "(" + " OR ".join(f"{column} IN ({chunk})" for chunk in chunks) + ")"
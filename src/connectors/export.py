@@ -0,0 +1,265 @@
+import bz2
+import csv
+import gzip
+import io
+import json
+import lzma
+import os
+import re
+import threading
+from datetime import datetime, timezone
+
+from .check_runner import FINDING_CHECKS, RowSummary
+from .history import HistoryWriter
+
+FORMATS = ["jsonl", "csv", "parquet", "sqlite"]
+
+# Text formats are compressed as a stream; appending adds another compressed
+# member, which gzip, bz2 and xz readers all concatenate transparently.
+TEXT_COMPRESSION = {"gzip": (gzip.open, ".gz"), "bz2": (bz2.open, ".bz2"), "xz": (lzma.open, ".xz")}
+PARQUET_COMPRESSION = ["snappy", "gzip", "zstd", "brotli", "lz4"]
+
+# One flat layout for every record so CSV and Parquet get stable columns
+EXPORT_FIELDS = ["scanned_at", "target", "check", "record", "status", "passed", "error", "elapsed",
+                 "schema", "table", "column", "terms", "hits", "grantee", "privilege", "object", "state"]
+
+PARQUET_BATCH_ROWS = 10000
+
+
+def _open_text(path, compression):
+    if compression is None:
+        return open(path, "a", newline="", encoding="utf-8")
+    opener, _ = TEXT_COMPRESSION[compression]
+    return io.TextIOWrapper(opener(path, "ab"), newline="", encoding="utf-8")
+
+
+class JsonLinesWriter:
+    def __init__(self, path, compression=None):
+        self._file = _open_text(path, compression)
+
+    def write(self, record):
+        self._file.write(json.dumps(record) + "\n")
+
+    def close(self):
+        self._file.close()
+
+
+class CsvWriter:
+    def __init__(self, path, compression=None):
+        new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._file = _open_text(path, compression)
+        self._writer = csv.DictWriter(self._file, EXPORT_FIELDS)
+        # Appending to an existing file must not repeat the header
+        if new:
+            self._writer.writeheader()
+
+    def write(self, record):
+        self._writer.writerow(record)
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetWriter:
+    # Parquet files cannot be appended to, so rows are buffered into row groups
+    # and each run writes a file of its own.
+    def __init__(self, path, compression=None):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise RuntimeError(f"Parquet export needs pyarrow: {e}")
+        self._pa = pa
+        self._schema = pa.schema([(field, pa.bool_() if field == "passed" else pa.float64() if field == "elapsed"
+                                   else pa.int64() if field == "hits" else pa.string()) for field in EXPORT_FIELDS])
+        self._writer = pq.ParquetWriter(path, self._schema, compression=compression or "snappy")
+        self._rows = []
+
+    def write(self, record):
+        self._rows.append(record)
+        if len(self._rows) >= PARQUET_BATCH_ROWS:
+            self._flush()
+
+    def _flush(self):
+        if self._rows:
+            self._writer.write_table(self._pa.Table.from_pylist(self._rows, schema=self._schema))
+            self._rows = []
+
+    def close(self):
+        self._flush()
+        self._writer.close()
+
+
+WRITERS = {"jsonl": JsonLinesWriter, "csv": CsvWriter, "parquet": ParquetWriter, "sqlite": HistoryWriter}
+
+
+def safe_name(name):
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", name).strip("_") or "target"
+
+
+def infer_format(path):
+    if path.endswith((".db", ".sqlite")):
+        return "sqlite"
+    for candidate in FORMATS:
+        if re.search(rf"\.{candidate}(\.\w+)?$", path):
+            return candidate
+    return "jsonl"
+
+
+class Exporter:
+    # Writes check verdicts, findings and grants as they are produced. With
+    # per_target the path is a directory holding one appendable file per target;
+    # otherwise every target goes to the single file at path. The sqlite format
+    # files the records into a scan history database (see history.py).
+    def __init__(self, path, export_format=None, compression=None, per_target=False):
+        self.path = path
+        self.format = export_format or infer_format(path)
+        self.compression = compression
+        # A history database holds every target; SQLite arbitrates between processes
+        self.per_target = per_target and self.format != "sqlite"
+        self.scanned_at = datetime.now(timezone.utc).isoformat()
+        if self.format not in WRITERS:
+            raise RuntimeError(f"Unsupported export format: {self.format}")
+        allowed = {"parquet": PARQUET_COMPRESSION, "sqlite": []}.get(self.format, list(TEXT_COMPRESSION))
+        if compression is not None and compression not in allowed:
+            raise RuntimeError(f"{self.format} export supports {', '.join(allowed)} compression, not {compression}.")
+        self._init_state()
+
+    def _init_state(self):
+        self._lock = threading.Lock()
+        self._writers = {}
+        self._finished = set()
+        # The start of each target's current scan; the first one is scanned_at
+        self._started = {}
+
+    # Writers hold open files; a copy sent to another process opens its own
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        for name in ("_lock", "_writers", "_finished", "_started"):
+            del state[name]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._init_state()
+
+    def target_path(self, target):
+        if self.format == "parquet":
+            # Appending to a target means adding another part file to its directory
+            directory = os.path.join(self.path, safe_name(target))
+            os.makedirs(directory, exist_ok=True)
+            stamp = self._started.get(target, self.scanned_at).replace(":", "").replace("+", "_")
+            return os.path.join(directory, f"part-{stamp}-{os.getpid()}.parquet")
+        os.makedirs(self.path, exist_ok=True)
+        suffix = TEXT_COMPRESSION[self.compression][1] if self.compression else ""
+        return os.path.join(self.path, f"{safe_name(target)}.{self.format}{suffix}")
+
+    def _writer(self, target):
+        key = target if self.per_target else None
+        if key in self._finished:
+            return None
+        writer = self._writers.get(key)
+        if writer is None:
+            path = self.target_path(target) if self.per_target else self.path
+            writer = self._writers[key] = (WRITERS[self.format](path, self.compression), threading.Lock())
+        return writer
+
+    def _write(self, target, records, run=None):
+        with self._lock:
+            # Scans that outlived their timeout keep running; their late rows are dropped
+            if run is not None and (run.abandoned or self._started.get(target) != run.started):
+                return
+            writer = self._writer(target)
+        if writer is None:
+            return
+        writer, lock = writer
+        with lock:
+            for record in records:
+                writer.write(record)
+
+    def record(self, target, check, kind, **fields):
+        record = dict.fromkeys(EXPORT_FIELDS)
+        record.update(fields, scanned_at=self._started.get(target, self.scanned_at), target=target, check=check,
+                      record=kind)
+        return record
+
+    def stream(self, target, check, rows, run=None):
+        # Passes the rows through unchanged, writing each one on the way
+        for row in rows:
+            kind = "grant" if hasattr(row, "grantee") else "finding"
+            self._write(target, [self.record(target, check, kind, **row.as_dict())], run)
+            yield row
+
+    def write_result(self, target, result, run=None):
+        self._write(target, [self.record(target, result.check, "verdict", status=result.status, passed=result.passed,
+                                         error=str(result.error) if result.failed else None,
+                                         elapsed=round(result.elapsed, 3))], run)
+
+    def write_report(self, report):
+        # The target's overall status, including errors and timeouts that produced no checks
+        self._write(report["name"], [self.record(report["name"], None, "target", status=report["status"],
+                                                 passed=report["status"] == "passed", error=report["error"],
+                                                 elapsed=report["elapsed"])])
+
+    @property
+    def shareable(self):
+        # Whether copies in several processes can write at the same time
+        return self.per_target or self.format == "sqlite"
+
+    def begin(self, target):
+        # A target scanned again by the same exporter, as monitor does every round, is
+        # a run of its own with its own start, and its file is opened again. The scan
+        # writes through the returned run so its rows can be cut off.
+        with self._lock:
+            started = self.scanned_at if target not in self._started else datetime.now(timezone.utc).isoformat()
+            self._started[target] = started
+            self._finished.discard(target)
+        return ExportRun(self, started)
+
+    def finish(self, target):
+        if not self.per_target:
+            return
+        with self._lock:
+            writer = self._writers.pop(target, None)
+            self._finished.add(target)
+        if writer is not None:
+            with writer[1]:
+                writer[0].close()
+
+    def close(self):
+        with self._lock:
+            writers, self._writers = self._writers, {}
+        for writer, lock in writers.values():
+            with lock:
+                writer.close()
+
+
+class ExportRun:
+    # One scan of a target through an exporter. Its rows are dropped once the scan
+    # is abandoned or the target's next scan has begun.
+    def __init__(self, exporter, started):
+        self.exporter = exporter
+        self.started = started
+        self.abandoned = False
+
+    def stream(self, target, check, rows):
+        return self.exporter.stream(target, check, rows, self)
+
+    def write_result(self, target, result):
+        self.exporter.write_result(target, result, self)
+
+    def abandon(self):
+        with self.exporter._lock:
+            self.abandoned = True
+
+
+def export_consumers(exporters, target, checks):
+    # Streaming consumers that pass each finding or grant through every exporter
+    # and keep only a preview for the in-memory report
+    def consumer(check):
+        def consume(rows):
+            for exporter in exporters:
+                rows = exporter.stream(target, check, rows)
+            return RowSummary(rows)
+        return consume
+    return {check: consumer(check) for check in checks if check in FINDING_CHECKS}
@@ -0,0 +1,85 @@
+import sys
+
+
+def _intern(value):
+    # Schema, table and term names repeat across thousands of findings; interning
+    # stores each distinct name once.
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class Finding:
+    __slots__ = ("schema", "table", "column", "terms", "hits")
+
+    def __init__(self, schema, table, column, terms=None, hits=None):
+        self.schema = _intern(schema)
+        self.table = _intern(table)
+        self.column = column
+        self.terms = _intern(terms)
+        self.hits = hits
+
+    @classmethod
+    def from_row(cls, row):
+        return cls(*row)
+
+    def as_row(self):
+        return [self.schema, self.table, self.column, self.terms, self.hits]
+
+    def as_dict(self):
+        return {"schema": self.schema, "table": self.table, "column": self.column, "terms": self.terms,
+                "hits": self.hits}
+
+    def describe(self):
+        description = f"Table: {self.schema}.{self.table}, Column: {self.column}"
+        if self.terms:
+            description += f", Matched: {self.terms}"
+        if self.hits:
+            description += f" ({self.hits} sampled values)"
+        return description
+
+    def __eq__(self, other):
+        return isinstance(other, Finding) and self.as_row() == other.as_row()
+
+    def __hash__(self):
+        return hash((self.schema, self.table, self.column, self.terms, self.hits))
+
+    def __repr__(self):
+        return f"Finding({self.schema!r}, {self.table!r}, {self.column!r}, {self.terms!r}, {self.hits!r})"
+
+
+class Grant:
+    __slots__ = ("grantee", "privilege", "schema", "object", "state")
+
+    def __init__(self, grantee, privilege, schema=None, object=None, state=None):
+        self.grantee = _intern(grantee)
+        self.privilege = _intern(privilege)
+        self.schema = _intern(schema)
+        self.object = object
+        self.state = _intern(state)
+
+    @classmethod
+    def from_row(cls, row):
+        return cls(*row)
+
+    def as_row(self):
+        return [self.grantee, self.privilege, self.schema, self.object, self.state]
+
+    def as_dict(self):
+        return {"grantee": self.grantee, "privilege": self.privilege, "schema": self.schema, "object": self.object,
+                "state": self.state}
+
+    def describe(self):
+        description = f"Grantee: {self.grantee}, Privilege: {self.privilege}"
+        if self.object:
+            description += f", Object: {self.schema}.{self.object}" if self.schema else f", Object: {self.object}"
+        if self.state:
+            description += f" ({self.state})"
+        return description
+
+    def __eq__(self, other):
+        return isinstance(other, Grant) and self.as_row() == other.as_row()
+
+    def __hash__(self):
+        return hash((self.grantee, self.privilege, self.schema, self.object, self.state))
+
+    def __repr__(self):
+        return f"Grant({self.grantee!r}, {self.privilege!r}, {self.schema!r}, {self.object!r}, {self.state!r})"
@@ -0,0 +1,539 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+from datetime import datetime, timezone
+
+from .check_runner import CANCEL_GRACE, CHECKS, run_checks
+from .connection_pool import close_pool, close_pools, get_pool
+from .incremental import CatalogSnapshotStore, incremental_scan
+from .snapshot import capture
+from .terms import load_term_dictionary
+from .grant_summary import DETAIL_ROWS
+from .privileges import EXPOSURE_CHECK, check_role_exposure
+from .sampling import SAMPLE_CHECK, SamplingBudget, sample_for_sensitive_data
+from .connector_factory import get_database
+from .export import FORMATS, Exporter, export_consumers
+from .history import DEFAULT_HISTORY_PATH
+from .tracing import METRICS_HOST
+
+DEFAULT_THREADS = 16
+DEFAULT_TIMEOUT = 300
+DEFAULT_INSTANCE_THREADS = 8
+
+
+def load_inventory(path, instance=False):
+    with open(path, newline="") as f:
+        if path.endswith(".json"):
+            targets = json.load(f)
+        else:
+            targets = list(csv.DictReader(f))
+    for target in targets:
+        for field in ("type", "host", "port", "database"):
+            if not target.get(field):
+                raise RuntimeError(f"Inventory entry {target} is missing '{field}'.")
+        target.setdefault("name", f"{target['type']}://{target['host']}:{target['port']}/{target['database']}")
+        if instance:
+            target["instance"] = True
+    return targets
+
+
+def resolve_credential(reference):
+    # Inventories only hold references to secrets, never the secrets themselves
+    if not reference:
+        return ""
+    kind, _, value = reference.partition(":")
+    if kind == "env":
+        if value not in os.environ:
+            raise RuntimeError(f"Environment variable {value} is not set.")
+        return os.environ[value]
+    if kind == "file":
+        with open(value) as f:
+            return f.read().strip()
+    raise RuntimeError(f"Unsupported credential reference: {reference}")
+
+
+def to_jsonable(value):
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if hasattr(value, "as_dict"):
+        return value.as_dict()
+    # Lists, tuples and streamed RowSummary previews
+    if hasattr(value, "__iter__"):
+        return [to_jsonable(item) for item in value]
+    return str(value)
+
+
+def target_report(target, status, checks=None, error=None, elapsed=0.0):
+    return {
+        "name": target["name"],
+        "type": target["type"],
+        "host": target["host"],
+        "port": target["port"],
+        "database": target["database"],
+        "status": status,
+        "error": error,
+        "elapsed": round(elapsed, 3),
+        "checks": checks or {},
+    }
+
+
+def snapshot_key(target):
+    return "|".join(str(target.get(field)) for field in ("type", "host", "port", "database", "username"))
+
+
+def prepare_scan(target, snapshot_dir=None, sample_budget=None, exporters=(), terms=None, role_exposure=False,
+                 grant_summary=False):
+    # The connector, the target's connection pool and the run_checks options for a scan
+    db = get_database(target["type"])
+    if terms:
+        db.term_dictionary = load_term_dictionary(terms)
+    password = resolve_credential(target.get("credential"))
+    pool = get_pool(db, target["host"], target["port"], target["database"], target.get("username"), password)
+    checks = list(CHECKS)
+    overrides = {}
+    if snapshot_dir:
+        # Only rescan tables whose catalog change marker moved since the previous run
+        store = CatalogSnapshotStore(snapshot_dir)
+        overrides["scan_for_sensitive_data"] = lambda cursor: incremental_scan(
+            db, cursor, store, snapshot_key(target))
+    if sample_budget:
+        # Budget values are passed around as plain dicts so they can cross process boundaries
+        checks.append(SAMPLE_CHECK)
+        overrides[SAMPLE_CHECK] = lambda cursor: sample_for_sensitive_data(
+            db, cursor, SamplingBudget(**sample_budget))
+    if role_exposure:
+        checks.append(EXPOSURE_CHECK)
+        overrides[EXPOSURE_CHECK] = lambda cursor: check_role_exposure(db, cursor)
+    if grant_summary:
+        # Counts and the riskiest objects are aggregated by the database; no grant rows are fetched
+        overrides["check_access_controls"] = db.summarize_access_controls
+    consumers = on_result = None
+    if exporters:
+        # Findings are written while they stream in; verdicts as each check completes
+        consumers = export_consumers(exporters, target["name"], checks)
+        if grant_summary:
+            del consumers["check_access_controls"]
+
+        def on_result(result):
+            for exporter in exporters:
+                exporter.write_result(target["name"], result)
+    return db, pool, {"checks": checks, "overrides": overrides, "consumers": consumers, "on_result": on_result}
+
+
+@contextmanager
+def target_cursor(target):
+    # A cursor on a connection of its own, for one-off reads outside a scan
+    db = get_database(target["type"])
+    conn = db.connect(target["host"], target["port"], target["database"], target.get("username"),
+                      resolve_credential(target.get("credential")))
+    try:
+        cursor = conn.cursor()
+        try:
+            yield db, cursor
+        finally:
+            cursor.close()
+    finally:
+        conn.close()
+
+
+def capture_target(target, path):
+    # Writes the target's catalog snapshot; checks can then run against the file
+    with target_cursor(target) as (db, cursor):
+        return capture(db, cursor, path, target["name"], target["type"])
+
+
+def grant_details(target, limit=DETAIL_ROWS, offset=0, **filters):
+    # Drill-down behind a --grant-summary count; filters are grantee, privilege, schema and object
+    with target_cursor(target) as (db, cursor):
+        return db.access_control_details(cursor, limit=limit, offset=offset, **filters)
+
+
+def open_connection(pool):
+    # Open one connection up front so an unreachable target fails once, not once per check
+    with pool.connection():
+        pass
+
+
+def checks_report(target, results, elapsed):
+    checks = {
+        check: {
+            "status": result.status,
+            "passed": result.passed,
+            "error": str(result.error) if result.failed else None,
+            "elapsed": round(result.elapsed, 3),
+            "value": to_jsonable(result.value),
+        }
+        for check, result in results.items()
+    }
+    statuses = {result.status for result in results.values()}
+    if statuses == {"passed"}:
+        status = "passed"
+    elif statuses <= {"passed", "timeout"}:
+        status = "timeout"
+    else:
+        status = "failed"
+    return target_report(target, status, checks, elapsed=elapsed)
+
+
+def scan_target(target, snapshot_dir=None, sample_budget=None, tracer=None, exporters=(), check_timeout=None,
+                run_timeout=None, terms=None, role_exposure=False, grant_summary=False, keep_connection=True):
+    # keep_connection leaves one session open for the next sweep; otherwise the
+    # target's pool is closed when the scan ends
+    start = time.monotonic()
+    pool = None
+    try:
+        db, pool, run_options = prepare_scan(target, snapshot_dir, sample_budget, exporters, terms, role_exposure,
+                                             grant_summary)
+        open_connection(pool)
+        # Whatever the connection took comes out of the run's time budget
+        if run_timeout is not None:
+            run_timeout = max(run_timeout - (time.monotonic() - start), 0.001)
+        results = run_checks(db, pool=pool, tracer=tracer, target=target["name"], check_timeout=check_timeout,
+                             run_timeout=run_timeout, **run_options)
+        if keep_connection:
+            # Keep a single warm session per target for the next sweep; idle eviction closes the rest
+            pool.shrink(1)
+    except Exception as e:
+        return target_report(target, "error", error=str(e), elapsed=time.monotonic() - start)
+    finally:
+        if pool is not None and not keep_connection:
+            close_pool(pool)
+    return checks_report(target, results, time.monotonic() - start)
+
+
+def scan_target_with_timeout(target, timeout, **options):
+    # The checks enforce the timeout themselves through native statement timeouts and
+    # report the ones that ran out of time. The scan also runs on a daemon thread so a
+    # host that hangs while connecting is abandoned instead of holding a worker (or
+    # interpreter exit) hostage.
+    runs = begin_exports(target, options.get("exporters", ()))
+    outcome = {}
+    worker = threading.Thread(target=lambda: outcome.update(report=scan_target(
+        target, run_timeout=timeout, **dict(options, exporters=runs))), daemon=True)
+    worker.start()
+    worker.join(timeout + 2 * CANCEL_GRACE)
+    # The report is final; whatever an abandoned scan or check still produces is dropped
+    abandon_exports(runs)
+    report = outcome.get("report") or target_report(
+        target, "timeout", error=f"Scan did not finish within {timeout} seconds.", elapsed=timeout)
+    finish_exports(report, options.get("exporters", ()))
+    return report
+
+
+def is_instance_target(target):
+    return str(target.get("instance", "")).lower() in ("1", "true", "yes")
+
+
+def list_instance_databases(target, keep_connection=True):
+    db = get_database(target["type"])
+    if db.catalog_spans_instance:
+        return db, [target["database"]]
+    password = resolve_credential(target.get("credential"))
+    pool = get_pool(db, target["host"], target["port"], target["database"], target.get("username"), password)
+    try:
+        with pool.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                # A server without separate databases (e.g. an Oracle non-CDB) is scanned as it is
+                return db, db.list_databases(cursor) or [target["database"]]
+            finally:
+                cursor.close()
+    finally:
+        if not keep_connection:
+            close_pool(pool)
+
+
+def scan_instance(target, timeout, instance_threads=DEFAULT_INSTANCE_THREADS, **options):
+    # Scans every database on the target's server, instance_threads at a time, each
+    # with its own timeout, and aggregates them into one instance report.
+    start = time.monotonic()
+    try:
+        db, databases = list_instance_databases(target, options.get("keep_connection", True))
+    except Exception as e:
+        return target_report(target, "error", error=str(e), elapsed=time.monotonic() - start)
+
+    if db.catalog_spans_instance:
+        # One connection already sees every schema; its findings name their schema
+        reports = [scan_target_with_timeout(target, timeout, **options)]
+    else:
+        database_targets = [dict(target, database=database, name=f"{target['name']}/{database}")
+                            for database in databases]
+        with ThreadPoolExecutor(max_workers=instance_threads, thread_name_prefix="hipaa-instance") as executor:
+            reports = list(executor.map(lambda database_target: scan_target_with_timeout(
+                database_target, timeout, **options), database_targets))
+
+    return instance_report(target, reports, time.monotonic() - start)
+
+
+def instance_report(target, reports, elapsed):
+    statuses = {report["status"] for report in reports}
+    status = next((status for status in ("failed", "error", "timeout") if status in statuses), "passed")
+    report = target_report(target, status, elapsed=elapsed)
+    report["summary"] = summarize(reports)
+    report["databases"] = reports
+    return report
+
+
+def scan_any(target, timeout, instance_threads=DEFAULT_INSTANCE_THREADS, **options):
+    if is_instance_target(target):
+        return scan_instance(target, timeout, instance_threads, **options)
+    return scan_target_with_timeout(target, timeout, **options)
+
+
+def scan_targets(targets, threads=DEFAULT_THREADS, timeout=DEFAULT_TIMEOUT, **options):
+    with ThreadPoolExecutor(max_workers=threads, thread_name_prefix="hipaa-fleet") as executor:
+        return list(executor.map(lambda target: scan_any(target, timeout, **options), targets))
+
+
+def begin_exports(target, exporters):
+    return [exporter.begin(target["name"]) for exporter in exporters]
+
+
+def abandon_exports(runs):
+    for run in runs:
+        run.abandon()
+
+
+def finish_exports(report, exporters):
+    for exporter in exporters:
+        exporter.write_report(report)
+        exporter.finish(report["name"])
+
+
+async def scan_target_async(target, timeout, snapshot_dir=None, sample_budget=None, tracer=None, exporters=(),
+                            check_timeout=None, terms=None, role_exposure=False, grant_summary=False,
+                            keep_connection=True):
+    # scan_target_with_timeout on the event loop: connecting and every check run as
+    # blocking calls under the global limiter of async_connector. asyncio is only
+    # imported by the event loop scans; it would double the command line's start up.
+    import asyncio
+    from .async_connector import AsyncConnector, run_blocking
+
+    runs = begin_exports(target, exporters)
+    start = time.monotonic()
+    pool = None
+    try:
+        db, pool, run_options = prepare_scan(target, snapshot_dir, sample_budget, runs, terms, role_exposure,
+                                             grant_summary)
+        await asyncio.wait_for(run_blocking(open_connection, pool), timeout)
+        run_timeout = max(timeout - (time.monotonic() - start), 0.001)
+        results = await AsyncConnector(db).run_checks(pool, tracer=tracer, target=target["name"],
+                                                      check_timeout=check_timeout, run_timeout=run_timeout,
+                                                      **run_options)
+        if keep_connection:
+            await run_blocking(pool.shrink, 1)
+        report = checks_report(target, results, time.monotonic() - start)
+    except asyncio.TimeoutError:
+        report = target_report(target, "timeout", error=f"Scan did not finish within {timeout} seconds.",
+                               elapsed=time.monotonic() - start)
+    except Exception as e:
+        report = target_report(target, "error", error=str(e), elapsed=time.monotonic() - start)
+    # Checks still running on their threads must not export after the report
+    abandon_exports(runs)
+    if pool is not None and not keep_connection:
+        await run_blocking(close_pool, pool)
+    finish_exports(report, exporters)
+    return report
+
+
+async def scan_any_async(target, timeout, instance_threads=None, **options):
+    # Databases of an instance are scanned concurrently; the global limiter bounds them
+    import asyncio
+    from .async_connector import run_blocking
+
+    if not is_instance_target(target):
+        return await scan_target_async(target, timeout, **options)
+    start = time.monotonic()
+    try:
+        db, databases = await run_blocking(list_instance_databases, target, options.get("keep_connection", True))
+    except Exception as e:
+        return target_report(target, "error", error=str(e), elapsed=time.monotonic() - start)
+    if db.catalog_spans_instance:
+        database_targets = [target]
+    else:
+        database_targets = [dict(target, database=database, name=f"{target['name']}/{database}")
+                            for database in databases]
+    reports = await asyncio.gather(*(scan_target_async(database_target, timeout, **options)
+                                     for database_target in database_targets))
+    return instance_report(target, list(reports), time.monotonic() - start)
+
+
+def scan_targets_async(targets, threads=DEFAULT_THREADS, timeout=DEFAULT_TIMEOUT, concurrency=None, **options):
+    # Multiplexes the targets on one event loop, threads of them at a time; their
+    # timeouts start when they are admitted. concurrency bounds the blocking
+    # database calls in flight across all of them.
+    import asyncio
+    from .async_connector import set_concurrency
+
+    if concurrency is not None:
+        set_concurrency(concurrency)
+
+    async def scan_all():
+        admitted = asyncio.Semaphore(threads)
+
+        async def scan(target):
+            async with admitted:
+                return await scan_any_async(target, timeout, **options)
+        return await asyncio.gather(*(scan(target) for target in targets))
+    return list(asyncio.run(scan_all()))
+
+
+def scan_fleet(targets, threads=DEFAULT_THREADS, processes=1, timeout=DEFAULT_TIMEOUT, concurrency=None, **options):
+    # options are passed on to scan_target (snapshot_dir, sample_budget, tracer, exporters, check_timeout,
+    # terms, role_exposure, grant_summary, keep_connection) and scan_instance (instance_threads). With
+    # concurrency each process runs its targets on an event loop instead of a thread per target.
+    scan = scan_targets if concurrency is None else partial(scan_targets_async, concurrency=concurrency)
+    if processes <= 1 or len(targets) <= 1:
+        return scan(targets, threads, timeout, **options)
+    if options.get("tracer") is not None:
+        raise RuntimeError("Query tracing is only supported with a single process.")
+    if not all(exporter.shareable for exporter in options.get("exporters", ())):
+        raise RuntimeError("Exports from several processes must be split per target.")
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    # Spread targets round-robin over the processes, each running its own thread pool
+    chunks = [targets[i::processes] for i in range(processes)]
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        chunk_reports = list(executor.map(partial(_scan_chunk, scan, threads=threads, timeout=timeout, **options),
+                                          chunks))
+
+    reports = [None] * len(targets)
+    for i, chunk in enumerate(chunk_reports):
+        reports[i::processes] = chunk
+    return reports
+
+
+def _scan_chunk(scan, targets, **options):
+    # A worker process's share of the targets; its pools close before it is reused or exits
+    try:
+        return scan(targets, **options)
+    finally:
+        close_pools()
+
+
+def summarize(reports):
+    summary = {"targets": len(reports), "passed": 0, "failed": 0, "error": 0, "timeout": 0}
+    for report in reports:
+        summary[report["status"]] += 1
+    return summary
+
+
+def write_results(reports, output):
+    result = {
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "summary": summarize(reports),
+        "targets": reports,
+    }
+    if output == "-":
+        json.dump(result, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    else:
+        with open(output, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+def add_scan_options(parser):
+    parser.add_argument("--incremental-dir", help="Keep catalog snapshots here and only rescan changed tables")
+    parser.add_argument("--sample", action="store_true",
+                        help="Also sample table contents for PHI stored in innocuously named columns")
+    parser.add_argument("--sample-rows", type=int, default=10000, help="Row budget per target for --sample")
+    parser.add_argument("--sample-bytes", type=int, default=5 * 1024 * 1024, help="Byte budget per target for --sample")
+    parser.add_argument("--sample-seconds", type=float, default=60, help="Time budget per target for --sample")
+    parser.add_argument("--trace", help="Write a JSON trace (Chrome trace event format) of every query to this file")
+    parser.add_argument("--metrics-port", type=int, help="Serve Prometheus metrics on this port while scanning")
+    parser.add_argument("--metrics-host", default=METRICS_HOST,
+                        help="Address to serve the metrics on (default: %(default)s); 0.0.0.0 exposes them, "
+                             "unauthenticated, on every interface")
+    parser.add_argument("--instance-threads", type=int, default=DEFAULT_INSTANCE_THREADS,
+                        help="Databases scanned at a time on a server scanned with --instance")
+    parser.add_argument("--role-exposure", action="store_true",
+                        help="Also list every user and role that can read a table with sensitive columns, "
+                             "through nested role memberships")
+    parser.add_argument("--grant-summary", action="store_true",
+                        help="Report grants as counts per grantee, privilege and schema and the riskiest objects, "
+                             "aggregated by the database instead of listing every grant")
+    parser.add_argument("--terms", help="JSON term dictionary to match column names against instead of the built-in one")
+    parser.add_argument("--check-timeout", type=float,
+                        help="Seconds each check may take, enforced with the database's statement timeout")
+    parser.add_argument("--export", help="Stream verdicts, findings and grants to this file (or directory with --export-per-target)")
+    parser.add_argument("--export-format", choices=FORMATS, help="Export format (default: from the file extension, else jsonl)")
+    parser.add_argument("--export-compression",
+                        help="gzip, bz2 or xz for jsonl and csv; snappy, gzip, zstd, brotli or lz4 for parquet")
+    parser.add_argument("--export-per-target", action="store_true",
+                        help="Write one file per target under --export, appending to it on later runs")
+    parser.add_argument("--history", nargs="?", const=DEFAULT_HISTORY_PATH,
+                        help=f"Record this run in a scan history database (default: {DEFAULT_HISTORY_PATH})")
+
+
+def scan_options(args, tracer=None):
+    options = {"snapshot_dir": args.incremental_dir, "tracer": tracer, "exporters": [],
+               "check_timeout": args.check_timeout, "instance_threads": args.instance_threads, "terms": args.terms,
+               "role_exposure": args.role_exposure, "grant_summary": args.grant_summary}
+    if args.export:
+        options["exporters"].append(
+            Exporter(args.export, args.export_format, args.export_compression, args.export_per_target))
+    if args.history:
+        options["exporters"].append(Exporter(args.history, "sqlite"))
+    if args.sample:
+        options["sample_budget"] = {"max_rows": args.sample_rows, "max_bytes": args.sample_bytes,
+                                    "max_seconds": args.sample_seconds}
+    return options
+
+
+def close_exports(options):
+    for exporter in options.get("exporters", ()):
+        exporter.close()
+
+
+def build_parser(parser=None):
+    parser = parser or argparse.ArgumentParser(description="Run HIPAA compliance checks across a fleet of databases.")
+    parser.add_argument("inventory", help="CSV or JSON inventory with type, host, port, database, username and credential columns")
+    parser.add_argument("-o", "--output", default="-", help="Where to write the consolidated JSON results (default: stdout)")
+    parser.add_argument("--threads", type=int, default=DEFAULT_THREADS, help="Concurrent targets per process")
+    parser.add_argument("--processes", type=int, default=1, help="Number of worker processes")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT, help="Per-target timeout in seconds")
+    parser.add_argument("--async-concurrency", type=int, metavar="N",
+                        help="Multiplex the targets on an event loop per process, with at most N database calls "
+                             "in flight; --threads then sets the targets in flight")
+    parser.add_argument("--instance", action="store_true",
+                        help="Scan every database on each target's server (or set an 'instance' column per target)")
+    add_scan_options(parser)
+    return parser
+
+
+def start_tracing(args):
+    if not args.trace and args.metrics_port is None:
+        return None
+    from .tracing import Tracer, serve_metrics
+    tracer = Tracer()
+    if args.metrics_port is not None:
+        serve_metrics(tracer, args.metrics_port, args.metrics_host)
+    return tracer
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    tracer = start_tracing(args)
+    options = scan_options(args, tracer)
+    try:
+        reports = scan_fleet(load_inventory(args.inventory, args.instance), args.threads, args.processes, args.timeout,
+                             args.async_concurrency, **options)
+    finally:
+        close_exports(options)
+        close_pools()
+    write_results(reports, args.output)
+    if args.trace:
+        tracer.write_json(args.trace)
+    return 0 if all(report["status"] == "passed" for report in reports) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
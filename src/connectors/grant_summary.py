@@ -0,0 +1,93 @@
+from collections import Counter
+
+from .findings import Grant
+
+# Summary mode reports grants as counts instead of rows: per grantee, privilege and
+# schema, plus the objects whose grants add up to the most risk. The rows behind any
+# count are fetched on demand with DBConnector.access_control_details.
+SUMMARY_FIELDS = ("grantee", "privilege", "schema")
+TOP_OBJECTS = 20
+DETAIL_ROWS = 100
+
+# Ownership and DDL outrank writes, writes outrank reads; the rest (REFERENCES, INDEX,
+# TRIGGER, ...) expose no data
+PRIVILEGE_RISK = {"CONTROL": 8, "TAKE OWNERSHIP": 8, "ALTER": 6, "DROP": 6, "TRUNCATE": 4, "DELETE": 4,
+                  "UPDATE": 3, "INSERT": 3, "SELECT": 2, "READ": 2}
+DEFAULT_RISK = 1
+
+
+def privilege_risk(privilege):
+    return PRIVILEGE_RISK.get(privilege, DEFAULT_RISK)
+
+
+def risk_expression(column):
+    # PRIVILEGE_RISK as SQL, so the database ranks the objects the same way
+    cases = " ".join(f"WHEN '{privilege}' THEN {risk}" for privilege, risk in PRIVILEGE_RISK.items())
+    return f"CASE {column} {cases} ELSE {DEFAULT_RISK} END"
+
+
+class GrantSummary:
+    # The check_access_controls result in summary mode. counts are (field, value, count)
+    # rows and objects (schema, object, grants, risk) rows, riskiest first. It counts as
+    # its number of grants, so the check fails as it would on the full list.
+    def __init__(self, counts, objects):
+        self.counts = {field: Counter() for field in SUMMARY_FIELDS}
+        for field, value, count in counts:
+            self.counts[field][value] += int(count)
+        self.objects = [(schema, name, int(grants), int(risk)) for schema, name, grants, risk in objects]
+        self.count = sum(self.counts["grantee"].values())
+
+    @classmethod
+    def from_grants(cls, grants, top=TOP_OBJECTS):
+        # The same summary computed client-side, for connectors that hold their grants in memory
+        counts = {field: Counter() for field in SUMMARY_FIELDS}
+        objects = {}
+        for grant in grants:
+            counts["grantee"][grant.grantee] += 1
+            counts["privilege"][grant.privilege] += 1
+            counts["schema"][grant.schema] += 1
+            if grant.object is not None:
+                key = (grant.schema, grant.object)
+                total, risk = objects.get(key, (0, 0))
+                objects[key] = (total + 1, risk + privilege_risk(grant.privilege))
+        ranked = sorted(objects.items(), key=lambda item: (-item[1][1], -item[1][0], str(item[0])))[:top]
+        return cls([(field, value, count) for field, counter in counts.items() for value, count in counter.items()],
+                   [key + value for key, value in ranked])
+
+    @property
+    def truncated(self):
+        return self.count > 0
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        # Holds no grant rows; drill down for those
+        return iter(())
+
+    def ranked(self, field):
+        # Most common first; ties in name order, however the rows arrived
+        return sorted(self.counts[field].items(), key=lambda item: (-item[1], str(item[0])))
+
+    def summary(self, field):
+        import pandas as pd
+        return pd.DataFrame(self.ranked(field), columns=[field, "count"])
+
+    def as_dict(self):
+        summary = {"grants": self.count}
+        for field in SUMMARY_FIELDS:
+            summary[f"by_{field}"] = [{field: value, "count": count} for value, count in self.ranked(field)]
+        summary["top_objects"] = [{"schema": schema, "object": name, "grants": grants, "risk": risk}
+                                  for schema, name, grants, risk in self.objects]
+        return summary
+
+
+def filter_grants(grants, grantee=None, privilege=None, schema=None, object=None, limit=DETAIL_ROWS, offset=0):
+    # Client-side drill-down over Grant records, in the order the SQL one returns them
+    selected = [grant for grant in grants
+                if (grantee is None or grant.grantee == grantee) and (privilege is None or grant.privilege == privilege)
+                and (schema is None or grant.schema == schema) and (object is None or grant.object == object)]
+    selected.sort(key=lambda grant: tuple(str(value) for value in
+                                          (grant.schema, grant.object, grant.grantee, grant.privilege)))
+    return [Grant(grant.grantee, grant.privilege, grant.schema, grant.object) for grant in
+            selected[offset:offset + limit]]
@@ -0,0 +1,228 @@
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta, timezone
+
+DEFAULT_HISTORY_PATH = os.path.join(os.path.expanduser("~"), ".hipaa-diagnoser", "history.db")
+
+HISTORY_BATCH_ROWS = 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    target TEXT NOT NULL,
+    started_at TEXT NOT NULL,
+    status TEXT,
+    error TEXT,
+    elapsed REAL,
+    UNIQUE (target, started_at)
+);
+CREATE INDEX IF NOT EXISTS runs_started_at ON runs (started_at);
+CREATE TABLE IF NOT EXISTS verdicts (
+    run_id INTEGER NOT NULL REFERENCES runs (id) ON DELETE CASCADE,
+    check_name TEXT NOT NULL,
+    status TEXT,
+    passed INTEGER,
+    error TEXT,
+    elapsed REAL,
+    PRIMARY KEY (run_id, check_name)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS verdicts_check ON verdicts (check_name, run_id);
+CREATE TABLE IF NOT EXISTS findings (
+    run_id INTEGER NOT NULL REFERENCES runs (id) ON DELETE CASCADE,
+    check_name TEXT NOT NULL,
+    schema_name TEXT,
+    table_name TEXT,
+    column_name TEXT,
+    terms TEXT,
+    hits INTEGER
+);
+CREATE INDEX IF NOT EXISTS findings_run ON findings (run_id, check_name, schema_name, table_name, column_name);
+CREATE INDEX IF NOT EXISTS findings_table ON findings (schema_name, table_name);
+CREATE TABLE IF NOT EXISTS grants (
+    run_id INTEGER NOT NULL REFERENCES runs (id) ON DELETE CASCADE,
+    check_name TEXT NOT NULL,
+    grantee TEXT,
+    privilege TEXT,
+    schema_name TEXT,
+    object_name TEXT,
+    state TEXT
+);
+CREATE INDEX IF NOT EXISTS grants_run ON grants (run_id, grantee, privilege, schema_name, object_name);
+"""
+
+
+class History:
+    # Every run of every target, with its verdicts, findings and grants, in one
+    # SQLite file. Runs are keyed by target and start time, so the previous run
+    # of a target is an index lookup and diffs only touch two runs.
+    def __init__(self, path=DEFAULT_HISTORY_PATH):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        if path != ":memory:":
+            # WAL lets queries run while a scan is recording; NORMAL sync is durable in WAL mode
+            self.conn.execute("PRAGMA journal_mode = WAL")
+            self.conn.execute("PRAGMA synchronous = NORMAL")
+        self.conn.execute("PRAGMA busy_timeout = 10000")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return [dict(row) for row in self.conn.execute(sql, params)]
+
+    def begin_run(self, target, started_at):
+        with self._lock, self.conn:
+            self.conn.execute("INSERT OR IGNORE INTO runs (target, started_at) VALUES (?, ?)", (target, started_at))
+            return self.conn.execute("SELECT id FROM runs WHERE target = ? AND started_at = ?",
+                                     (target, started_at)).fetchone()[0]
+
+    def finish_run(self, run_id, status, error=None, elapsed=None):
+        with self._lock, self.conn:
+            self.conn.execute("UPDATE runs SET status = ?, error = ?, elapsed = ? WHERE id = ?",
+                              (status, error, elapsed, run_id))
+
+    def add_rows(self, verdicts=(), findings=(), grants=()):
+        with self._lock, self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO verdicts VALUES (?, ?, ?, ?, ?, ?)", verdicts)
+            self.conn.executemany("INSERT INTO findings VALUES (?, ?, ?, ?, ?, ?, ?)", findings)
+            self.conn.executemany("INSERT INTO grants VALUES (?, ?, ?, ?, ?, ?, ?)", grants)
+
+    def runs(self, target=None, limit=20):
+        if target is None:
+            return self._query("SELECT * FROM runs ORDER BY started_at DESC LIMIT ?", (limit,))
+        return self._query("SELECT * FROM runs WHERE target = ? ORDER BY started_at DESC LIMIT ?", (target, limit))
+
+    def targets(self):
+        return [row["target"] for row in self._query("SELECT DISTINCT target FROM runs ORDER BY target")]
+
+    def _last_two_runs(self, target, check):
+        # Runs where the check ran without an error; a failed connection is not "everything was fixed"
+        return [row["id"] for row in self._query("""
+            SELECT r.id FROM runs r
+            JOIN verdicts v ON v.run_id = r.id AND v.check_name = ? AND v.error IS NULL
+            WHERE r.target = ?
+            ORDER BY r.started_at DESC LIMIT 2
+        """, (check, target))]
+
+    def _finding_diff(self, current, previous, check):
+        return self._query("""
+            SELECT f.schema_name, f.table_name, f.column_name, f.terms, f.hits FROM findings f
+            WHERE f.run_id = ? AND f.check_name = ?
+            AND NOT EXISTS (
+                SELECT 1 FROM findings p
+                WHERE p.run_id = ? AND p.check_name = f.check_name AND p.schema_name = f.schema_name
+                AND p.table_name = f.table_name AND p.column_name = f.column_name)
+            ORDER BY f.schema_name, f.table_name, f.column_name
+        """, (current, check, previous))
+
+    def new_findings(self, target, check="scan_for_sensitive_data"):
+        runs = self._last_two_runs(target, check)
+        if len(runs) < 2:
+            return []
+        return self._finding_diff(runs[0], runs[1], check)
+
+    def removed_findings(self, target, check="scan_for_sensitive_data"):
+        runs = self._last_two_runs(target, check)
+        if len(runs) < 2:
+            return []
+        return self._finding_diff(runs[1], runs[0], check)
+
+    def flipped_checks(self, check, since=None):
+        # Every change of a check's verdict between consecutive runs of a target
+        return self._query("""
+            WITH ordered AS (
+                SELECT r.target, r.started_at, v.passed,
+                    LAG(v.passed) OVER (PARTITION BY r.target ORDER BY r.started_at) AS previous
+                FROM verdicts v
+                JOIN runs r ON r.id = v.run_id
+                WHERE v.check_name = ? AND v.error IS NULL
+            )
+            SELECT target, started_at, previous AS was_passed, passed FROM ordered
+            WHERE previous IS NOT NULL AND previous != passed AND started_at >= ?
+            ORDER BY started_at
+        """, (check, since or ""))
+
+    def prune(self, older_than_days=None, keep_runs=None):
+        # Runs older than the cutoff or beyond the newest keep_runs of their target are
+        # deleted, but the latest run of every target is always kept so diffs keep working
+        conditions = []
+        params = []
+        if older_than_days is not None:
+            cutoff = datetime.now(timezone.utc) - timedelta(days=older_than_days)
+            conditions.append("started_at < ?")
+            params.append(cutoff.isoformat())
+        if keep_runs is not None:
+            conditions.append("run_rank > ?")
+            params.append(keep_runs)
+        if not conditions:
+            return 0
+        with self._lock, self.conn:
+            return self.conn.execute(f"""
+                DELETE FROM runs WHERE id IN (
+                    SELECT id FROM (
+                        SELECT id, started_at,
+                            ROW_NUMBER() OVER (PARTITION BY target ORDER BY started_at DESC) AS run_rank
+                        FROM runs)
+                    WHERE run_rank > 1 AND ({" OR ".join(conditions)}))
+            """, params).rowcount
+
+    def compact(self):
+        # Returns the space freed by pruning to the filesystem and refreshes planner statistics
+        with self._lock:
+            self.conn.execute("PRAGMA optimize")
+            self.conn.execute("VACUUM")
+            if self.path != ":memory:":
+                self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+
+class HistoryWriter:
+    # An export writer (see export.py) that files the flat export records into a History
+    def __init__(self, path, compression=None):
+        self.history = History(path)
+        self._runs = {}
+        self._pending = {"verdict": [], "finding": [], "grant": []}
+        self._count = 0
+
+    def _run(self, record):
+        key = (record["target"], record["scanned_at"])
+        if key not in self._runs:
+            self._runs[key] = self.history.begin_run(*key)
+        return self._runs[key]
+
+    def write(self, record):
+        run_id = self._run(record)
+        kind = record["record"]
+        if kind == "target":
+            self.flush()
+            self.history.finish_run(run_id, record["status"], record["error"], record["elapsed"])
+            return
+        if kind == "verdict":
+            row = (run_id, record["check"], record["status"], record["passed"], record["error"], record["elapsed"])
+        elif kind == "finding":
+            row = (run_id, record["check"], record["schema"], record["table"], record["column"], record["terms"],
+                   record["hits"])
+        else:
+            row = (run_id, record["check"], record["grantee"], record["privilege"], record["schema"],
+                   record["object"], record["state"])
+        self._pending[kind].append(row)
+        self._count += 1
+        if self._count >= HISTORY_BATCH_ROWS:
+            self.flush()
+
+    def flush(self):
+        if self._count:
+            self.history.add_rows(self._pending["verdict"], self._pending["finding"], self._pending["grant"])
+            self._pending = {"verdict": [], "finding": [], "grant": []}
+            self._count = 0
+
+    def close(self):
+        self.flush()
+        self.history.close()
@@ -0,0 +1,66 @@
+import hashlib
+import json
+import os
+import threading
+
+from .findings import Finding
+
+DEFAULT_SNAPSHOT_DIRECTORY = os.path.join(os.path.expanduser("~"), ".hipaa-diagnoser", "snapshots")
+
+
+class CatalogSnapshotStore:
+    # One JSON file per target holding the table change markers and the findings
+    # they produced, so the next scan only has to look at tables that changed.
+    def __init__(self, directory=DEFAULT_SNAPSHOT_DIRECTORY):
+        self.directory = directory
+        self._lock = threading.Lock()
+
+    def _path(self, target_key):
+        return os.path.join(self.directory, hashlib.sha256(target_key.encode()).hexdigest() + ".json")
+
+    def load(self, target_key):
+        try:
+            with open(self._path(target_key)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save(self, target_key, snapshot):
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+        path = self._path(target_key)
+        with open(path + ".tmp", "w") as f:
+            json.dump(snapshot, f)
+        os.replace(path + ".tmp", path)
+
+
+def table_key(finding):
+    return finding.schema, finding.table
+
+
+def terms_digest(db):
+    return db.term_matcher().digest
+
+
+def incremental_scan(db, cursor, store, target_key):
+    versions = {(schema, table): str(marker) for schema, table, marker in db.get_table_versions(cursor)}
+    previous = store.load(target_key)
+
+    if previous is None or previous.get("terms") != terms_digest(db):
+        findings = list(db.scan_for_sensitive_data(cursor))
+    else:
+        old_versions = {tuple(key): marker for key, marker in previous["versions"]}
+        changed = {key for key, marker in versions.items() if old_versions.get(key) != marker}
+        # Keep findings for tables that still exist and did not change, rescan the rest
+        findings = [finding for finding in map(Finding.from_row, previous["findings"])
+                    if table_key(finding) in versions and table_key(finding) not in changed]
+        if changed:
+            rescanned = db.scan_for_sensitive_data(cursor, tables=sorted({key[-1] for key in changed}))
+            findings.extend(finding for finding in rescanned if table_key(finding) in changed)
+
+    store.save(target_key, {
+        "terms": terms_digest(db),
+        "versions": [[list(key), marker] for key, marker in versions.items()],
+        "findings": [finding.as_row() for finding in findings],
+    })
+    return findings
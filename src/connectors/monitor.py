@@ -0,0 +1,169 @@
+import heapq
+import itertools
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from .fleet import DEFAULT_TIMEOUT, scan_any, target_report
+
+DEFAULT_INTERVAL = 3600
+DEFAULT_MIN_INTERVAL = 300
+DEFAULT_MAX_INTERVAL = 24 * 3600
+DEFAULT_CONCURRENCY = 8
+# Every delay is drawn from interval * (1 +/- jitter), so targets never fall into lockstep
+DEFAULT_JITTER = 0.1
+# A target whose verdicts hold stretches its interval by this much per scan; a failed
+# scan (error or timeout) shrinks it by FAILURE_FACTOR and a changed verdict resets it
+STABLE_GROWTH = 1.5
+FAILURE_FACTOR = 0.5
+
+FAILED_STATUSES = ("error", "timeout")
+
+
+def verdicts(report):
+    # Status per (database, check): (None, None) is the target itself, instance reports
+    # add their databases' checks under the database's name
+    statuses = {(None, None): report["status"]}
+    for check, result in report["checks"].items():
+        statuses[None, check] = result["status"]
+    for database in report.get("databases", []):
+        for check, result in database["checks"].items():
+            statuses[database["name"], check] = result["status"]
+    return statuses
+
+
+def _check_error(report, database, check):
+    if check is None:
+        return report["error"]
+    if database is not None:
+        report = next(report for report in report["databases"] if report["name"] == database)
+    return report["checks"][check]["error"]
+
+
+class TargetSchedule:
+    def __init__(self, target, interval):
+        self.target = target
+        self.interval = interval
+        # Last known status per (database, check); a scan that errors out only updates
+        # the target's own status, so the checks compare against their last real verdict
+        self.verdicts = {}
+        self.scans = 0
+
+    def transitions(self, report):
+        current = verdicts(report)
+        events = []
+        at = datetime.now(timezone.utc).isoformat()
+        for (database, check), status in current.items():
+            previous = self.verdicts.get((database, check))
+            if previous is not None and previous != status:
+                events.append({"at": at, "target": self.target["name"], "database": database, "check": check,
+                               "previous": previous, "current": status,
+                               "error": _check_error(report, database, check)})
+        self.verdicts.update(current)
+        self.scans += 1
+        return events
+
+
+class Monitor:
+    # Rescans its targets until stopped, at most concurrency at a time, and reports every
+    # verdict that changes between two scans of a target to on_event. Each target keeps
+    # its own interval between min_interval and max_interval: back to min_interval after
+    # a change, shorter after a failed scan, longer while nothing changes. scan and
+    # options are what fleet.scan_any takes.
+    def __init__(self, targets, interval=DEFAULT_INTERVAL, min_interval=DEFAULT_MIN_INTERVAL,
+                 max_interval=DEFAULT_MAX_INTERVAL, concurrency=DEFAULT_CONCURRENCY, jitter=DEFAULT_JITTER,
+                 timeout=DEFAULT_TIMEOUT, on_event=None, on_report=None, scan=scan_any, seed=None, **options):
+        if not 0 < min_interval <= interval <= max_interval:
+            raise RuntimeError("Intervals must satisfy 0 < min_interval <= interval <= max_interval.")
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.concurrency = concurrency
+        self.jitter = jitter
+        self.timeout = timeout
+        self.on_event = on_event
+        self.on_report = on_report
+        self.scan = scan
+        # Rounds are minutes or hours apart, so no session is kept open between them
+        self.options = dict(options, keep_connection=False)
+        self.running = 0
+        self._random = random.Random(seed)
+        self._queue = []
+        self._order = itertools.count()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        now = time.monotonic()
+        for target in targets:
+            # The first sweep is spread over min_interval rather than started all at once
+            self._enqueue(TargetSchedule(target, interval), now + self._random.uniform(0, min_interval))
+
+    def _enqueue(self, schedule, due):
+        heapq.heappush(self._queue, (due, next(self._order), schedule))
+
+    def next_interval(self, interval, changed, failed):
+        if changed:
+            return self.min_interval
+        if failed:
+            return max(self.min_interval, interval * FAILURE_FACTOR)
+        return min(self.max_interval, interval * STABLE_GROWTH)
+
+    def jittered(self, interval):
+        return interval * self._random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def due(self):
+        # (monotonic due time, target name) of every target not being scanned right now
+        with self._lock:
+            return sorted((due, schedule.target["name"]) for due, _, schedule in self._queue)
+
+    def dispatch(self, submit, now):
+        # Starts the due scans that fit under the concurrency limit through submit(fn, *args).
+        # Returns the seconds until the next one is due, or None when only a finishing
+        # scan can free a slot.
+        with self._lock:
+            while self._queue and self.running < self.concurrency and self._queue[0][0] <= now:
+                _, _, schedule = heapq.heappop(self._queue)
+                self.running += 1
+                submit(self._scan, schedule)
+            if not self._queue or self.running >= self.concurrency:
+                return None
+            return max(self._queue[0][0] - now, 0)
+
+    def _scan(self, schedule):
+        try:
+            report = self.scan(schedule.target, self.timeout, **self.options)
+        except Exception as e:
+            report = target_report(schedule.target, "error", error=str(e))
+        self.complete(schedule, report, time.monotonic())
+
+    def complete(self, schedule, report, now):
+        # Records a finished scan, schedules the next one and emits the verdict changes
+        try:
+            events = schedule.transitions(report)
+            with self._lock:
+                schedule.interval = self.next_interval(schedule.interval, bool(events),
+                                                       report["status"] in FAILED_STATUSES)
+                self._enqueue(schedule, now + self.jittered(schedule.interval))
+        finally:
+            with self._lock:
+                self.running -= 1
+            self._wake.set()
+        if self.on_report is not None:
+            self.on_report(report)
+        if self.on_event is not None:
+            for event in events:
+                self.on_event(event)
+        return events
+
+    def run(self):
+        # Blocks until stop() is called; the scans running at that point are finished first
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="hipaa-monitor") as executor:
+            while not self._stop.is_set():
+                delay = self.dispatch(executor.submit, time.monotonic())
+                self._wake.wait(delay)
+                self._wake.clear()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
@@ -1,8 +1,20 @@
 import mysql.connector
 from .db_connector import DBConnector
+from .findings import Grant
 
 
 class MySQLConnector(DBConnector):
+    dialect = "mysql"
+
+    # INFORMATION_SCHEMA covers every schema on the server, so one connection sees the whole instance
+    catalog_spans_instance = True
+
+    # Global privileges belong to no schema or object
+    grant_query = """
+        SELECT grantee, privilege_type AS privilege, NULL AS object_schema, NULL AS object_name
+        FROM information_schema.USER_PRIVILEGES WHERE grantee='PUBLIC'
+    """
+
     def connect(self, host, port, database, username, password):
         return mysql.connector.connect(
             host=host,
@@ -12,39 +24,97 @@ class MySQLConnector(DBConnector):
             port=port
         )
 
-    def scan_for_sensitive_data(self, cursor):
-        cursor.execute(
-            "SELECT TABLE_SCHEMA, TABLE_NAME, COLUMN_NAME FROM INFORMATION_SCHEMA.COLUMNS WHERE COLUMN_NAME LIKE '%patient%'")
-        sensitive_data = cursor.fetchall()
+    def list_databases(self, cursor):
+        cursor.execute("""
+            SELECT SCHEMA_NAME FROM INFORMATION_SCHEMA.SCHEMATA
+            WHERE SCHEMA_NAME NOT IN ('mysql', 'information_schema', 'performance_schema', 'sys')
+            ORDER BY SCHEMA_NAME
+        """)
+        return [row[0] for row in cursor.fetchall()]
 
-        additional_terms = ["medical condition", "ssn", "dob", "address", "phone number", "email address",
-                            "medical procedure", "healthcare provider", "medication name", "insurance information",
-                            "lab result", "genetic information", "payment information"]
-        for term in additional_terms:
-            cursor.execute(
-                f"SELECT TABLE_SCHEMA, TABLE_NAME, COLUMN_NAME FROM INFORMATION_SCHEMA.COLUMNS WHERE COLUMN_NAME LIKE '%{term}%'")
-            sensitive_data.extend(cursor.fetchall())
+    def set_query_timeout(self, conn, seconds):
+        # max_execution_time applies to SELECT statements, which is all the checks run
+        milliseconds = 0 if seconds is None else max(1, int(seconds * 1000))
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SET SESSION max_execution_time = %s", (milliseconds,))
+        finally:
+            cursor.close()
 
-        return sensitive_data
+    def is_timeout_error(self, error):
+        # ER_QUERY_TIMEOUT: maximum statement execution time exceeded
+        return getattr(error, "errno", None) == 3024
 
-    def check_access_controls(self, cursor):
+    def get_columns(self, cursor, tables=None, stream=False):
+        return self.fetch_rows(cursor, f"""
+            SELECT TABLE_SCHEMA, TABLE_NAME, COLUMN_NAME FROM INFORMATION_SCHEMA.COLUMNS
+            WHERE TABLE_SCHEMA NOT IN ('mysql', 'information_schema', 'performance_schema', 'sys')
+            AND {self.table_filter("TABLE_NAME", tables)}
+        """, stream)
+
+    def get_table_versions(self, cursor):
         cursor.execute(
-            "SELECT grantee, privilege_type FROM information_schema.USER_PRIVILEGES WHERE grantee='PUBLIC'")
+            "SELECT TABLE_SCHEMA, TABLE_NAME, CONCAT_WS('|', CREATE_TIME, UPDATE_TIME) FROM INFORMATION_SCHEMA.TABLES")
         return cursor.fetchall()
 
-    def check_audit_trail(self, cursor):
-        cursor.execute("SELECT IF(VERSION() LIKE '%Enterprise%', IF((SELECT COUNT(*) FROM information_schema.plugins WHERE plugin_name = 'audit_log' AND plugin_status = 'ACTIVE') > 0, 'true', 'false'), 'false') AS audit_log_enabled")
-        return bool(cursor.fetchone()[0])
+    def get_sampling_candidates(self, cursor):
+        cursor.execute("""
+            SELECT c.TABLE_SCHEMA, c.TABLE_NAME, t.TABLE_ROWS, c.COLUMN_NAME
+            FROM INFORMATION_SCHEMA.COLUMNS c
+            JOIN INFORMATION_SCHEMA.TABLES t ON t.TABLE_SCHEMA = c.TABLE_SCHEMA AND t.TABLE_NAME = c.TABLE_NAME
+            WHERE t.TABLE_TYPE = 'BASE TABLE'
+            AND c.TABLE_SCHEMA NOT IN ('mysql', 'information_schema', 'performance_schema', 'sys')
+            AND c.DATA_TYPE IN ('char', 'varchar', 'tinytext', 'text', 'mediumtext', 'longtext')
+            ORDER BY t.TABLE_ROWS DESC
+        """)
+        return cursor.fetchall()
 
-    def check_encryption(self, cursor):
-        cursor.execute("SHOW VARIABLES LIKE 'have_ssl'")
-        ssl_status = cursor.fetchone()[1]
-        return ssl_status == "YES"
+    def quote_identifier(self, name):
+        return "`" + name.replace("`", "``") + "`"
 
-    def check_activity_monitoring(self, cursor):
-        cursor.execute(
-            "SELECT @@general_log = 1 AND @@slow_query_log = 1 AND @@performance_schema = 1 AS result")
-        return bool(cursor.fetchone()[0])
+    def sample_query(self, schema, table, columns, limit, percent=None):
+        # MySQL has no server-side sampling; a bare LIMIT stops reading after the first rows
+        return f"SELECT {self.column_list(columns)} FROM {self.qualified_name(schema, table)} LIMIT {int(limit)}"
+
+    def check_access_controls(self, cursor, stream=False):
+        return self.fetch_rows(cursor, self.grant_query, stream, Grant.from_row)
+
+    def page_clause(self, limit, offset=0):
+        return f"LIMIT {int(limit)} OFFSET {int(offset)}"
+
+    def get_role_graph(self, cursor):
+        # INFORMATION_SCHEMA names grantees 'user'@'host', so the role edges are spelled the same way
+        memberships = self.fetch_rows(cursor, """
+            SELECT CONCAT(QUOTE(TO_USER), '@', QUOTE(TO_HOST)), CONCAT(QUOTE(FROM_USER), '@', QUOTE(FROM_HOST))
+            FROM mysql.role_edges
+        """)
+        grants = self.fetch_rows(cursor, """
+            SELECT GRANTEE, PRIVILEGE_TYPE, TABLE_SCHEMA, TABLE_NAME FROM INFORMATION_SCHEMA.TABLE_PRIVILEGES
+            WHERE PRIVILEGE_TYPE = 'SELECT'
+            UNION ALL
+            SELECT GRANTEE, PRIVILEGE_TYPE, TABLE_SCHEMA, NULL FROM INFORMATION_SCHEMA.SCHEMA_PRIVILEGES
+            WHERE PRIVILEGE_TYPE = 'SELECT'
+            UNION ALL
+            SELECT GRANTEE, PRIVILEGE_TYPE, NULL, NULL FROM INFORMATION_SCHEMA.USER_PRIVILEGES
+            WHERE PRIVILEGE_TYPE = 'SELECT'
+        """)
+        return memberships, grants
+
+    def probe_configuration(self, cursor):
+        return self.fetch_facts(cursor, """
+            SELECT VERSION() LIKE '%Enterprise%' AND (SELECT COUNT(*) FROM information_schema.plugins WHERE plugin_name = 'audit_log' AND plugin_status = 'ACTIVE') > 0 AS audit_log_enabled,
+                @@have_ssl AS have_ssl,
+                @@general_log = 1 AND @@slow_query_log = 1 AND @@performance_schema = 1 AS activity_monitoring
+        """)
+
+    def audit_trail_enabled(self, config):
+        return bool(config["audit_log_enabled"])
+
+    def encryption_enabled(self, config):
+        return config["have_ssl"] == "YES"
+
+    def activity_monitoring_enabled(self, config):
+        return bool(config["activity_monitoring"])
 
     def get_description(self):
         return {
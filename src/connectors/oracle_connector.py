@@ -1,75 +1,112 @@
 import cx_Oracle
 from .db_connector import DBConnector
+from .findings import Grant
 
 
 class OracleConnector(DBConnector):
+    dialect = "oracle"
+
+    health_check_query = "SELECT 1 FROM dual"
+
+    grant_query = """
+        SELECT grantee, privilege, owner AS object_schema, table_name AS object_name
+        FROM dba_tab_privs
+        WHERE grantee = 'PUBLIC'
+        AND owner NOT IN ('OLAPSYS', 'DVSYS', 'DVF', 'LBACSYS', 'GSMADMIN_INTERNAL', 'SYS', 'SYSTEM', 'XDB', 'DBSNMP', 'APEX_040000', 'OUTLN', 'CTXSYS', 'WMSYS', 'ORDSYS', 'ORDPLUGINS', 'MDSYS', 'FLOWS_030000', 'ORACLE_OCM', 'APEX_PUBLIC_USER', 'ANONYMOUS', 'DIP', 'ORDDATA', 'XDBEXT', 'APEX_030200')
+    """
+
     def connect(self, host, port, database, username, password):
         return cx_Oracle.connect(
             f"{username}/{password}@{host}:{port}/{database}"
         )
 
-    def scan_for_sensitive_data(self, cursor):
+    def list_databases(self, cursor):
+        # Open PDBs, each reachable through the service named after it; empty on a non-CDB
+        cursor.execute("SELECT name FROM v$pdbs WHERE name <> 'PDB$SEED' AND open_mode LIKE 'READ%' ORDER BY name")
+        return [row[0] for row in cursor.fetchall()]
+
+    def set_query_timeout(self, conn, seconds):
+        # callTimeout bounds every round trip on the connection
+        conn.callTimeout = 0 if seconds is None else max(1, int(seconds * 1000))
+
+    def is_timeout_error(self, error):
+        # DPI-1067: call timeout exceeded; ORA-01013: user requested cancel
+        return str(error).startswith(("DPI-1067", "ORA-01013"))
+
+    def cancel_query(self, conn, cursor):
+        conn.cancel()
+
+    def get_columns(self, cursor, tables=None, stream=False):
+        return self.fetch_rows(cursor, f"""
+            SELECT c.OWNER, c.TABLE_NAME, c.COLUMN_NAME FROM ALL_TAB_COLUMNS c
+            WHERE c.OWNER NOT IN ('SYS', 'SYSTEM', 'XDB', 'DBSNMP', 'APEX_040000', 'OUTLN', 'CTXSYS', 'WMSYS', 'ORDSYS', 'ORDPLUGINS', 'MDSYS', 'FLOWS_030000', 'ORACLE_OCM', 'APEX_PUBLIC_USER', 'ANONYMOUS', 'DIP', 'ORDDATA', 'XDBEXT', 'APEX_030200')
+            AND c.TABLE_NAME NOT LIKE 'BIN$%'
+            AND c.TABLE_NAME NOT LIKE 'SYS_%'
+            AND c.TABLE_NAME NOT LIKE 'APEX%'
+            AND c.TABLE_NAME NOT LIKE 'DR$%'
+            AND c.TABLE_NAME NOT LIKE 'AQ$%'
+            AND c.TABLE_NAME NOT IN ('CONTAINER_DATABASE', 'DATABASE', 'CHANGE_LOG_QUEUE_TABLE')
+            AND {self.table_filter("c.TABLE_NAME", tables)}
+        """, stream)
+
+    def get_table_versions(self, cursor):
         cursor.execute("""
-            SELECT TABLE_NAME, COLUMN_NAME 
-            FROM ALL_TAB_COLUMNS 
-            WHERE COLUMN_NAME LIKE '%PATIENT%'
+            SELECT OWNER, OBJECT_NAME, TO_CHAR(LAST_DDL_TIME, 'YYYY-MM-DD HH24:MI:SS')
+            FROM ALL_OBJECTS
+            WHERE OBJECT_TYPE IN ('TABLE', 'VIEW', 'MATERIALIZED VIEW')
             AND OWNER NOT IN ('SYS', 'SYSTEM', 'XDB', 'DBSNMP', 'APEX_040000', 'OUTLN', 'CTXSYS', 'WMSYS', 'ORDSYS', 'ORDPLUGINS', 'MDSYS', 'FLOWS_030000', 'ORACLE_OCM', 'APEX_PUBLIC_USER', 'ANONYMOUS', 'DIP', 'ORDDATA', 'XDBEXT', 'APEX_030200')
-            AND TABLE_NAME NOT LIKE 'BIN$%'
-            AND TABLE_NAME NOT LIKE 'SYS_%'
-            AND TABLE_NAME NOT LIKE 'APEX%'
-            AND TABLE_NAME NOT LIKE 'DR$%'
-            AND TABLE_NAME NOT LIKE 'AQ$%'
-            AND TABLE_NAME NOT IN ('CONTAINER_DATABASE', 'DATABASE', 'CHANGE_LOG_QUEUE_TABLE')
         """)
-        sensitive_data = cursor.fetchall()
-
-        additional_terms = ["MEDICAL CONDITION", "SSN", "DOB", "ADDRESS", "PHONE NUMBER", "EMAIL ADDRESS",
-                            "MEDICAL PROCEDURE", "HEALTHCARE PROVIDER", "MEDICATION NAME", "INSURANCE INFORMATION",
-                            "LAB RESULT", "GENETIC INFORMATION", "PAYMENT INFORMATION"]
-        for term in additional_terms:
-            cursor.execute(
-                f"""
-                SELECT TABLE_NAME, COLUMN_NAME 
-                FROM ALL_TAB_COLUMNS 
-                WHERE COLUMN_NAME LIKE '%{term}%'
-                AND OWNER NOT IN ('SYS', 'SYSTEM', 'XDB', 'DBSNMP', 'APEX_040000', 'OUTLN', 'CTXSYS', 'WMSYS', 'ORDSYS', 'ORDPLUGINS', 'MDSYS', 'FLOWS_030000', 'ORACLE_OCM', 'APEX_PUBLIC_USER', 'ANONYMOUS', 'DIP', 'ORDDATA', 'XDBEXT', 'APEX_030200')
-                AND TABLE_NAME NOT LIKE 'BIN$%'
-                AND TABLE_NAME NOT LIKE 'SYS_%'
-                AND TABLE_NAME NOT LIKE 'APEX%'
-                AND TABLE_NAME NOT LIKE 'DR$%'
-                AND TABLE_NAME NOT LIKE 'AQ$%'
-                AND TABLE_NAME NOT IN ('CONTAINER_DATABASE', 'DATABASE', 'CHANGE_LOG_QUEUE_TABLE')
-                """
-            )
-            sensitive_data.extend(cursor.fetchall())
-
-        return sensitive_data
-
-    def check_access_controls(self, cursor):
+        return cursor.fetchall()
+
+    def get_sampling_candidates(self, cursor):
         cursor.execute("""
-            SELECT table_name, grantee, privilege 
-            FROM dba_tab_privs 
-            WHERE grantee = 'PUBLIC' 
-            AND owner NOT IN ('OLAPSYS', 'DVSYS', 'DVF', 'LBACSYS', 'GSMADMIN_INTERNAL', 'SYS', 'SYSTEM', 'XDB', 'DBSNMP', 'APEX_040000', 'OUTLN', 'CTXSYS', 'WMSYS', 'ORDSYS', 'ORDPLUGINS', 'MDSYS', 'FLOWS_030000', 'ORACLE_OCM', 'APEX_PUBLIC_USER', 'ANONYMOUS', 'DIP', 'ORDDATA', 'XDBEXT', 'APEX_030200')
+            SELECT c.OWNER, c.TABLE_NAME, NVL(t.NUM_ROWS, 0), c.COLUMN_NAME
+            FROM ALL_TAB_COLUMNS c
+            JOIN ALL_TABLES t ON t.OWNER = c.OWNER AND t.TABLE_NAME = c.TABLE_NAME
+            WHERE c.DATA_TYPE IN ('CHAR', 'VARCHAR2', 'NCHAR', 'NVARCHAR2', 'CLOB')
+            AND c.OWNER NOT IN ('SYS', 'SYSTEM', 'XDB', 'DBSNMP', 'APEX_040000', 'OUTLN', 'CTXSYS', 'WMSYS', 'ORDSYS', 'ORDPLUGINS', 'MDSYS', 'FLOWS_030000', 'ORACLE_OCM', 'APEX_PUBLIC_USER', 'ANONYMOUS', 'DIP', 'ORDDATA', 'XDBEXT', 'APEX_030200')
+            AND c.TABLE_NAME NOT LIKE 'BIN$%'
+            ORDER BY t.NUM_ROWS DESC NULLS LAST
         """)
         return cursor.fetchall()
 
-    def check_audit_trail(self, cursor):
-        cursor.execute(
-            "SELECT CASE WHEN value IS NOT NULL THEN 'true' ELSE 'false' END AS audit_enabled FROM v$parameter WHERE name = 'audit_trail'")
-        return cursor.fetchone()[0]
-
-    def check_encryption(self, cursor):
-        cursor.execute("SELECT value FROM v$parameter WHERE name = 'encrypt_new_tablespaces'")
-        result = cursor.fetchone()
-        if result:
-            return result[0] in ['CLOUD_ONLY', 'ALWAYS', 'DDL']
-        else:
-            return False
-
-    def check_activity_monitoring(self, cursor):
-        cursor.execute("SELECT CASE WHEN (SELECT value FROM v$parameter WHERE name = 'statistics_level') IN ('TYPICAL', 'ALL') AND (SELECT value FROM v$parameter WHERE name = 'control_management_pack_access') = 'DIAGNOSTIC+TUNING' THEN 1 ELSE 0 END AS activity_monitoring_enabled FROM dual")
-        return cursor.fetchone()[0]
+    def sample_query(self, schema, table, columns, limit, percent=None):
+        # SAMPLE BLOCK only reads the sampled blocks; the percentage must stay below 100
+        sample = f" SAMPLE BLOCK ({min(percent, 99.999999)})" if percent else ""
+        return f"SELECT {self.column_list(columns)} FROM {self.qualified_name(schema, table)}{sample} WHERE ROWNUM <= {int(limit)}"
+
+    def check_access_controls(self, cursor, stream=False):
+        return self.fetch_rows(cursor, self.grant_query, stream, Grant.from_row)
+
+    def get_role_graph(self, cursor):
+        memberships = self.fetch_rows(cursor, "SELECT grantee, granted_role FROM dba_role_privs")
+        # SELECT ANY TABLE and READ ANY TABLE read every table without an object grant
+        grants = self.fetch_rows(cursor, """
+            SELECT grantee, privilege, owner, table_name FROM dba_tab_privs
+            WHERE privilege IN ('SELECT', 'READ')
+            AND owner NOT IN ('OLAPSYS', 'DVSYS', 'DVF', 'LBACSYS', 'GSMADMIN_INTERNAL', 'SYS', 'SYSTEM', 'XDB', 'DBSNMP', 'APEX_040000', 'OUTLN', 'CTXSYS', 'WMSYS', 'ORDSYS', 'ORDPLUGINS', 'MDSYS', 'FLOWS_030000', 'ORACLE_OCM', 'APEX_PUBLIC_USER', 'ANONYMOUS', 'DIP', 'ORDDATA', 'XDBEXT', 'APEX_030200')
+            UNION ALL
+            SELECT grantee, privilege, NULL, NULL FROM dba_sys_privs
+            WHERE privilege IN ('SELECT ANY TABLE', 'READ ANY TABLE')
+        """)
+        return memberships, grants
+
+    def probe_configuration(self, cursor):
+        cursor.execute("""
+            SELECT name, value FROM v$parameter
+            WHERE name IN ('audit_trail', 'encrypt_new_tablespaces', 'statistics_level', 'control_management_pack_access')
+        """)
+        return dict(cursor.fetchall())
+
+    def audit_trail_enabled(self, config):
+        return config.get("audit_trail") is not None
+
+    def encryption_enabled(self, config):
+        return config.get("encrypt_new_tablespaces") in ['CLOUD_ONLY', 'ALWAYS', 'DDL']
+
+    def activity_monitoring_enabled(self, config):
+        return (config.get("statistics_level") in ('TYPICAL', 'ALL')
+                and config.get("control_management_pack_access") == 'DIAGNOSTIC+TUNING')
 
     def get_description(self):
         return {
@@ -1,8 +1,18 @@
+import uuid
+
 import psycopg2
-from .db_connector import DBConnector 
+from .db_connector import FETCH_BATCH_SIZE, DBConnector
+from .findings import Grant
 
 
 class PostgreSQLConnector(DBConnector):
+    dialect = "postgresql"
+
+    grant_query = """
+        SELECT grantee, privilege_type AS privilege, table_schema AS object_schema, table_name AS object_name
+        FROM information_schema.role_table_grants WHERE grantee='PUBLIC'
+    """
+
     def connect(self, host, port, database, username, password):
         return psycopg2.connect(
             dbname=database,
@@ -12,46 +22,119 @@ class PostgreSQLConnector(DBConnector):
             port=port
         )
 
-    def scan_for_sensitive_data(self, cursor):
-        cursor.execute(
-            "SELECT table_name, column_name FROM information_schema.columns WHERE column_name ILIKE '%patient%' AND TABLE_NAME != 'pg_hba_file_rules'")
-        sensitive_data = cursor.fetchall()
+    def open_stream_cursor(self, cursor):
+        # A named cursor keeps the result set on the server and fetches it in batches
+        stream_cursor = cursor.connection.cursor(name=f"hipaa_{uuid.uuid4().hex}")
+        stream_cursor.itersize = FETCH_BATCH_SIZE
+        return stream_cursor
+
+    def list_databases(self, cursor):
+        cursor.execute("""
+            SELECT datname FROM pg_database
+            WHERE datallowconn AND NOT datistemplate AND has_database_privilege(datname, 'CONNECT')
+            ORDER BY datname
+        """)
+        return [row[0] for row in cursor.fetchall()]
+
+    def set_query_timeout(self, conn, seconds):
+        cursor = conn.cursor()
+        try:
+            if seconds is None:
+                cursor.execute("RESET statement_timeout")
+            else:
+                cursor.execute("SET statement_timeout = %s", (max(1, int(seconds * 1000)),))
+        finally:
+            cursor.close()
+
+    def is_timeout_error(self, error):
+        return isinstance(error, psycopg2.extensions.QueryCanceledError)
 
-        additional_terms = ["medical condition", "ssn", "dob", "address", "phone number", "email address",
-                            "medical procedure", "healthcare provider", "medication name", "insurance information",
-                            "lab result", "genetic information", "payment information"]
-        for term in additional_terms:
-            cursor.execute(
-                f"SELECT table_name, column_name FROM information_schema.columns WHERE column_name ILIKE '%{term}%' AND TABLE_NAME != 'pg_hba_file_rules'")
-            sensitive_data.extend(cursor.fetchall())
+    def cancel_query(self, conn, cursor):
+        conn.cancel()
 
-        return sensitive_data
+    def get_columns(self, cursor, tables=None, stream=False):
+        return self.fetch_rows(cursor, f"""
+            SELECT n.nspname, c.relname, a.attname
+            FROM pg_attribute a
+            JOIN pg_class c ON c.oid = a.attrelid
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE a.attnum > 0 AND NOT a.attisdropped AND c.relkind IN ('r', 'v', 'm', 'f', 'p')
+            AND n.nspname NOT IN ('pg_catalog', 'information_schema') AND n.nspname NOT LIKE 'pg_toast%'
+            AND {self.table_filter("c.relname", tables)}
+        """, stream)
 
-    def check_access_controls(self, cursor):
-        cursor.execute(
-            "SELECT grantee, privilege_type FROM information_schema.role_table_grants WHERE grantee='PUBLIC'")
+    def get_table_versions(self, cursor):
+        # A DDL change rewrites the pg_class row (new xmin); a rewrite changes relfilenode
+        cursor.execute("""
+            SELECT n.nspname, c.relname, c.xmin::text || ':' || c.relfilenode::text
+            FROM pg_class c
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE c.relkind IN ('r', 'v', 'm', 'f', 'p')
+        """)
         return cursor.fetchall()
 
-    def check_audit_trail(self, cursor):
-        cursor.execute(
-            "SELECT setting FROM pg_settings WHERE name = 'log_statement'")
-        log_statement_setting = cursor.fetchone()[0]
-        return log_statement_setting == 'all'
+    def get_sampling_candidates(self, cursor):
+        cursor.execute("""
+            SELECT n.nspname, c.relname, c.reltuples::bigint, a.attname
+            FROM pg_class c
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            JOIN pg_attribute a ON a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped
+            WHERE c.relkind IN ('r', 'm', 'p')
+            AND n.nspname NOT IN ('pg_catalog', 'information_schema') AND n.nspname NOT LIKE 'pg_toast%'
+            AND a.atttypid IN ('text'::regtype, 'varchar'::regtype, 'bpchar'::regtype)
+            ORDER BY c.reltuples DESC
+        """)
+        return cursor.fetchall()
+
+    def sample_query(self, schema, table, columns, limit, percent=None):
+        sample = f" TABLESAMPLE SYSTEM ({percent})" if percent else ""
+        return f"SELECT {self.column_list(columns)} FROM {self.qualified_name(schema, table)}{sample} LIMIT {int(limit)}"
+
+    def check_access_controls(self, cursor, stream=False):
+        return self.fetch_rows(cursor, self.grant_query, stream, Grant.from_row)
+
+    def get_role_graph(self, cursor):
+        # Members with NOINHERIT do not use their roles' privileges without SET ROLE
+        memberships = self.fetch_rows(cursor, """
+            SELECT m.rolname, r.rolname FROM pg_auth_members am
+            JOIN pg_roles r ON r.oid = am.roleid
+            JOIN pg_roles m ON m.oid = am.member
+            WHERE m.rolinherit
+        """)
+        # aclexplode reports grants to PUBLIC as grantee 0. A table never granted on has a
+        # NULL relacl, meaning its default: everything to the owner.
+        grants = self.fetch_rows(cursor, """
+            SELECT COALESCE(g.rolname, 'PUBLIC'), a.privilege_type, n.nspname, c.relname
+            FROM pg_class c
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            CROSS JOIN LATERAL aclexplode(COALESCE(c.relacl, acldefault('r', c.relowner))) a
+            LEFT JOIN pg_roles g ON g.oid = a.grantee
+            WHERE c.relkind IN ('r', 'v', 'm', 'f', 'p') AND a.privilege_type = 'SELECT'
+            AND n.nspname NOT IN ('pg_catalog', 'information_schema')
+        """)
+        return memberships, grants
+
+    def probe_configuration(self, cursor):
+        return self.fetch_facts(cursor, """
+            SELECT current_setting('log_statement') AS log_statement,
+                EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pgcrypto') AS pgcrypto,
+                EXISTS (SELECT 1 FROM information_schema.views WHERE table_name = 'pg_stat_activity') AS pg_stat_activity
+        """)
+
+    def audit_trail_enabled(self, config):
+        return config["log_statement"] == 'all'
 
-    def check_encryption(self, cursor):
-        cursor.execute("SELECT * FROM pg_extension WHERE extname = 'pgcrypto'")
-        return cursor.fetchone() is not None
+    def encryption_enabled(self, config):
+        return bool(config["pgcrypto"])
 
-    def check_activity_monitoring(self, cursor):
-        cursor.execute(
-            "SELECT EXISTS (SELECT 1 FROM information_schema.views WHERE table_name = 'pg_stat_activity')")
-        return cursor.fetchone()[0]
+    def activity_monitoring_enabled(self, config):
+        return bool(config["pg_stat_activity"])
 
     def get_description(self):
         return {
             "Sensitive Data Scan": {
                 "description": "This check scans the database for columns containing sensitive data related to patients, such as names, addresses, or medical history.",
-                "details": "The scan is performed by querying the 'information_schema.columns' system view."
+                "details": "The scan is performed by querying the 'pg_attribute' system catalog."
             },
             "Access Control Check": {
                 "description": "This check examines the database's access controls to ensure that only authorized users have access to patient data.",
@@ -59,7 +142,7 @@ class PostgreSQLConnector(DBConnector):
             },
             "Audit Trail Check": {
                 "description": "This check verifies the existence of an audit trail mechanism in the database to track access and modifications to patient data.",
-                "details": "The audit trail check queries the 'pg_settings' system view to ensure that logging mechanisms are in place."
+                "details": "The audit trail check reads the 'log_statement' setting with current_setting() and passes when every statement is logged ('all')."
             },
             "Encryption Check": {
                 "description": "This check verifies if encryption is enabled in the PostgreSQL database.",
@@ -0,0 +1,144 @@
+from .findings import Grant
+
+EXPOSURE_CHECK = "check_role_exposure"
+
+PUBLIC = "PUBLIC"
+
+
+def _bits(mask):
+    # Indexes of the set bits, lowest first
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def transitive_closure(count, edges):
+    # For every node the bitset of nodes reachable from it, itself included. The
+    # strongly connected components are found with an iterative Tarjan search,
+    # which emits a component only after every component it reaches, so each
+    # closure is its own members OR'ed with the finished closures it points to.
+    successors = [[] for _ in range(count)]
+    for source, target in edges:
+        successors[source].append(target)
+    index = [None] * count
+    low = [0] * count
+    on_stack = [False] * count
+    stack = []
+    closure = [0] * count
+    counter = 0
+    for root in range(count):
+        if index[root] is not None:
+            continue
+        work = [(root, 0)]
+        while work:
+            node, i = work.pop()
+            if index[node] is None:
+                index[node] = low[node] = counter
+                counter += 1
+                stack.append(node)
+                on_stack[node] = True
+            elif i:
+                # Back from the search of successor i - 1
+                low[node] = min(low[node], low[successors[node][i - 1]])
+            descended = False
+            while i < len(successors[node]):
+                successor = successors[node][i]
+                i += 1
+                if index[successor] is None:
+                    work.append((node, i))
+                    work.append((successor, 0))
+                    descended = True
+                    break
+                if on_stack[successor]:
+                    low[node] = min(low[node], index[successor])
+            if descended or low[node] != index[node]:
+                continue
+            members = []
+            while True:
+                member = stack.pop()
+                on_stack[member] = False
+                members.append(member)
+                if member == node:
+                    break
+            reach = 0
+            for member in members:
+                reach |= 1 << member
+                for successor in successors[member]:
+                    reach |= closure[successor]
+            for member in members:
+                closure[member] = reach
+    return closure
+
+
+class RoleGraph:
+    # Role memberships and read grants as bitsets. roles_of[p] holds every role p
+    # inherits and members_of[r] every principal that inherits r, both including
+    # the node itself, so the readers of a table are the members_of its grantees
+    # OR'ed together. Grants with a None schema or table cover every schema or
+    # table; a grant to PUBLIC makes a table readable by everyone.
+    def __init__(self, memberships, grants):
+        self.names = []
+        self._ids = {}
+        self._grants = {}
+        self._privileges = {}
+        for grantee, privilege, schema, table in grants:
+            grantee = self._id(grantee)
+            self._grants[schema, table] = self._grants.get((schema, table), 0) | 1 << grantee
+            self._privileges.setdefault((schema, table, grantee), privilege)
+        edges = [(self._id(member), self._id(role)) for member, role in memberships]
+        self.roles_of = transitive_closure(len(self.names), edges)
+        self.members_of = transitive_closure(len(self.names), [(role, member) for member, role in edges])
+        self._public = self._ids.get(PUBLIC)
+
+    def _id(self, name):
+        # SQL Server calls it public, everything else PUBLIC
+        if name.upper() == PUBLIC:
+            name = PUBLIC
+        principal = self._ids.get(name)
+        if principal is None:
+            principal = self._ids[name] = len(self.names)
+            self.names.append(name)
+        return principal
+
+    def _grantees(self, schema, table):
+        grants = self._grants
+        return grants.get((schema, table), 0) | grants.get((schema, None), 0) | grants.get((None, None), 0)
+
+    def _privilege(self, schema, table, grantee):
+        for key in ((schema, table, grantee), (schema, None, grantee), (None, None, grantee)):
+            if key in self._privileges:
+                return self._privileges[key]
+
+    def readers(self, schema, table):
+        # Names of the principals that can read the table
+        grantees = self._grantees(schema, table)
+        if self._public is not None and grantees >> self._public & 1:
+            return [PUBLIC]
+        readers = 0
+        for grantee in _bits(grantees):
+            readers |= self.members_of[grantee]
+        return [self.names[reader] for reader in _bits(readers)]
+
+    def exposures(self, tables):
+        # A Grant per principal and (schema, table), with the grant it reads through
+        for schema, table in tables:
+            grantees = self._grantees(schema, table)
+            if self._public is not None and grantees >> self._public & 1:
+                yield Grant(PUBLIC, self._privilege(schema, table, self._public), schema, table, "direct")
+                continue
+            readers = 0
+            for grantee in _bits(grantees):
+                readers |= self.members_of[grantee]
+            for reader in _bits(readers):
+                via = next(_bits(self.roles_of[reader] & grantees))
+                yield Grant(self.names[reader], self._privilege(schema, table, via), schema, table,
+                            "direct" if via == reader else f"via {self.names[via]}")
+
+
+def check_role_exposure(db, cursor):
+    # Every principal that can read a table holding sensitive columns, directly,
+    # through nested roles or through PUBLIC
+    tables = sorted({(finding.schema, finding.table) for finding in db.scan_for_sensitive_data(cursor)})
+    memberships, grants = db.get_role_graph(cursor)
+    return list(RoleGraph(memberships, grants).exposures(tables))
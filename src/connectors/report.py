@@ -0,0 +1,84 @@
+import math
+from collections import Counter
+
+FINDING_COUNTS = ("schema", "terms")
+GRANT_COUNTS = ("grantee", "privilege")
+
+
+def split_values(value):
+    # Matched terms arrive joined as "dob, ssn"; count and filter on each term
+    if value is None:
+        return []
+    return [part for part in str(value).split(", ") if part]
+
+
+class ReportTable:
+    # Consumes a stream of Finding or Grant records, keeping the records for the
+    # report grid and counting them per value of the summary fields as they arrive.
+    def __init__(self, rows, counted=()):
+        self.rows = []
+        self.counts = {field: Counter() for field in counted}
+        for row in rows:
+            self.rows.append(row)
+            for field, counter in self.counts.items():
+                counter.update(split_values(getattr(row, field)))
+        self._frame = None
+
+    @property
+    def count(self):
+        return len(self.rows)
+
+    @property
+    def truncated(self):
+        return False
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def frame(self):
+        # Built once and reused by every rerun that pages, sorts or filters the grid
+        if self._frame is None:
+            import pandas as pd
+            frame = pd.DataFrame.from_records([row.as_dict() for row in self.rows])
+            self._frame = frame.dropna(axis="columns", how="all")
+        return self._frame
+
+    def summary(self, field):
+        import pandas as pd
+        return pd.DataFrame(self.counts[field].most_common(), columns=[field, "count"])
+
+
+def filter_frame(frame, text=None, selected=None):
+    # selected maps a column to the values to keep; a row matches if any of its values is selected
+    mask = None
+    if text:
+        text = text.lower()
+        for column in frame.columns:
+            matches = frame[column].astype(str).str.lower().str.contains(text, regex=False)
+            mask = matches if mask is None else mask | matches
+    for column, values in (selected or {}).items():
+        if not values or column not in frame.columns:
+            continue
+        values = set(values)
+        matches = frame[column].map(lambda value: not values.isdisjoint(split_values(value)))
+        mask = matches if mask is None else mask & matches
+    return frame if mask is None else frame[mask]
+
+
+def sort_frame(frame, column=None, ascending=True):
+    if not column or column not in frame.columns:
+        return frame
+    return frame.sort_values(column, ascending=ascending, kind="stable")
+
+
+def page_count(rows, page_size):
+    return max(1, math.ceil(rows / page_size))
+
+
+def page_of(frame, page, page_size):
+    # Pages are numbered from 1, as shown in the UI
+    start = (page - 1) * page_size
+    return frame.iloc[start:start + page_size]
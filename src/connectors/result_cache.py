@@ -0,0 +1,107 @@
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_TTL = 600
+DEFAULT_MAX_ENTRIES = 128
+
+
+class CachedResult:
+    def __init__(self, value, created_at, hit):
+        self.value = value
+        self.created_at = created_at
+        self.hit = hit
+
+    @property
+    def age(self):
+        return time.time() - self.created_at
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class ResultCache:
+    def __init__(self, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # key -> (value, created_at), least recently used first
+        self._entries = OrderedDict()
+        self._in_flight = {}
+
+    def get(self, key):
+        with self._lock:
+            return self._lookup(key)
+
+    def get_or_compute(self, key, compute, refresh=False, cacheable=None):
+        while True:
+            with self._lock:
+                if not refresh:
+                    cached = self._lookup(key)
+                    if cached is not None:
+                        return cached
+                # Identical requests already running are coalesced, even when refreshing
+                flight = self._in_flight.get(key)
+                leader = flight is None
+                if leader:
+                    flight = self._in_flight[key] = _Flight()
+            if leader:
+                break
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            if flight.result is not None:
+                return CachedResult(flight.result.value, flight.result.created_at, True)
+            # The leader was stopped before it finished; run the computation here instead
+
+        try:
+            value = compute()
+            flight.result = CachedResult(value, time.time(), False)
+            if cacheable is None or cacheable(value):
+                self._store(key, value, flight.result.created_at)
+            return flight.result
+        except Exception as e:
+            # Only real failures are shared. A session stopped or rerun by the UI ends with a
+            # BaseException that belongs to it alone; its followers then take the flight over.
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            flight.done.set()
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _lookup(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, created_at = entry
+        if time.time() - created_at >= self.ttl:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return CachedResult(value, created_at, True)
+
+    def _store(self, key, value, created_at):
+        with self._lock:
+            self._entries[key] = (value, created_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+# Shared by every session in the process
+result_cache = ResultCache()
@@ -0,0 +1,113 @@
+import re
+import time
+
+from .findings import Finding
+
+SAMPLE_CHECK = "sample_for_sensitive_data"
+
+# Server-side sampling reads roughly this many times the rows we want, so the
+# LIMIT is usually filled without the sample growing towards a full scan.
+OVERSAMPLE = 4
+
+
+def _luhn(digits):
+    total = 0
+    for i, digit in enumerate(reversed(digits)):
+        value = int(digit) * (2 if i % 2 else 1)
+        total += value - 9 if value > 9 else value
+    return total % 10 == 0
+
+
+DETECTORS = {
+    "ssn": (re.compile(r"\b(?!000|666|9\d\d)\d{3}-(?!00)\d{2}-(?!0000)\d{4}\b"), None),
+    "email address": (re.compile(r"\b[\w.+-]+@[\w-]+(?:\.[\w-]+)+\b"), None),
+    "phone number": (re.compile(r"(?<!\d)(?:\+?1[-. ]?)?\(?\d{3}\)?[-. ]\d{3}[-. ]\d{4}(?!\d)"), None),
+    "payment information": (re.compile(r"(?<!\d)(?:\d[ -]?){12,18}\d(?!\d)"),
+                            lambda match: _luhn(re.sub(r"\D", "", match))),
+}
+
+
+class SamplingBudget:
+    def __init__(self, max_rows=10000, max_bytes=5 * 1024 * 1024, max_seconds=60, rows_per_table=200,
+                 batch_size=100):
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.max_seconds = max_seconds
+        self.rows_per_table = rows_per_table
+        self.batch_size = batch_size
+        self.rows = 0
+        self.bytes = 0
+        self._start = None
+
+    def start(self):
+        self._start = time.monotonic()
+
+    @property
+    def elapsed(self):
+        return 0 if self._start is None else time.monotonic() - self._start
+
+    @property
+    def exhausted(self):
+        return self.rows >= self.max_rows or self.bytes >= self.max_bytes or self.elapsed >= self.max_seconds
+
+    def spend(self, rows, size):
+        self.rows += rows
+        self.bytes += size
+
+
+def detect(value):
+    matches = []
+    for name, (pattern, validate) in DETECTORS.items():
+        for match in pattern.finditer(value):
+            if validate is None or validate(match.group()):
+                matches.append(name)
+                break
+    return matches
+
+
+def group_candidates(rows):
+    # Candidate rows are (schema, table, estimated rows, column), largest tables first
+    tables = {}
+    for schema, table, estimate, column in rows:
+        entry = tables.setdefault((schema, table), [int(estimate or 0), []])
+        entry[1].append(column)
+    return sorted(((schema, table, estimate, columns) for (schema, table), (estimate, columns) in tables.items()),
+                  key=lambda table: table[2], reverse=True)
+
+
+def sample_table(db, cursor, schema, table, estimate, columns, budget, hits):
+    limit = min(budget.rows_per_table, budget.max_rows - budget.rows)
+    percent = None
+    if estimate > limit * OVERSAMPLE:
+        percent = round(max(min(100.0 * limit * OVERSAMPLE / estimate, 100.0), 0.0001), 4)
+    cursor.execute(db.sample_query(schema, table, columns, limit, percent))
+
+    # Stream the sample in batches so no more than one batch is held in memory
+    while not budget.exhausted:
+        batch = cursor.fetchmany(budget.batch_size)
+        if not batch:
+            break
+        size = 0
+        for row in batch:
+            for column, value in zip(columns, row):
+                if value is None:
+                    continue
+                value = value if isinstance(value, str) else str(value)
+                size += len(value)
+                for detector in detect(value):
+                    key = (schema, table, column, detector)
+                    hits[key] = hits.get(key, 0) + 1
+        budget.spend(len(batch), size)
+
+
+def sample_for_sensitive_data(db, cursor, budget=None):
+    budget = budget or SamplingBudget()
+    budget.start()
+    hits = {}
+    for schema, table, estimate, columns in group_candidates(db.get_sampling_candidates(cursor)):
+        if budget.exhausted:
+            break
+        # A table's sample is either read to the end or the budget ran out and we stop
+        # altogether, so the same cursor can be reused for every table.
+        sample_table(db, cursor, schema, table, estimate, columns, budget, hits)
+    return [Finding(schema, table, column, detector, count) for (schema, table, column, detector), count in hits.items()]
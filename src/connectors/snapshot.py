@@ -0,0 +1,358 @@
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from .check_runner import CONFIG_CHECKS, has_configuration_probe
+from .connector_factory import get_connector_class
+from .db_connector import DBConnector
+from .findings import Finding, Grant
+from .grant_summary import DETAIL_ROWS, TOP_OBJECTS, GrantSummary, filter_grants
+
+# A snapshot file is a header, a section table and the sections:
+#   strings  uint32 offsets of every distinct string into strdata, plus the end
+#   strdata  the UTF-8 strings back to back
+#   columns  (schema, table, column) string ids
+#   grants   (grantee, privilege, schema, object, state) string ids
+#   versions (schema, table, marker) string ids
+#   members  (member, role) string ids of the role memberships
+#   reads    (grantee, privilege, schema, table) string ids of the read grants
+#   meta     JSON: target, type, dialect, capture time, configuration probe
+# Every name is stored once and records are arrays of little-endian uint32 ids,
+# so a reader maps the file and decodes only the strings it touches.
+MAGIC = b"HIPSNAP1"
+VERSION = 1
+HEADER = struct.Struct("<8sII")
+SECTION = struct.Struct("<8sQQQ")
+SECTIONS = ["strings", "strdata", "columns", "grants", "versions", "members", "reads", "meta"]
+WIDTHS = {"columns": 3, "grants": 5, "versions": 3, "members": 2, "reads": 4}
+NULL_ID = 0xFFFFFFFF
+WRITE_BATCH = 30000
+READ_BATCH = 10000
+
+
+def _json_value(value):
+    # Driver types in configuration probes (Decimal counts, timestamps) as plain JSON
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    return str(value)
+
+
+class _Strings:
+    def __init__(self):
+        self.ids = {}
+
+    def id(self, value):
+        if value is None:
+            return NULL_ID
+        value = str(value)
+        string_id = self.ids.get(value)
+        if string_id is None:
+            string_id = self.ids[value] = len(self.ids)
+        return string_id
+
+
+def _write_records(f, strings, width, records):
+    # Streams rows of width strings into f as id arrays; returns the row count
+    count = 0
+    batch = array("I")
+    for record in records:
+        batch.extend(strings.id(value) for value in record)
+        count += 1
+        if len(batch) >= WRITE_BATCH:
+            _write_array(f, batch)
+            batch = array("I")
+    _write_array(f, batch)
+    return count
+
+
+def _write_array(f, values):
+    if sys.byteorder != "little":
+        values.byteswap()
+    values.tofile(f)
+
+
+def write_snapshot(path, meta, columns=(), grants=(), versions=(), members=(), reads=()):
+    # The records may be iterators; they are written as they arrive
+    strings = _Strings()
+    sections = {}
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(b"\0" * (HEADER.size + SECTION.size * len(SECTIONS)))
+        for name, records in (("columns", columns), ("grants", grants), ("versions", versions),
+                              ("members", members), ("reads", reads)):
+            start = f.tell()
+            records = (row.as_row() if isinstance(row, Grant) else row for row in records)
+            count = _write_records(f, strings, WIDTHS[name], records)
+            sections[name] = (start, f.tell() - start, count)
+        data = array("I", [0])
+        blob = bytearray()
+        for value in strings.ids:
+            blob += value.encode("utf-8")
+            data.append(len(blob))
+        start = f.tell()
+        _write_array(f, data)
+        sections["strings"] = (start, f.tell() - start, len(strings.ids))
+        start = f.tell()
+        f.write(blob)
+        sections["strdata"] = (start, len(blob), len(blob))
+        f.write(b"\0" * (-f.tell() % 4))
+        encoded = json.dumps(meta, default=_json_value).encode("utf-8")
+        sections["meta"] = (f.tell(), len(encoded), 1)
+        f.write(encoded)
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, VERSION, len(SECTIONS)))
+        for name in SECTIONS:
+            f.write(SECTION.pack(name.encode(), *sections[name]))
+    os.replace(tmp_path, path)
+
+
+class Snapshot:
+    # A memory-mapped snapshot file. Records are read straight from the mapping and
+    # each distinct string is decoded and interned the first time it is used.
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            self._map.close()
+            raise RuntimeError(f"{path} is not a catalog snapshot.")
+        if version > VERSION:
+            self._map.close()
+            raise RuntimeError(f"{path} is a version {version} snapshot; this version reads up to {VERSION}.")
+        self._sections = {}
+        for i in range(count):
+            name, offset, length, items = SECTION.unpack_from(self._map, HEADER.size + i * SECTION.size)
+            self._sections[name.rstrip(b"\0").decode()] = (offset, length, items)
+        self._views = []
+        self._arrays = {}
+        offset, length, _ = self._sections["meta"]
+        self.meta = json.loads(self._map[offset:offset + length])
+        self._offsets = self._ids("strings")
+        offset, length, _ = self._sections["strdata"]
+        self._data = offset
+        self._strings = [None] * (len(self._offsets) - 1)
+
+    def _ids(self, name):
+        ids = self._arrays.get(name)
+        if ids is not None:
+            return ids
+        offset, length, _ = self._sections[name]
+        if sys.byteorder != "little":
+            ids = array("I", self._map[offset:offset + length])
+            ids.byteswap()
+        else:
+            view = memoryview(self._map)[offset:offset + length]
+            ids = view.cast("I")
+            self._views += [view, ids]
+        self._arrays[name] = ids
+        return ids
+
+    def string(self, string_id):
+        if string_id == NULL_ID:
+            return None
+        value = self._strings[string_id]
+        if value is None:
+            start = self._data + self._offsets[string_id]
+            end = self._data + self._offsets[string_id + 1]
+            value = self._strings[string_id] = sys.intern(self._map[start:end].decode("utf-8"))
+        return value
+
+    def count(self, name):
+        return self._sections[name][2] if name in self._sections else 0
+
+    def _batches(self, name):
+        # One list of ids per field for READ_BATCH records at a time, so a large section
+        # is never copied whole; files written before a section existed read as if empty
+        if name not in self._sections:
+            return
+        ids = self._ids(name)
+        width = WIDTHS[name]
+        step = READ_BATCH * width
+        for start in range(0, len(ids), step):
+            batch = ids[start:start + step].tolist()
+            yield [batch[field::width] for field in range(width)]
+
+    def records(self, name):
+        string = self.string
+        for fields in self._batches(name):
+            for row in zip(*fields):
+                yield tuple(map(string, row))
+
+    def columns(self, tables=None):
+        tables = set(tables) if tables is not None else None
+        for schema, table, column in self.records("columns"):
+            if tables is None or table in tables:
+                yield schema, table, column
+
+    def findings(self, matcher, tables=None):
+        # Each distinct column name is matched once, by id, before any row is decoded
+        distinct = set()
+        for _, _, column_ids in self._batches("columns"):
+            distinct.update(column_ids)
+        distinct = list(distinct)
+        terms = matcher.classify([self.string(column_id) for column_id in distinct])
+        matched = {column_id: terms[self.string(column_id)] for column_id in distinct
+                   if self.string(column_id) in terms}
+        tables = set(tables) if tables is not None else None
+        for schemas, table_ids, column_ids in self._batches("columns"):
+            for schema_id, table_id, column_id in zip(schemas, table_ids, column_ids):
+                if column_id in matched:
+                    table = self.string(table_id)
+                    if tables is None or table in tables:
+                        yield Finding(self.string(schema_id), table, self.string(column_id), matched[column_id])
+
+    def grants(self):
+        return map(Grant.from_row, self.records("grants"))
+
+    def versions(self):
+        return self.records("versions")
+
+    def role_graph(self):
+        return list(self.records("members")), list(self.records("reads"))
+
+    def close(self):
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        self._arrays = {}
+        self._map.close()
+
+
+def capture(db, cursor, path, name=None, db_type=None):
+    # Reads a target's catalog metadata once: columns, grants, table versions, the role
+    # graph and the configuration probe, with the verdicts the probe gave at capture time
+    meta = {"name": name, "type": db_type, "dialect": db.dialect,
+            "captured_at": datetime.now(timezone.utc).isoformat(), "configuration": None, "verdicts": {},
+            "role_graph": False}
+    if has_configuration_probe(db):
+        config = db.probe_configuration(cursor)
+        meta["configuration"] = config
+        meta["verdicts"] = {evaluator: bool(getattr(db, evaluator)(config)) for evaluator in CONFIG_CHECKS.values()}
+    versions = db.get_table_versions(cursor)
+    members = reads = ()
+    if type(db).get_role_graph is not DBConnector.get_role_graph:
+        members, reads = db.get_role_graph(cursor)
+        meta["role_graph"] = True
+    write_snapshot(path, meta, db.get_columns(cursor, stream=True), db.check_access_controls(cursor, stream=True),
+                   versions, members, reads)
+    return meta
+
+
+def _identity(path):
+    stat = os.stat(path)
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+class SnapshotConnection:
+    # Stands in for a DB-API connection; every cursor reads the same snapshot
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        self.identity = _identity(snapshot.path)
+
+    @property
+    def current(self):
+        # A pooled connection goes stale once the file is replaced by a newer capture
+        try:
+            return _identity(self.snapshot.path) == self.identity
+        except OSError:
+            return False
+
+    def cursor(self):
+        return SnapshotCursor(self.snapshot)
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.snapshot.close()
+
+
+class SnapshotCursor:
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+
+    def close(self):
+        pass
+
+
+class SnapshotConnector(DBConnector):
+    # Runs the checks against a snapshot file instead of a live database. The
+    # database is the snapshot's path; host, port and credentials are ignored.
+    def connect(self, host, port, database, username, password):
+        return SnapshotConnection(Snapshot(database))
+
+    def is_alive(self, conn):
+        return conn.current
+
+    def list_databases(self, cursor):
+        return [cursor.snapshot.path]
+
+    def set_query_timeout(self, conn, seconds):
+        pass
+
+    def get_columns(self, cursor, tables=None, stream=False):
+        columns = cursor.snapshot.columns(tables)
+        return columns if stream else list(columns)
+
+    def scan_for_sensitive_data(self, cursor, tables=None, stream=False):
+        # Matched with the dictionary compiled for the dialect the snapshot was taken from
+        matcher = self.term_dictionary.compile(cursor.snapshot.meta.get("dialect"))
+        findings = cursor.snapshot.findings(matcher, tables)
+        return findings if stream else list(findings)
+
+    def get_table_versions(self, cursor):
+        return list(cursor.snapshot.versions())
+
+    def check_access_controls(self, cursor, stream=False):
+        grants = cursor.snapshot.grants()
+        return grants if stream else list(grants)
+
+    def summarize_access_controls(self, cursor, top=TOP_OBJECTS):
+        # The grants are already local, so summaries and drill-downs read the mapped file
+        return GrantSummary.from_grants(cursor.snapshot.grants(), top)
+
+    def access_control_details(self, cursor, grantee=None, privilege=None, schema=None, object=None,
+                               limit=DETAIL_ROWS, offset=0):
+        return filter_grants(cursor.snapshot.grants(), grantee, privilege, schema, object, limit, offset)
+
+    def get_role_graph(self, cursor):
+        if not cursor.snapshot.meta.get("role_graph"):
+            raise RuntimeError("The snapshot holds no role graph.")
+        return cursor.snapshot.role_graph()
+
+    def probe_configuration(self, cursor):
+        meta = cursor.snapshot.meta
+        if meta.get("configuration") is None:
+            raise RuntimeError("The snapshot holds no configuration probe.")
+        return {"type": meta["type"], "configuration": meta["configuration"], "verdicts": meta["verdicts"]}
+
+    def _evaluate(self, evaluator, probe):
+        try:
+            source = get_connector_class(probe["type"])()
+        except RuntimeError:
+            # Without the dialect's driver the verdict taken at capture time stands
+            return probe["verdicts"][evaluator]
+        return getattr(source, evaluator)(probe["configuration"])
+
+    def audit_trail_enabled(self, config):
+        return self._evaluate("audit_trail_enabled", config)
+
+    def encryption_enabled(self, config):
+        return self._evaluate("encryption_enabled", config)
+
+    def activity_monitoring_enabled(self, config):
+        return self._evaluate("activity_monitoring_enabled", config)
+
+    def get_description(self):
+        return {
+            "Snapshot": {
+                "description": "The checks are evaluated against a catalog snapshot taken with 'python -m src.cli snapshot capture'.",
+                "details": "Enter the snapshot file's path as the database name; host, port and credentials are not used."
+            },
+        }
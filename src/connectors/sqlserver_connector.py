@@ -1,56 +1,120 @@
+import math
 import pyodbc
 from .db_connector import DBConnector
+from .findings import Grant
 
 
 class SQLServerConnector(DBConnector):
+    dialect = "sqlserver"
+
+    grant_query = """
+        SELECT
+            'public' AS grantee,
+            permission_name AS privilege,
+            OBJECT_SCHEMA_NAME(major_id) AS object_schema,
+            OBJECT_NAME(major_id) AS object_name,
+            state_desc
+        FROM
+            sys.database_permissions
+        WHERE
+            grantee_principal_id = USER_ID('PUBLIC')
+            AND OBJECT_SCHEMA_NAME(major_id) NOT IN ('sys', 'information_schema') -- Exclude system schemas
+            AND OBJECT_NAME(major_id) NOT LIKE 'spt!_%%' ESCAPE '!' -- Exclude objects starting with 'spt_'
+    """
+
     def connect(self, host, port, database, username, password):
         return pyodbc.connect(
             f'DRIVER={{ODBC Driver 18 for SQL Server}};SERVER={host},{port};DATABASE={database};UID={username};PWD={password};TrustServerCertificate=yes;'
         )
 
-    def scan_for_sensitive_data(self, cursor):
+    def list_databases(self, cursor):
+        # database_id 1-4 are master, tempdb, model and msdb
         cursor.execute(
-            "SELECT TABLE_SCHEMA, TABLE_NAME, COLUMN_NAME FROM INFORMATION_SCHEMA.COLUMNS WHERE COLUMN_NAME LIKE '%patient%'")
-        sensitive_data = cursor.fetchall()
+            "SELECT name FROM sys.databases WHERE database_id > 4 AND state_desc = 'ONLINE' AND HAS_DBACCESS(name) = 1 ORDER BY name")
+        return [row[0] for row in cursor.fetchall()]
+
+    def set_query_timeout(self, conn, seconds):
+        # The ODBC query timeout applies to cursors created afterwards
+        conn.timeout = 0 if seconds is None else max(1, math.ceil(seconds))
+
+    def is_timeout_error(self, error):
+        return isinstance(error, pyodbc.Error) and error.args[:1] == ("HYT00",)
 
-        additional_terms = ["medical condition", "ssn", "dob", "address", "phone number", "email address",
-                            "medical procedure", "healthcare provider", "medication name", "insurance information",
-                            "lab result", "genetic information", "payment information"]
-        for term in additional_terms:
-            cursor.execute(
-                f"SELECT TABLE_SCHEMA, TABLE_NAME, COLUMN_NAME FROM INFORMATION_SCHEMA.COLUMNS WHERE COLUMN_NAME LIKE '%{term}%'")
-            sensitive_data.extend(cursor.fetchall())
+    def cancel_query(self, conn, cursor):
+        cursor.cancel()
 
-        return sensitive_data
+    def get_columns(self, cursor, tables=None, stream=False):
+        return self.fetch_rows(cursor, f"""
+            SELECT TABLE_SCHEMA, TABLE_NAME, COLUMN_NAME FROM INFORMATION_SCHEMA.COLUMNS
+            WHERE {self.table_filter("TABLE_NAME", tables)}
+        """, stream)
 
-    def check_access_controls(self, cursor):
+    def get_table_versions(self, cursor):
+        cursor.execute(
+            "SELECT SCHEMA_NAME(schema_id), name, CONVERT(varchar(33), modify_date, 126) FROM sys.objects WHERE type IN ('U', 'V')")
+        return cursor.fetchall()
+
+    def get_sampling_candidates(self, cursor):
         cursor.execute("""
-            SELECT 
-                OBJECT_NAME(major_id) AS object_name,
-                permission_name,
-                state_desc
-            FROM 
-                sys.database_permissions 
-            WHERE 
-                grantee_principal_id = USER_ID('PUBLIC')
-                AND OBJECT_SCHEMA_NAME(major_id) NOT IN ('sys', 'information_schema') -- Exclude system schemas
-                AND OBJECT_NAME(major_id) NOT LIKE 'spt!_%%' ESCAPE '!' -- Exclude objects starting with 'spt_'
+            SELECT SCHEMA_NAME(t.schema_id), t.name, p.row_count, c.name
+            FROM sys.tables t
+            JOIN sys.columns c ON c.object_id = t.object_id
+            JOIN sys.types ty ON ty.user_type_id = c.user_type_id
+            JOIN (SELECT object_id, SUM(rows) AS row_count FROM sys.partitions WHERE index_id IN (0, 1) GROUP BY object_id) p
+                ON p.object_id = t.object_id
+            WHERE t.is_ms_shipped = 0
+            AND ty.name IN ('char', 'varchar', 'nchar', 'nvarchar', 'text', 'ntext')
+            ORDER BY p.row_count DESC
         """)
         return cursor.fetchall()
 
-    def check_audit_trail(self, cursor):
-        cursor.execute(
-            "SELECT COUNT(*) FROM sys.server_audits WHERE is_state_enabled = 1")
-        return cursor.fetchone()[0] > 0
+    def quote_identifier(self, name):
+        return "[" + name.replace("]", "]]") + "]"
+
+    def sample_query(self, schema, table, columns, limit, percent=None):
+        # TABLESAMPLE reads whole pages at random; ORDER BY NEWID() would sort the entire table
+        sample = f" TABLESAMPLE SYSTEM ({percent} PERCENT)" if percent else ""
+        return f"SELECT TOP ({int(limit)}) {self.column_list(columns)} FROM {self.qualified_name(schema, table)}{sample}"
+
+    def check_access_controls(self, cursor, stream=False):
+        return self.fetch_rows(cursor, self.grant_query, stream, Grant.from_row)
+
+    def get_role_graph(self, cursor):
+        memberships = self.fetch_rows(cursor, """
+            SELECT m.name, r.name FROM sys.database_role_members rm
+            JOIN sys.database_principals r ON r.principal_id = rm.role_principal_id
+            JOIN sys.database_principals m ON m.principal_id = rm.member_principal_id
+        """)
+        # Object (class 1), schema (class 3) and database (class 0) grants, plus the
+        # fixed roles that read every table without a grant of their own
+        grants = self.fetch_rows(cursor, """
+            SELECT pr.name, p.permission_name,
+                CASE p.class WHEN 1 THEN OBJECT_SCHEMA_NAME(p.major_id) WHEN 3 THEN SCHEMA_NAME(p.major_id) END,
+                CASE p.class WHEN 1 THEN OBJECT_NAME(p.major_id) END
+            FROM sys.database_permissions p
+            JOIN sys.database_principals pr ON pr.principal_id = p.grantee_principal_id
+            WHERE p.state IN ('G', 'W') AND p.class IN (0, 1, 3) AND p.permission_name IN ('SELECT', 'CONTROL')
+            UNION ALL
+            SELECT name, 'SELECT', NULL, NULL FROM sys.database_principals
+            WHERE name IN ('db_datareader', 'db_owner')
+        """)
+        return memberships, grants
+
+    def probe_configuration(self, cursor):
+        return self.fetch_facts(cursor, """
+            SELECT (SELECT COUNT(*) FROM sys.server_audits WHERE is_state_enabled = 1) AS enabled_audits,
+                (SELECT COUNT(*) FROM sys.databases WHERE is_encrypted = 1) AS encrypted_databases,
+                CASE WHEN OBJECT_ID('sys.dm_exec_requests') IS NOT NULL AND (SELECT value_in_use FROM sys.configurations WHERE name = 'default trace enabled') = 1 THEN 1 ELSE 0 END AS activity_monitoring_enabled
+        """)
+
+    def audit_trail_enabled(self, config):
+        return config["enabled_audits"] > 0
 
-    def check_encryption(self, cursor):
-        cursor.execute("SELECT name FROM sys.databases WHERE is_encrypted = 1")
-        encrypted_databases = cursor.fetchall()
-        return len(encrypted_databases) > 0
+    def encryption_enabled(self, config):
+        return config["encrypted_databases"] > 0
 
-    def check_activity_monitoring(self, cursor):
-        cursor.execute("SELECT CASE WHEN OBJECT_ID('sys.dm_exec_requests') IS NOT NULL AND (SELECT value_in_use FROM sys.configurations WHERE name = 'default trace enabled') = 1 THEN 1 ELSE 0 END AS activity_monitoring_enabled")
-        return cursor.fetchone()[0]
+    def activity_monitoring_enabled(self, config):
+        return bool(config["activity_monitoring_enabled"])
 
     def get_description(self):
         return {
@@ -0,0 +1,249 @@
+import hashlib
+import json
+import re
+from functools import lru_cache
+from itertools import groupby, islice
+from operator import itemgetter
+
+from .findings import Finding
+
+# The names findings report. A term of SUBSTRING_MIN letters or more matches
+# anywhere in a column name (outpatient_id, MedicalConditionCode); shorter ones
+# only as whole words, so dob does not match adobe_id.
+SENSITIVE_TERMS = ["patient", "medical condition", "ssn", "dob", "address", "phone number", "email address",
+                   "medical procedure", "healthcare provider", "medication name", "insurance information",
+                   "lab result", "genetic information", "payment information"]
+
+# Abbreviations and synonyms of a term, matched as whole words or phrases
+ABBREVIATIONS = {
+    "pt": "patient", "mrn": "patient", "medical record": "patient", "medical record number": "patient",
+    "social security": "ssn", "social security number": "ssn", "soc sec": "ssn",
+    "date of birth": "dob", "birth date": "dob", "birthdate": "dob", "birthday": "dob", "bday": "dob",
+    "addr": "address", "street": "address", "zip": "address", "zipcode": "address", "zip code": "address",
+    "postal code": "address", "postcode": "address",
+    "phone": "phone number", "telephone": "phone number", "tel": "phone number", "mobile": "phone number",
+    "fax": "phone number",
+    "email": "email address", "e mail": "email address",
+    "diagnosis": "medical condition", "diagnoses": "medical condition", "dx": "medical condition",
+    "icd": "medical condition", "icd10": "medical condition",
+    "procedure code": "medical procedure", "cpt": "medical procedure", "hcpcs": "medical procedure",
+    "npi": "healthcare provider", "physician": "healthcare provider", "clinician": "healthcare provider",
+    "medication": "medication name", "rx": "medication name", "drug": "medication name",
+    "prescription": "medication name", "ndc": "medication name",
+    "insurance": "insurance information", "insurer": "insurance information", "payer": "insurance information",
+    "policy number": "insurance information", "member id": "insurance information",
+    "subscriber id": "insurance information",
+    "lab": "lab result", "test result": "lab result", "loinc": "lab result",
+    "genetic": "genetic information", "genome": "genetic information", "genotype": "genetic information",
+    "dna": "genetic information",
+    "credit card": "payment information", "card number": "payment information", "iban": "payment information",
+    "account number": "payment information", "bank account": "payment information",
+}
+
+# Regular expressions over the name in lower snake_case, wrapped in underscores
+# (DOB_DT and dobDt are both "_dob_dt_")
+PATTERNS = {
+    "dob": [r"_b(?:irth)?_?(?:dt|dte|date)_"],
+    "ssn": [r"_soc_?sec"],
+    "phone number": [r"_(?:ph|tel)_?(?:no|num|nbr)_"],
+}
+
+# Per-dialect additions, keyed by DBConnector.dialect, with the keys of a term
+# dictionary plus "exclude" patterns for names that are never flagged
+DIALECTS = {}
+
+# Phrases that contain a term but name something else. A phrase found in a name
+# hides the terms inside it, so ip_address is not an address
+IGNORE = ["ip address", "ip addr", "mac address", "mac addr", "web address", "server address", "host address",
+          "remote address", "local address", "network address", "bind address"]
+
+SUBSTRING_MIN = 5
+MATCH_CACHE_SIZE = 1 << 18
+# Distinct names classified together while findings stream in
+MATCH_BATCH = 1 << 16
+
+# Words of a name: acronyms (with a plural s), capitalized or lower case words, numbers
+_TOKEN = re.compile(r"[A-Z]{2,}s(?![a-z])|[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+")
+# The same over many names at once, one per line
+_TOKEN_LINES = re.compile(_TOKEN.pattern + r"|\n")
+
+
+def snake_lines(names):
+    # The names in lower snake_case, each wrapped in underscores, as the lines of one
+    # text, so a batch is tokenized and searched in a single pass each
+    text = "\n".join(names)
+    if text.count("\n") != len(names) - 1:
+        # A line break inside a name is a separator like any other
+        text = "\n".join(name.replace("\n", " ") for name in names)
+    text = "_".join(_TOKEN_LINES.findall(text)).lower().replace("_\n", "\n").replace("\n_", "\n")
+    return "_" + text.replace("\n", "_\n_") + "_"
+
+
+def snake_name(name):
+    # patientId, PATIENT_ID and patient-id all become "_patient_id_"
+    return snake_lines([name])
+
+
+def _phrase_expression(strings, words):
+    # One regular expression for every string, factored into a trie and longest first,
+    # so each position of a text is tried once rather than once per string. The
+    # strings in words only match when an underscore follows them.
+    trie = {}
+    for string in strings:
+        node = trie
+        for char in string:
+            node = node.setdefault(char, {})
+        node[None] = string in words
+    return _trie_expression(trie)
+
+
+def _trie_expression(node):
+    branches = [re.escape(char) + _trie_expression(child) for char, child in sorted(
+        (char, child) for char, child in node.items() if char is not None)]
+    if None in node:
+        branches.append("(?=_)" if node[None] else "")
+    return branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+
+
+def _lines(text, starts):
+    # The line of each of the ascending offsets
+    line = last = 0
+    for start in starts:
+        line += text.count("\n", last, start)
+        last = start
+        yield line
+
+
+class TermMatcher:
+    # A compiled term dictionary. Column names are tokenized on case changes,
+    # digits and separators, then a batch of them is searched as one text by a
+    # single expression holding every term, abbreviation, plural and ignored
+    # phrase, plus the patterns. Of the phrases starting at the same place the
+    # longest wins, so an ignored phrase hides the terms inside it.
+    def __init__(self, terms, abbreviations=None, patterns=None, exclude=None, ignore=None):
+        source = {"terms": sorted(terms), "abbreviations": sorted((abbreviations or {}).items()),
+                  "patterns": sorted((term, sorted(expressions)) for term, expressions in (patterns or {}).items()),
+                  "exclude": sorted(exclude or []), "ignore": sorted(ignore or [])}
+        self.digest = hashlib.sha256(json.dumps(source).encode()).hexdigest()
+        # The terms of each string the expression finds. Whole words start at an
+        # underscore and end before one; longer terms match anywhere, and also from
+        # the underscore before them so they compete with the words starting there.
+        self._strings = {}
+        words = set()
+        anywhere = set()
+        ignored = set()
+
+        def add(string, term, word=False):
+            self._strings[string] = self._strings.get(string, frozenset()) | ({term} if term is not None else set())
+            (words if word else anywhere).add(string)
+            if term is None:
+                ignored.add(string)
+
+        def add_word(phrase, term):
+            phrase = phrase.lower().split()
+            for joined in {"_".join(phrase), "".join(phrase)}:
+                add("_" + joined, term, True)
+                add("_" + joined + "s", term, True)
+
+        for term in terms:
+            phrase = term.lower().split()
+            if len("".join(phrase)) >= SUBSTRING_MIN:
+                for joined in {"_".join(phrase), "".join(phrase)}:
+                    add(joined, term)
+                    add("_" + joined, term)
+            else:
+                add_word(term, term)
+        for abbreviation, term in (abbreviations or {}).items():
+            add_word(abbreviation, term)
+        for phrase in ignore or []:
+            add_word(phrase, None)
+        # An ignored phrase hides every term spelled the same way
+        for string in ignored:
+            self._strings[string] = frozenset()
+        self._expression = re.compile(_phrase_expression(self._strings, words - anywhere)) if self._strings else None
+        self._patterns = [(re.compile(expression, re.MULTILINE), frozenset({term}))
+                          for term, expressions in (patterns or {}).items() for expression in expressions]
+        self._exclude = (re.compile("|".join(f"(?:{expression})" for expression in exclude), re.MULTILINE)
+                         if exclude else None)
+        self.match = lru_cache(maxsize=MATCH_CACHE_SIZE)(self._match)
+
+    def _match(self, name):
+        # The matched terms joined as "dob, ssn", or None
+        return self.classify([name]).get(name)
+
+    def classify(self, names):
+        # {name: "dob, ssn"} for the given names that match a term
+        text = snake_lines(names)
+        matches = []
+        if self._expression is not None:
+            strings = self._strings
+            matches = [(match.start(), strings[match.group()]) for match in self._expression.finditer(text)]
+        for pattern, terms in self._patterns:
+            matches += [(match.start(), terms) for match in pattern.finditer(text)]
+        matches.sort(key=itemgetter(0))
+        excluded = set()
+        if self._exclude is not None:
+            excluded = set(_lines(text, [match.start() for match in self._exclude.finditer(text)]))
+        results = {}
+        for line, group in groupby(zip(_lines(text, [start for start, _ in matches]), matches), itemgetter(0)):
+            if line not in excluded:
+                terms = frozenset().union(*[terms for _, (_, terms) in group])
+                if terms:
+                    results[names[line]] = ", ".join(sorted(terms))
+        return results
+
+    def findings(self, columns):
+        # Classifies (schema, table, column) rows as they stream in, a batch at a time
+        columns = iter(columns)
+        while True:
+            batch = list(islice(columns, MATCH_BATCH))
+            if not batch:
+                return
+            matched = self.classify(list(dict.fromkeys(column for _, _, column in batch)))
+            for schema, table, column in batch:
+                terms = matched.get(column)
+                if terms:
+                    yield Finding(schema, table, column, terms)
+
+
+class TermDictionary:
+    # The pluggable source of a TermMatcher: terms, abbreviations, patterns and
+    # ignored phrases as above, and dialects mapping a connector's dialect to its additions.
+    def __init__(self, terms=SENSITIVE_TERMS, abbreviations=None, patterns=None, dialects=None, ignore=None):
+        self.terms = list(terms)
+        self.abbreviations = dict(abbreviations or {})
+        self.patterns = {term: list(expressions) for term, expressions in (patterns or {}).items()}
+        self.dialects = dict(dialects or {})
+        self.ignore = list(ignore or [])
+        self._compiled = {}
+
+    @classmethod
+    def load(cls, path):
+        # A JSON file with the constructor's keys; missing keys are empty
+        with open(path) as f:
+            source = json.load(f)
+        return cls(source.get("terms", []), source.get("abbreviations"), source.get("patterns"),
+                   source.get("dialects"), source.get("ignore"))
+
+    def compile(self, dialect=None):
+        # Compiled once per dialect and reused by every scan
+        matcher = self._compiled.get(dialect)
+        if matcher is None:
+            extra = self.dialects.get(dialect, {})
+            patterns = {term: list(expressions) for term, expressions in self.patterns.items()}
+            for term, expressions in extra.get("patterns", {}).items():
+                patterns.setdefault(term, []).extend(expressions)
+            matcher = self._compiled[dialect] = TermMatcher(
+                self.terms + [term for term in extra.get("terms", []) if term not in self.terms],
+                dict(self.abbreviations, **extra.get("abbreviations", {})), patterns, extra.get("exclude"),
+                self.ignore + extra.get("ignore", []))
+        return matcher
+
+
+DEFAULT_DICTIONARY = TermDictionary(SENSITIVE_TERMS, ABBREVIATIONS, PATTERNS, DIALECTS, IGNORE)
+
+
+@lru_cache(maxsize=None)
+def load_term_dictionary(path):
+    # One dictionary object per file, so each process compiles it once
+    return TermDictionary.load(path)
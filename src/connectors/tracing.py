@@ -0,0 +1,283 @@
+import json
+import re
+import threading
+import time
+from collections import deque
+
+MAX_RECORDS = 10000
+STATEMENT_LENGTH = 200
+# The metrics name targets, hosts and checks and have no authentication, so they are
+# only served on the loopback interface unless another address is given
+METRICS_HOST = "127.0.0.1"
+
+
+def _statement_text(statement):
+    text = re.sub(r"\s+", " ", str(statement)).strip()
+    return text if len(text) <= STATEMENT_LENGTH else text[:STATEMENT_LENGTH - 3] + "..."
+
+
+def _row_bytes(rows):
+    return sum(len(value) if isinstance(value, (str, bytes)) else len(str(value))
+               for row in rows for value in row if value is not None)
+
+
+class QueryRecord:
+    __slots__ = ("target", "check", "statement", "started", "elapsed", "rows", "bytes", "round_trips", "error")
+
+    def __init__(self, target, check, statement):
+        self.target = target
+        self.check = check
+        self.statement = _statement_text(statement)
+        self.started = time.time()
+        self.elapsed = 0.0
+        self.rows = 0
+        self.bytes = 0
+        self.round_trips = 1
+        self.error = None
+
+    def as_dict(self):
+        return {field: getattr(self, field) for field in self.__slots__}
+
+
+class Span:
+    __slots__ = ("target", "check", "started", "elapsed", "error")
+
+    def __init__(self, target, check, started, elapsed, error):
+        self.target = target
+        self.check = check
+        self.started = started
+        self.elapsed = elapsed
+        self.error = error
+
+
+class _Totals:
+    __slots__ = ("queries", "elapsed", "rows", "bytes", "round_trips", "errors")
+
+    def __init__(self):
+        self.queries = 0
+        self.elapsed = 0.0
+        self.rows = 0
+        self.bytes = 0
+        self.round_trips = 0
+        self.errors = 0
+
+
+class Tracer:
+    # Collects per-statement records grouped by (target, check). Totals are kept
+    # separately from the bounded record buffer so metrics never lose data.
+    def __init__(self, max_records=MAX_RECORDS):
+        self._lock = threading.Lock()
+        self.records = deque(maxlen=max_records)
+        self.spans = deque(maxlen=max_records)
+        self._totals = {}
+        self._last_span = {}
+
+    def wrap(self, cursor, target, check):
+        return TracingCursor(cursor, self, target, check)
+
+    def start_query(self, target, check, statement):
+        return QueryRecord(target, check, statement)
+
+    def finish_query(self, record):
+        with self._lock:
+            self.records.append(record)
+            totals = self._totals.setdefault((record.target, record.check), _Totals())
+            totals.queries += 1
+            totals.elapsed += record.elapsed
+            totals.rows += record.rows
+            totals.bytes += record.bytes
+            totals.round_trips += record.round_trips
+            totals.errors += record.error is not None
+
+    def add_fetch(self, record, rows, elapsed):
+        # Fetches after the record was finished still count towards the totals
+        size = _row_bytes(rows)
+        with self._lock:
+            record.rows += len(rows)
+            record.bytes += size
+            record.round_trips += 1
+            record.elapsed += elapsed
+            totals = self._totals.get((record.target, record.check))
+            if totals is not None:
+                totals.rows += len(rows)
+                totals.bytes += size
+                totals.round_trips += 1
+                totals.elapsed += elapsed
+
+    def end_span(self, target, check, started, elapsed, error=None):
+        span = Span(target, check, started, elapsed, None if error is None else str(error))
+        with self._lock:
+            self.spans.append(span)
+            self._last_span[(target, check)] = span
+
+    def breakdown(self, target=None):
+        with self._lock:
+            rows = []
+            for (span_target, check), totals in self._totals.items():
+                if target is not None and span_target != target:
+                    continue
+                span = self._last_span.get((span_target, check))
+                rows.append({
+                    "target": span_target,
+                    "check": check,
+                    "check_seconds": round(span.elapsed, 4) if span else None,
+                    "query_seconds": round(totals.elapsed, 4),
+                    "queries": totals.queries,
+                    "round_trips": totals.round_trips,
+                    "rows": totals.rows,
+                    "bytes": totals.bytes,
+                    "errors": totals.errors,
+                })
+        return sorted(rows, key=lambda row: row["query_seconds"], reverse=True)
+
+    def to_prometheus(self):
+        metrics = [
+            ("hipaa_query_duration_seconds_total", "counter", "Time spent in queries and fetches", "elapsed"),
+            ("hipaa_queries_total", "counter", "Statements executed", "queries"),
+            ("hipaa_query_round_trips_total", "counter", "Database round trips", "round_trips"),
+            ("hipaa_query_rows_total", "counter", "Rows fetched", "rows"),
+            ("hipaa_query_bytes_total", "counter", "Approximate bytes fetched", "bytes"),
+            ("hipaa_query_errors_total", "counter", "Statements that raised an error", "errors"),
+        ]
+        with self._lock:
+            totals = list(self._totals.items())
+            spans = list(self._last_span.values())
+        lines = []
+        for name, kind, description, field in metrics:
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {kind}")
+            for (target, check), total in totals:
+                lines.append(f"{name}{{{_labels(target, check)}}} {getattr(total, field)}")
+        lines.append("# HELP hipaa_check_duration_seconds Duration of the most recent run of a check")
+        lines.append("# TYPE hipaa_check_duration_seconds gauge")
+        for span in spans:
+            lines.append(f"hipaa_check_duration_seconds{{{_labels(span.target, span.check)}}} {span.elapsed}")
+        return "\n".join(lines) + "\n"
+
+    def to_trace_events(self):
+        # Chrome trace event format, viewable in chrome://tracing or Perfetto
+        with self._lock:
+            spans = list(self.spans)
+            records = list(self.records)
+        threads = {}
+        events = []
+        for span in spans:
+            tid = threads.setdefault((span.target, span.check), len(threads) + 1)
+            events.append({"name": span.check, "cat": "check", "ph": "X", "pid": span.target, "tid": tid,
+                           "ts": int(span.started * 1e6), "dur": int(span.elapsed * 1e6),
+                           "args": {"error": span.error}})
+        for record in records:
+            tid = threads.setdefault((record.target, record.check), len(threads) + 1)
+            args = record.as_dict()
+            events.append({"name": record.statement, "cat": "query", "ph": "X", "pid": record.target, "tid": tid,
+                           "ts": int(record.started * 1e6), "dur": int(record.elapsed * 1e6), "args": args})
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write_json(self, path):
+        with open(path, "w") as f:
+            json.dump(self.to_trace_events(), f)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(target, check):
+    return f'target="{_escape(target)}",check="{_escape(check)}"'
+
+
+class TracingConnection:
+    def __init__(self, connection, tracer, target, check):
+        self._connection = connection
+        self._tracer = tracer
+        self._target = target
+        self._check = check
+
+    def cursor(self, *args, **kwargs):
+        return TracingCursor(self._connection.cursor(*args, **kwargs), self._tracer, self._target, self._check)
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+
+class TracingCursor:
+    def __init__(self, cursor, tracer, target, check):
+        self._cursor = cursor
+        self._tracer = tracer
+        self._target = target
+        self._check = check
+        self._record = None
+
+    @property
+    def connection(self):
+        return TracingConnection(self._cursor.connection, self._tracer, self._target, self._check)
+
+    def execute(self, statement, *args, **kwargs):
+        record = self._tracer.start_query(self._target, self._check, statement)
+        start = time.monotonic()
+        try:
+            return self._cursor.execute(statement, *args, **kwargs)
+        except Exception as e:
+            record.error = str(e)
+            raise
+        finally:
+            record.elapsed = time.monotonic() - start
+            self._record = record
+            self._tracer.finish_query(record)
+
+    def _record_fetch(self, rows, start):
+        if self._record is not None:
+            self._tracer.add_fetch(self._record, rows, time.monotonic() - start)
+
+    def fetchone(self):
+        start = time.monotonic()
+        row = self._cursor.fetchone()
+        self._record_fetch([] if row is None else [row], start)
+        return row
+
+    def fetchmany(self, *args):
+        start = time.monotonic()
+        rows = self._cursor.fetchmany(*args)
+        self._record_fetch(rows, start)
+        return rows
+
+    def fetchall(self):
+        start = time.monotonic()
+        rows = self._cursor.fetchall()
+        self._record_fetch(rows, start)
+        return rows
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __setattr__(self, name, value):
+        if name.startswith("_"):
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self._cursor, name, value)
+
+
+def serve_metrics(tracer, port, host=METRICS_HOST):
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            body = tracer.to_prometheus().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="hipaa-metrics", daemon=True).start()
+    return server
@@ -0,0 +1,134 @@
+import asyncio
+import threading
+import time
+import unittest
+from src.connectors import async_connector
+from src.connectors.async_connector import AsyncConnector, set_concurrency
+from src.connectors.check_runner import CHECKS, RunConnections
+from src.connectors.db_connector import DBConnector
+from tests.test_check_runner import FakeConnection, ProbeConnector, TimeoutConnector
+
+
+class CountingConnector(DBConnector):
+    # Records how many checks run at the same time across every target
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.running = 0
+        self.peak = 0
+
+    def work(self, value):
+        with self.lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        time.sleep(0.01)
+        with self.lock:
+            self.running -= 1
+        return value
+
+    def scan_for_sensitive_data(self, cursor, stream=False):
+        return self.work([])
+
+    def check_access_controls(self, cursor, stream=False):
+        return self.work([])
+
+    def check_audit_trail(self, cursor):
+        return self.work(True)
+
+    def check_encryption(self, cursor):
+        return self.work(True)
+
+    def check_activity_monitoring(self, cursor):
+        return self.work(False)
+
+
+class StuckConnector(CountingConnector):
+    # A check that ignores interrupts and returns only when the test lets it
+    def __init__(self):
+        super().__init__()
+        self.release = threading.Event()
+
+    def set_query_timeout(self, conn, seconds):
+        pass
+
+    def check_audit_trail(self, cursor):
+        self.release.wait(5)
+        return True
+
+
+class TestAsyncConnector(unittest.TestCase):
+    def tearDown(self):
+        set_concurrency(async_connector.DEFAULT_CONCURRENCY)
+
+    def test_targets_share_the_global_limit(self):
+        set_concurrency(4)
+        db = CountingConnector()
+
+        async def scan_all():
+            connector = AsyncConnector(db)
+            return await asyncio.gather(*(connector.run_checks(RunConnections(FakeConnection)) for _ in range(50)))
+
+        reports = asyncio.run(scan_all())
+        self.assertEqual(len(reports), 50)
+        self.assertTrue(all(list(results) == CHECKS for results in reports))
+        self.assertEqual({results["check_activity_monitoring"].status for results in reports}, {"failed"})
+        self.assertLessEqual(db.peak, 4)
+
+    def test_config_checks_share_one_probe(self):
+        db = ProbeConnector()
+        results = asyncio.run(AsyncConnector(db).run_checks(RunConnections(FakeConnection)))
+        self.assertEqual(db.probes, 1)
+        self.assertEqual(results["check_encryption"].status, "failed")
+        self.assertEqual(results["check_audit_trail"].status, "passed")
+
+    def test_hung_check_is_interrupted_and_abandoned(self):
+        grace = async_connector.CANCEL_GRACE
+        async_connector.CANCEL_GRACE = 0.1
+        try:
+            db = TimeoutConnector(hang=5)
+            start = time.monotonic()
+            results = asyncio.run(AsyncConnector(db).run_checks(RunConnections(FakeConnection), check_timeout=0.2))
+        finally:
+            async_connector.CANCEL_GRACE = grace
+        self.assertLess(time.monotonic() - start, 1.5)
+        self.assertEqual(results["check_encryption"].status, "timeout")
+        self.assertEqual(results["check_audit_trail"].status, "passed")
+        self.assertTrue(db.interrupted.is_set())
+
+    def test_abandoned_check_keeps_its_slot_until_it_returns(self):
+        set_concurrency(1)
+        grace = async_connector.CANCEL_GRACE
+        async_connector.CANCEL_GRACE = 0.05
+        db = StuckConnector()
+
+        async def scan():
+            results = await AsyncConnector(db).run_checks(RunConnections(FakeConnection), ["check_audit_trail"],
+                                                          check_timeout=0.1)
+            held = async_connector.limiter().locked()
+            db.release.set()
+            await async_connector.run_blocking(time.sleep, 0)
+            return results, held, async_connector.limiter().locked()
+
+        try:
+            results, held, locked = asyncio.run(scan())
+        finally:
+            async_connector.CANCEL_GRACE = grace
+        self.assertEqual(results["check_audit_trail"].status, "timeout")
+        self.assertTrue(held)
+        self.assertFalse(locked)
+
+    def test_cancelling_the_task_interrupts_statements(self):
+        db = TimeoutConnector(hang=5)
+
+        async def cancel_soon():
+            task = asyncio.ensure_future(AsyncConnector(db).run_checks(RunConnections(FakeConnection)))
+            await asyncio.sleep(0.3)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(cancel_soon())
+        self.assertTrue(db.interrupted.is_set())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,242 @@
+import threading
+import time
+import unittest
+from src.connectors import check_runner
+from src.connectors.check_runner import CHECKS, RowSummary, run_checks
+from src.connectors.connection_pool import ConnectionPool
+from src.connectors.db_connector import DBConnector
+
+
+class FakeCursor:
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+        self.rolled_back = False
+
+    def cursor(self):
+        return FakeCursor()
+
+    def rollback(self):
+        self.rolled_back = True
+
+    def close(self):
+        self.closed = True
+
+
+class SlowConnector(DBConnector):
+    def scan_for_sensitive_data(self, cursor, stream=False):
+        time.sleep(0.2)
+        return [("patients", "ssn", "ssn")]
+
+    def check_access_controls(self, cursor, stream=False):
+        time.sleep(0.2)
+        if stream:
+            return ((f"table_{i}", "PUBLIC", "SELECT") for i in range(5000))
+        return []
+
+    def check_audit_trail(self, cursor):
+        time.sleep(0.2)
+        raise RuntimeError("audit view missing")
+
+    def check_encryption(self, cursor):
+        time.sleep(0.2)
+        return True
+
+    def check_activity_monitoring(self, cursor):
+        time.sleep(0.2)
+        return False
+
+
+class TestCheckRunner(unittest.TestCase):
+    def setUp(self):
+        self.connections = []
+
+    def connect(self):
+        conn = FakeConnection()
+        self.connections.append(conn)
+        return conn
+
+    def test_checks_run_concurrently(self):
+        start = time.monotonic()
+        results = run_checks(SlowConnector(), self.connect)
+        # Five 0.2s checks should take about as long as the slowest one
+        self.assertLess(time.monotonic() - start, 0.6)
+        self.assertEqual(list(results), CHECKS)
+
+    def test_errors_are_collected_per_check(self):
+        results = run_checks(SlowConnector(), self.connect)
+        self.assertTrue(results["check_audit_trail"].failed)
+        self.assertEqual(str(results["check_audit_trail"].error), "audit view missing")
+        self.assertEqual(results["scan_for_sensitive_data"].value, [("patients", "ssn", "ssn")])
+        self.assertFalse(results["check_encryption"].failed)
+
+    def test_connections_are_closed(self):
+        initial = FakeConnection()
+        seen = []
+        run_checks(SlowConnector(), self.connect, connections=[initial], on_result=seen.append)
+        self.assertEqual(len(seen), len(CHECKS))
+        self.assertTrue(initial.closed)
+        self.assertTrue(all(conn.closed for conn in self.connections))
+
+    def test_streamed_rows_are_summarized(self):
+        results = run_checks(SlowConnector(), self.connect, stream=True)
+        access_controls = results["check_access_controls"].value
+        self.assertIsInstance(access_controls, RowSummary)
+        self.assertEqual(len(access_controls), 5000)
+        self.assertEqual(len(list(access_controls)), 1000)
+        self.assertTrue(access_controls.truncated)
+        self.assertFalse(results["check_access_controls"].passed)
+
+
+class ProbeConnector(DBConnector):
+    def __init__(self):
+        self.probes = 0
+
+    def probe_configuration(self, cursor):
+        self.probes += 1
+        return {"log_statement": "all", "pgcrypto": False}
+
+    def audit_trail_enabled(self, config):
+        return config["log_statement"] == "all"
+
+    def encryption_enabled(self, config):
+        return config["pgcrypto"]
+
+    def activity_monitoring_enabled(self, config):
+        return config["pg_stat_activity"]
+
+    def scan_for_sensitive_data(self, cursor, stream=False):
+        return []
+
+    def check_access_controls(self, cursor, stream=False):
+        return []
+
+
+class TestConfigurationProbe(unittest.TestCase):
+    def test_config_checks_share_one_probe(self):
+        db = ProbeConnector()
+        seen = []
+        results = run_checks(db, FakeConnection, on_result=lambda result: seen.append(result.check))
+        self.assertEqual(db.probes, 1)
+        self.assertEqual(sorted(seen), sorted(CHECKS))
+        self.assertEqual(list(results), CHECKS)
+        self.assertEqual(results["check_audit_trail"].status, "passed")
+        self.assertEqual(results["check_encryption"].status, "failed")
+        # A missing fact only breaks the check that needs it
+        self.assertIsInstance(results["check_activity_monitoring"].error, KeyError)
+
+    def test_single_config_check_uses_its_own_method(self):
+        db = ProbeConnector()
+        results = run_checks(db, FakeConnection, checks=["check_audit_trail"])
+        self.assertTrue(results["check_audit_trail"].passed)
+        self.assertEqual(db.probes, 1)
+
+
+class FakeTimeout(Exception):
+    pass
+
+
+class TimeoutConnector(DBConnector):
+    # Emulates a native statement timeout: slow checks raise once the connection's timeout passes
+    def __init__(self, hang=None):
+        self.hang = hang
+        self.timeouts = []
+        self.interrupted = threading.Event()
+
+    def set_query_timeout(self, conn, seconds):
+        conn.query_timeout = seconds
+        self.timeouts.append(seconds)
+
+    def is_timeout_error(self, error):
+        return isinstance(error, FakeTimeout)
+
+    def cancel_query(self, conn, cursor):
+        self.interrupted.set()
+
+    def slow(self, conn_cursor, seconds):
+        if self.hang:
+            self.interrupted.wait(self.hang)
+            return True
+        time.sleep(seconds)
+        raise FakeTimeout()
+
+    def scan_for_sensitive_data(self, cursor, stream=False):
+        return []
+
+    def check_access_controls(self, cursor, stream=False):
+        return []
+
+    def check_audit_trail(self, cursor):
+        return True
+
+    def check_encryption(self, cursor):
+        return self.slow(cursor, 0.3)
+
+    def check_activity_monitoring(self, cursor):
+        return True
+
+
+class TestDeadlines(unittest.TestCase):
+    def test_native_timeout_is_its_own_verdict(self):
+        db = TimeoutConnector()
+        results = run_checks(db, FakeConnection, check_timeout=0.2)
+        self.assertEqual(results["check_encryption"].status, "timeout")
+        self.assertTrue(results["check_encryption"].failed)
+        self.assertEqual(results["check_audit_trail"].status, "passed")
+        # Every check set a timeout and cleared it again
+        self.assertEqual(db.timeouts.count(None), len(CHECKS))
+
+    def test_hung_check_is_interrupted_and_abandoned(self):
+        grace = check_runner.CANCEL_GRACE
+        check_runner.CANCEL_GRACE = 0.1
+        try:
+            db = TimeoutConnector(hang=5)
+            start = time.monotonic()
+            results = run_checks(db, FakeConnection, check_timeout=0.2)
+        finally:
+            check_runner.CANCEL_GRACE = grace
+        self.assertLess(time.monotonic() - start, 1.5)
+        self.assertEqual(results["check_encryption"].status, "timeout")
+        self.assertTrue(db.interrupted.is_set())
+
+    def test_waiting_for_a_pooled_connection_counts_against_the_budget(self):
+        db = TimeoutConnector()
+        pool = ConnectionPool(db, FakeConnection, max_size=1)
+        held = pool.acquire()
+        start = time.monotonic()
+        results = run_checks(db, pool=pool, checks=["check_audit_trail"], check_timeout=0.2)
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertEqual(results["check_audit_trail"].status, "timeout")
+        pool.release(held)
+
+    def test_cancellation(self):
+        db = TimeoutConnector(hang=5)
+        cancel = threading.Event()
+        threading.Timer(0.3, cancel.set).start()
+        start = time.monotonic()
+        results = run_checks(db, FakeConnection, cancel=cancel)
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertEqual(results["check_encryption"].status, "cancelled")
+        self.assertEqual(results["check_audit_trail"].status, "passed")
+        self.assertTrue(db.interrupted.is_set())
+
+    def test_exception_while_waiting_abandons_the_run(self):
+        db = TimeoutConnector(hang=5)
+
+        start = time.monotonic()
+
+        def stop():
+            if time.monotonic() - start > 0.3:
+                raise KeyboardInterrupt()
+
+        with self.assertRaises(KeyboardInterrupt):
+            run_checks(db, FakeConnection, on_wait=stop)
+        self.assertTrue(db.interrupted.is_set())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,43 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+from src import cli
+from src.connectors import fleet
+
+TARGET = {"name": "billing", "type": "PostgreSQL", "host": "db", "port": "5432", "database": "billing"}
+
+
+class TestFleetCommand(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.inventory = os.path.join(self.directory.name, "inventory.json")
+        with open(self.inventory, "w") as f:
+            json.dump([TARGET], f)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_async_concurrency_reaches_the_fleet_scan(self):
+        report = fleet.target_report(TARGET, "passed")
+        output = os.path.join(self.directory.name, "results.json")
+        with mock.patch.object(fleet, "scan_fleet", return_value=[report]) as scan_fleet:
+            code = cli.main(["fleet", self.inventory, "--output", output, "--threads", "4", "--async-concurrency", "16"])
+        self.assertEqual(code, cli.EXIT_PASSED)
+        args, _ = scan_fleet.call_args
+        self.assertEqual(args[1:], (4, 1, fleet.DEFAULT_TIMEOUT, 16))
+
+
+class TestStartup(unittest.TestCase):
+    def test_synchronous_commands_do_not_import_asyncio(self):
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        output = subprocess.check_output([sys.executable, "-c", "import sys, src.cli; print('asyncio' in sys.modules)"],
+                                         cwd=root, text=True)
+        self.assertEqual(output.strip(), "False")
+
+
+if __name__ == "__main__":
+    unittest.main()
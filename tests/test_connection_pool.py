@@ -0,0 +1,71 @@
+import threading
+import unittest
+from src.connectors.connection_pool import ConnectionPool, PoolTimeout
+from src.connectors.db_connector import DBConnector
+
+
+class FakeConnection:
+    def __init__(self, alive=True):
+        self.alive = alive
+        self.closed = False
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+class FakeConnector(DBConnector):
+    def is_alive(self, conn):
+        return conn.alive
+
+
+class TestConnectionPool(unittest.TestCase):
+    def setUp(self):
+        self.opened = []
+
+    def connect(self):
+        conn = FakeConnection()
+        self.opened.append(conn)
+        return conn
+
+    def test_connections_are_reused(self):
+        pool = ConnectionPool(FakeConnector(), self.connect)
+        with pool.connection() as first:
+            pass
+        with pool.connection() as second:
+            pass
+        self.assertIs(first, second)
+        self.assertEqual(len(self.opened), 1)
+
+    def test_size_cap(self):
+        pool = ConnectionPool(FakeConnector(), self.connect, max_size=2)
+        pool.acquire()
+        second = pool.acquire()
+        with self.assertRaises(PoolTimeout):
+            pool.acquire(timeout=0.05)
+        threading.Timer(0.05, pool.release, [second]).start()
+        self.assertIs(pool.acquire(timeout=1), second)
+
+    def test_dead_connections_are_replaced(self):
+        pool = ConnectionPool(FakeConnector(), self.connect, health_check_interval=0)
+        conn = pool.acquire()
+        pool.release(conn)
+        conn.alive = False
+        replacement = pool.acquire()
+        self.assertIsNot(replacement, conn)
+        self.assertTrue(conn.closed)
+        self.assertEqual(pool.size, 1)
+
+    def test_idle_eviction(self):
+        pool = ConnectionPool(FakeConnector(), self.connect, idle_timeout=0)
+        conn = pool.acquire()
+        pool.release(conn)
+        pool.evict_idle()
+        self.assertTrue(conn.closed)
+        self.assertEqual(pool.size, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
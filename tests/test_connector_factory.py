@@ -0,0 +1,45 @@
+import unittest
+from src.connectors import connector_factory
+from src.connectors.db_connector import DBConnector
+
+
+class FakeConnector(DBConnector):
+    pass
+
+
+class TestConnectorFactory(unittest.TestCase):
+    def tearDown(self):
+        connector_factory._registry.pop("Fake", None)
+        connector_factory._registry.pop("Broken", None)
+        connector_factory._unlisted.discard("Fake")
+
+    def test_database_list(self):
+        self.assertEqual(connector_factory.get_database_list()[:5],
+                         ["PostgreSQL", "MySQL", "SQL Server", "DB2", "Oracle"])
+
+    def test_registered_connector(self):
+        connector_factory.register_database("Fake", FakeConnector)
+        self.assertIsInstance(connector_factory.get_database("Fake"), FakeConnector)
+        self.assertIn("Fake", connector_factory.get_database_list())
+
+    def test_unlisted_connector(self):
+        # Snapshots open server-side paths, so the web app's list never offers them
+        self.assertNotIn("Snapshot", connector_factory.get_database_list())
+        self.assertEqual(connector_factory.get_connector_class("Snapshot").__name__, "SnapshotConnector")
+        connector_factory.register_database("Fake", FakeConnector, listed=False)
+        self.assertNotIn("Fake", connector_factory.get_database_list())
+        self.assertIsInstance(connector_factory.get_database("Fake"), FakeConnector)
+
+    def test_missing_driver_is_reported(self):
+        connector_factory.register_database("Broken", "hipaa_missing_driver_module:Connector")
+        with self.assertRaises(RuntimeError):
+            connector_factory.get_database("Broken")
+        self.assertIn("hipaa_missing_driver_module", connector_factory.get_driver_status()["Broken"])
+
+    def test_unsupported_database(self):
+        with self.assertRaises(RuntimeError):
+            connector_factory.get_database("Unknown")
+
+
+if __name__ == "__main__":
+    unittest.main()
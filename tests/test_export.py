@@ -0,0 +1,111 @@
+import csv
+import gzip
+import importlib.util
+import json
+import os
+import pickle
+import tempfile
+import unittest
+from src.connectors.check_runner import run_checks
+from src.connectors.db_connector import DBConnector
+from src.connectors.export import Exporter, export_consumers
+from src.connectors.findings import Finding, Grant
+
+
+class FakeConnection:
+    def cursor(self):
+        return self
+
+    def close(self):
+        pass
+
+
+class StreamingConnector(DBConnector):
+    def scan_for_sensitive_data(self, cursor, stream=False):
+        return (Finding("public", f"table_{i}", "ssn", "ssn") for i in range(2000))
+
+    def check_access_controls(self, cursor, stream=False):
+        return iter([Grant("PUBLIC", "SELECT", "public", "patients")])
+
+    def check_audit_trail(self, cursor):
+        return True
+
+    def check_encryption(self, cursor):
+        return False
+
+    def check_activity_monitoring(self, cursor):
+        raise RuntimeError("monitoring view missing")
+
+
+def scan(exporter, target="db1"):
+    return run_checks(StreamingConnector(), connect=FakeConnection, consumers=export_consumers([exporter], target, [
+        "scan_for_sensitive_data", "check_access_controls"]),
+        on_result=lambda result: exporter.write_result(target, result))
+
+
+class TestExporter(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_jsonl_streams_findings_and_verdicts(self):
+        path = os.path.join(self.directory.name, "report.jsonl.gz")
+        exporter = Exporter(path, compression="gzip")
+        results = scan(exporter)
+        exporter.close()
+        with gzip.open(path, "rt") as f:
+            records = [json.loads(line) for line in f]
+        kinds = [record["record"] for record in records]
+        self.assertEqual(kinds.count("finding"), 2000)
+        self.assertEqual(kinds.count("grant"), 1)
+        self.assertEqual(kinds.count("verdict"), 5)
+        # The run result only keeps the preview, the export has every row
+        self.assertEqual(len(results["scan_for_sensitive_data"].value.rows), 1000)
+        verdicts = {record["check"]: record for record in records if record["record"] == "verdict"}
+        self.assertEqual(verdicts["check_activity_monitoring"]["error"], "monitoring view missing")
+
+    def test_per_target_csv_appends_without_repeating_header(self):
+        for _ in range(2):
+            exporter = Exporter(self.directory.name, "csv", per_target=True)
+            scan(exporter, "pg://db host/app")
+            exporter.finish("pg://db host/app")
+            exporter.close()
+        self.assertEqual(os.listdir(self.directory.name), ["pg_db_host_app.csv"])
+        with open(os.path.join(self.directory.name, "pg_db_host_app.csv"), newline="") as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual(len(rows), 2 * 2006)
+        self.assertNotIn("target", [row["target"] for row in rows])
+
+    def test_finished_targets_drop_late_rows(self):
+        exporter = Exporter(self.directory.name, per_target=True)
+        exporter.finish("db1")
+        scan(exporter)
+        exporter.close()
+        self.assertEqual(os.listdir(self.directory.name), [])
+
+    def test_pickled_copy_opens_its_own_files(self):
+        exporter = Exporter(self.directory.name, per_target=True)
+        copy = pickle.loads(pickle.dumps(exporter))
+        scan(copy)
+        copy.close()
+        self.assertEqual(os.listdir(self.directory.name), ["db1.jsonl"])
+
+    def test_rejects_unsupported_compression(self):
+        with self.assertRaises(RuntimeError):
+            Exporter("report.csv", compression="zstd")
+
+    @unittest.skipUnless(importlib.util.find_spec("pyarrow"), "pyarrow is not installed")
+    def test_parquet(self):
+        import pyarrow.parquet as pq
+        exporter = Exporter(self.directory.name, "parquet", compression="zstd", per_target=True)
+        scan(exporter)
+        exporter.close()
+        [part] = os.listdir(os.path.join(self.directory.name, "db1"))
+        table = pq.read_table(os.path.join(self.directory.name, "db1", part))
+        self.assertEqual(table.num_rows, 2006)
+
+
+if __name__ == '__main__':
+    unittest.main()
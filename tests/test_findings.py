@@ -0,0 +1,30 @@
+import json
+import unittest
+from src.connectors.fleet import to_jsonable
+from src.connectors.findings import Finding, Grant
+
+
+class TestFindings(unittest.TestCase):
+    def test_row_round_trip(self):
+        finding = Finding.from_row(("public", "patients", "ssn", "ssn"))
+        self.assertEqual(Finding.from_row(json.loads(json.dumps(finding.as_row()))), finding)
+
+    def test_names_are_interned(self):
+        first = Finding("".join(["pub", "lic"]), "patients", "ssn")
+        second = Finding("".join(["publ", "ic"]), "patients", "dob")
+        self.assertIs(first.schema, second.schema)
+
+    def test_describe(self):
+        self.assertEqual(Finding("public", "patients", "ssn", "ssn").describe(),
+                         "Table: public.patients, Column: ssn, Matched: ssn")
+        self.assertEqual(Grant("PUBLIC", "SELECT", "public", "patients").describe(),
+                         "Grantee: PUBLIC, Privilege: SELECT, Object: public.patients")
+        self.assertEqual(Grant("PUBLIC", "SELECT").describe(), "Grantee: PUBLIC, Privilege: SELECT")
+
+    def test_jsonable(self):
+        self.assertEqual(to_jsonable([Grant("PUBLIC", "SELECT")]),
+                         [{"grantee": "PUBLIC", "privilege": "SELECT", "schema": None, "object": None, "state": None}])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,153 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from src.connectors import check_runner, connector_factory, fleet
+from src.connectors.connection_pool import close_pools
+from src.connectors.db_connector import DBConnector
+from src.connectors.export import Exporter
+from src.connectors.findings import Finding
+
+
+class FakeConnection:
+    def __init__(self, database):
+        self.database = database
+
+    def cursor(self):
+        return self
+
+    def execute(self, query):
+        pass
+
+    def fetchone(self):
+        return (1,)
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class FakeInstanceConnector(DBConnector):
+    databases = ["billing", "ehr", "hr"]
+
+    def connect(self, host, port, database, username, password):
+        if database == "hr":
+            raise RuntimeError("permission denied for database hr")
+        return FakeConnection(database)
+
+    def list_databases(self, cursor):
+        return self.databases
+
+    def set_query_timeout(self, conn, seconds):
+        pass
+
+    def scan_for_sensitive_data(self, cursor, stream=False):
+        return [Finding("public", "patients", "ssn", "ssn")] if cursor.database == "ehr" else []
+
+    def check_access_controls(self, cursor, stream=False):
+        return []
+
+    def check_audit_trail(self, cursor):
+        return True
+
+    def check_encryption(self, cursor):
+        return True
+
+    def check_activity_monitoring(self, cursor):
+        return True
+
+
+class FakeSchemaConnector(FakeInstanceConnector):
+    catalog_spans_instance = True
+
+
+class HangingConnector(FakeInstanceConnector):
+    # The discovery finds one column, then hangs past the timeout before finding another
+    release = threading.Event()
+    finished = threading.Event()
+
+    def scan_for_sensitive_data(self, cursor, stream=False):
+        yield Finding("public", "patients", "ssn", "ssn")
+        self.release.wait(10)
+        yield Finding("public", "visits", "mrn", "mrn")
+        self.finished.set()
+
+
+class TestInstanceScan(unittest.TestCase):
+    def setUp(self):
+        connector_factory.register_database("FakeInstance", FakeInstanceConnector)
+        connector_factory.register_database("FakeSchemas", FakeSchemaConnector)
+
+    def tearDown(self):
+        connector_factory._registry.pop("FakeInstance", None)
+        connector_factory._registry.pop("FakeSchemas", None)
+        close_pools()
+
+    def target(self, db_type):
+        return {"name": "server", "type": db_type, "host": "h", "port": "1", "database": "postgres",
+                "instance": "true"}
+
+    def test_every_database_is_scanned_and_aggregated(self):
+        report = fleet.scan_any(self.target("FakeInstance"), timeout=5, instance_threads=2)
+        self.assertEqual([database["name"] for database in report["databases"]],
+                         ["server/billing", "server/ehr", "server/hr"])
+        self.assertEqual([database["status"] for database in report["databases"]], ["passed", "failed", "error"])
+        self.assertEqual(report["status"], "failed")
+        self.assertEqual(report["summary"], {"targets": 3, "passed": 1, "failed": 1, "error": 1, "timeout": 0})
+
+    def test_instance_wide_catalog_is_scanned_once(self):
+        report = fleet.scan_any(self.target("FakeSchemas"), timeout=5)
+        self.assertEqual([database["name"] for database in report["databases"]], ["server"])
+        self.assertEqual(report["status"], "passed")
+
+    def test_listing_failure_is_an_error(self):
+        target = dict(self.target("FakeInstance"), database="hr")
+        report = fleet.scan_any(target, timeout=5)
+        self.assertEqual(report["status"], "error")
+        self.assertIn("permission denied", report["error"])
+
+    def test_event_loop_scan_matches_threaded_scan(self):
+        targets = [self.target("FakeInstance"), dict(self.target("FakeSchemas"), name="schemas")]
+        reports = fleet.scan_fleet(targets, threads=2, timeout=5, concurrency=4)
+        self.assertEqual([database["status"] for database in reports[0]["databases"]], ["passed", "failed", "error"])
+        self.assertEqual(reports[0]["status"], "failed")
+        self.assertEqual([database["name"] for database in reports[1]["databases"]], ["schemas"])
+        self.assertEqual(reports[1]["status"], "passed")
+
+
+class TestAbandonedScan(unittest.TestCase):
+    def setUp(self):
+        connector_factory.register_database("FakeHanging", HangingConnector)
+        self.directory = tempfile.TemporaryDirectory()
+        self.grace = check_runner.CANCEL_GRACE, fleet.CANCEL_GRACE
+        check_runner.CANCEL_GRACE = fleet.CANCEL_GRACE = 0.05
+
+    def tearDown(self):
+        check_runner.CANCEL_GRACE, fleet.CANCEL_GRACE = self.grace
+        HangingConnector.release.set()
+        connector_factory._registry.pop("FakeHanging", None)
+        close_pools()
+        self.directory.cleanup()
+
+    def test_rows_of_an_abandoned_scan_are_dropped(self):
+        path = os.path.join(self.directory.name, "report.jsonl")
+        exporter = Exporter(path)
+        target = {"name": "ehr", "type": "FakeHanging", "host": "h", "port": "1", "database": "ehr"}
+        report = fleet.scan_target_with_timeout(target, 0.2, exporters=[exporter])
+        HangingConnector.release.set()
+        self.assertTrue(HangingConnector.finished.wait(5))
+        time.sleep(0.05)
+        exporter.close()
+        with open(path) as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual([record["table"] for record in records if record["record"] == "finding"], ["patients"])
+        self.assertEqual(records[-1]["record"], "target")
+        self.assertEqual(records[-1]["status"], report["status"])
+
+
+if __name__ == "__main__":
+    unittest.main()
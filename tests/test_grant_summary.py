@@ -0,0 +1,142 @@
+import importlib.util
+import json
+import os
+import sqlite3
+import tempfile
+import unittest
+from collections import Counter
+from src.connectors import fleet
+from src.connectors.check_runner import check_passed
+from src.connectors.connection_pool import close_pools
+from src.connectors.db_connector import DBConnector
+from src.connectors.findings import Grant
+from src.connectors.grant_summary import GrantSummary
+from src.connectors.snapshot import capture
+
+GRANTS = [("PUBLIC", "SELECT", "clinical", "patients"), ("PUBLIC", "UPDATE", "clinical", "patients"),
+          ("PUBLIC", "SELECT", "clinical", "visits"), ("PUBLIC", "CONTROL", "billing", "cards"),
+          ("analyst", "SELECT", "billing", "cards"), ("analyst", "REFERENCES", "billing", "invoices"),
+          ("PUBLIC", "SELECT", "staging", "patients_raw")]
+
+
+class SQLiteConnector(DBConnector):
+    # The grants live in a SQLite table, so the summary SQL really runs
+    grant_query = "SELECT grantee, privilege, object_schema, object_name FROM grants"
+
+    def __init__(self):
+        self.conn = sqlite3.connect(":memory:")
+        self.conn.execute("CREATE TABLE grants (grantee, privilege, object_schema, object_name)")
+        self.conn.executemany("INSERT INTO grants VALUES (?, ?, ?, ?)", GRANTS)
+        self.queries = []
+
+    def fetch_rows(self, cursor, query, stream=False, row_factory=None):
+        self.queries.append(query)
+        return super().fetch_rows(cursor, query, stream, row_factory)
+
+    def page_clause(self, limit, offset=0):
+        return f"LIMIT {int(limit)} OFFSET {int(offset)}"
+
+    def check_access_controls(self, cursor, stream=False):
+        return self.fetch_rows(cursor, self.grant_query, stream, Grant.from_row)
+
+    def get_columns(self, cursor, tables=None, stream=False):
+        return iter([])
+
+    def get_table_versions(self, cursor):
+        return []
+
+
+class TestGrantSummary(unittest.TestCase):
+    def setUp(self):
+        self.db = SQLiteConnector()
+        self.cursor = self.db.conn.cursor()
+
+    def test_counts_are_aggregated_in_the_database(self):
+        summary = self.db.summarize_access_controls(self.cursor)
+        self.assertEqual(len(self.db.queries), 2)
+        self.assertEqual(len(summary), 7)
+        self.assertEqual(summary.counts["grantee"], {"PUBLIC": 5, "analyst": 2})
+        self.assertEqual(summary.counts["privilege"]["SELECT"], 4)
+        self.assertEqual(summary.counts["schema"], {"clinical": 3, "billing": 3, "staging": 1})
+        self.assertFalse(check_passed("check_access_controls", summary))
+        self.assertEqual(list(summary), [])
+
+    def test_objects_are_ranked_by_risk(self):
+        summary = self.db.summarize_access_controls(self.cursor, top=3)
+        # CONTROL 8 + SELECT 2; UPDATE 3 + SELECT 2; then SELECT 2 ties broken by name
+        self.assertEqual(summary.objects, [("billing", "cards", 2, 10), ("clinical", "patients", 2, 5),
+                                           ("clinical", "visits", 1, 2)])
+
+    def test_client_side_summary_matches(self):
+        summary = self.db.summarize_access_controls(self.cursor)
+        local = GrantSummary.from_grants([Grant(*grant) for grant in GRANTS])
+        self.assertEqual(local.as_dict(), summary.as_dict())
+        json.dumps(local.as_dict())
+
+    def test_drill_down_pages_through_the_matching_grants(self):
+        first = self.db.access_control_details(self.cursor, grantee="PUBLIC", limit=2)
+        rest = self.db.access_control_details(self.cursor, grantee="PUBLIC", limit=10, offset=2)
+        self.assertEqual([(grant.schema, grant.object, grant.privilege) for grant in first + rest], [
+            ("billing", "cards", "CONTROL"), ("clinical", "patients", "SELECT"), ("clinical", "patients", "UPDATE"),
+            ("clinical", "visits", "SELECT"), ("staging", "patients_raw", "SELECT")])
+        self.assertEqual(self.db.access_control_details(self.cursor, grantee="analyst", privilege="SELECT"),
+                         [Grant("analyst", "SELECT", "billing", "cards")])
+        self.assertEqual(self.db.access_control_details(self.cursor, schema="x'; DROP TABLE grants; --"), [])
+
+
+@unittest.skipUnless(importlib.util.find_spec("ibm_db"), "ibm_db is not installed")
+class TestDB2GrantSummary(unittest.TestCase):
+    # The DB2 grant SQL runs against a SQLite stand-in for SYSCAT.TABAUTH
+    def setUp(self):
+        from src.connectors.db2_connector import DB2Connector
+        self.db = DB2Connector()
+        self.db.page_clause = lambda limit, offset=0: f"LIMIT {int(limit)} OFFSET {int(offset)}"
+        self.conn = sqlite3.connect(":memory:")
+        self.conn.execute("ATTACH ':memory:' AS SYSCAT")
+        self.conn.execute("""CREATE TABLE SYSCAT.TABAUTH (GRANTEE, GRANTEETYPE, TABSCHEMA, TABNAME, CONTROLAUTH,
+            SELECTAUTH, INSERTAUTH, UPDATEAUTH, DELETEAUTH, ALTERAUTH, INDEXAUTH, REFAUTH)""")
+        self.conn.executemany("INSERT INTO SYSCAT.TABAUTH VALUES (?, 'U', ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", [
+            ("PUBLIC", "CLINICAL", "PATIENTS", "N", "Y", "Y", "Y", "N", "N", "N", "N"),
+            ("ANALYST", "CLINICAL", "PATIENTS", "N", "G", "N", "N", "N", "N", "N", "N"),
+            ("DBADM", "BILLING", "CARDS", "Y", "Y", "Y", "Y", "Y", "Y", "Y", "Y"),
+            ("PUBLIC", "SYSCAT", "TABLES", "N", "Y", "N", "N", "N", "N", "N", "N")])
+        self.cursor = self.conn.cursor()
+
+    def tearDown(self):
+        self.conn.close()
+
+    def test_summary_counts_the_grants_of_the_full_list(self):
+        grants = list(self.db.check_access_controls(self.cursor))
+        summary = self.db.summarize_access_controls(self.cursor)
+        self.assertEqual(len(summary), len(grants))
+        self.assertEqual(summary.counts["privilege"], Counter(grant.privilege for grant in grants))
+        self.assertEqual(summary.counts["privilege"]["SELECT INSERT UPDATE"], 1)
+
+
+class TestSnapshotGrantSummary(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "grants.hsnap")
+        db = SQLiteConnector()
+        capture(db, db.conn.cursor(), self.path)
+        self.target = {"name": "offline", "type": "Snapshot", "host": None, "port": None, "database": self.path}
+
+    def tearDown(self):
+        self.directory.cleanup()
+        close_pools()
+
+    def test_fleet_reports_the_summary(self):
+        report = fleet.scan_any(self.target, timeout=5, grant_summary=True)
+        result = report["checks"]["check_access_controls"]
+        self.assertEqual(result["status"], "failed")
+        self.assertEqual(result["value"]["grants"], 7)
+        self.assertEqual(result["value"]["top_objects"][0], {"schema": "billing", "object": "cards", "grants": 2,
+                                                             "risk": 10})
+
+    def test_drill_down_reads_the_snapshot(self):
+        grants = fleet.grant_details(self.target, limit=1, offset=1, grantee="PUBLIC")
+        self.assertEqual(grants, [Grant("PUBLIC", "SELECT", "clinical", "patients")])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import os
+import tempfile
+import unittest
+from src.connectors.check_runner import CheckResult
+from src.connectors.export import Exporter
+from src.connectors.findings import Finding
+from src.connectors.history import History
+
+
+def record_run(path, scanned_at, target, columns, encrypted, error=None):
+    exporter = Exporter(path)
+    exporter.scanned_at = scanned_at
+    check = "scan_for_sensitive_data"
+    for _ in exporter.stream(target, check, [Finding("public", "patients", column, column) for column in columns]):
+        pass
+    exporter.write_result(target, CheckResult(check, value=columns, error=error))
+    exporter.write_result(target, CheckResult("check_encryption", value=encrypted))
+    exporter.write_report({"name": target, "status": "failed", "error": None, "elapsed": 1.0})
+    exporter.close()
+
+
+class TestHistory(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "history.db")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def open(self):
+        history = History(self.path)
+        self.addCleanup(history.close)
+        return history
+
+    def test_new_and_removed_findings_since_last_run(self):
+        record_run(self.path, "2026-01-01T00:00:00+00:00", "ehr", ["ssn", "dob"], True)
+        record_run(self.path, "2026-01-08T00:00:00+00:00", "ehr", ["ssn", "mrn"], True)
+        history = self.open()
+        self.assertEqual([row["column_name"] for row in history.new_findings("ehr")], ["mrn"])
+        self.assertEqual([row["column_name"] for row in history.removed_findings("ehr")], ["dob"])
+
+    def test_failed_scan_is_not_a_baseline(self):
+        record_run(self.path, "2026-01-01T00:00:00+00:00", "ehr", ["ssn"], True)
+        record_run(self.path, "2026-01-08T00:00:00+00:00", "ehr", [], True, error=RuntimeError("timeout"))
+        record_run(self.path, "2026-01-15T00:00:00+00:00", "ehr", ["ssn", "mrn"], True)
+        self.assertEqual([row["column_name"] for row in self.open().new_findings("ehr")], ["mrn"])
+
+    def test_flipped_checks(self):
+        record_run(self.path, "2026-01-01T00:00:00+00:00", "ehr", [], True)
+        record_run(self.path, "2026-01-01T00:00:00+00:00", "billing", [], True)
+        record_run(self.path, "2026-01-08T00:00:00+00:00", "ehr", [], False)
+        record_run(self.path, "2026-01-08T00:00:00+00:00", "billing", [], True)
+        flips = self.open().flipped_checks("check_encryption")
+        self.assertEqual([(row["target"], row["was_passed"], row["passed"]) for row in flips], [("ehr", 1, 0)])
+
+    def test_prune_keeps_latest_run_of_every_target(self):
+        for day in range(1, 6):
+            record_run(self.path, f"2026-01-0{day}T00:00:00+00:00", "ehr", ["ssn"], True)
+        record_run(self.path, "2026-01-01T00:00:00+00:00", "billing", ["ssn"], True)
+        history = self.open()
+        self.assertEqual(history.prune(keep_runs=2), 3)
+        self.assertEqual(history.prune(older_than_days=1), 1)
+        history.compact()
+        self.assertEqual({row["target"] for row in history.runs()}, {"ehr", "billing"})
+        self.assertEqual(history.conn.execute("SELECT COUNT(*) FROM findings").fetchone()[0], 2)
+
+    def test_diff_uses_indexes(self):
+        history = self.open()
+        plan = " ".join(row[-1] for row in history.conn.execute(
+            "EXPLAIN QUERY PLAN SELECT 1 FROM findings WHERE run_id = 1 AND check_name = 'x' AND schema_name = 'a'"
+            " AND table_name = 'b' AND column_name = 'c'"))
+        self.assertIn("findings_run", plan)
+
+
+if __name__ == '__main__':
+    unittest.main()
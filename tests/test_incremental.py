@@ -0,0 +1,60 @@
+import tempfile
+import unittest
+from src.connectors.db_connector import DBConnector
+from src.connectors.findings import Finding
+from src.connectors.incremental import CatalogSnapshotStore, incremental_scan
+
+
+class FakeCatalogConnector(DBConnector):
+    def __init__(self):
+        self.versions = {("public", "patients"): "1", ("public", "visits"): "1"}
+        self.columns = {("public", "patients"): ["ssn", "name"], ("public", "visits"): ["patient_id"]}
+        self.scanned = []
+
+    def get_table_versions(self, cursor):
+        return [(*key, marker) for key, marker in self.versions.items()]
+
+    def scan_for_sensitive_data(self, cursor, tables=None):
+        self.scanned.append(tables)
+        return [Finding(*key, column, "term") for key, columns in self.columns.items()
+                if tables is None or key[-1] in tables
+                for column in columns if column != "name"]
+
+
+class TestIncrementalScan(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.store = CatalogSnapshotStore(self.directory.name)
+        self.db = FakeCatalogConnector()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_first_scan_is_full(self):
+        findings = incremental_scan(self.db, None, self.store, "target")
+        self.assertEqual(self.db.scanned, [None])
+        self.assertEqual(len(findings), 2)
+
+    def test_unchanged_catalog_is_not_rescanned(self):
+        incremental_scan(self.db, None, self.store, "target")
+        findings = incremental_scan(self.db, None, self.store, "target")
+        self.assertEqual(self.db.scanned, [None])
+        self.assertEqual(len(findings), 2)
+
+    def test_only_changed_tables_are_rescanned(self):
+        incremental_scan(self.db, None, self.store, "target")
+        self.db.versions[("public", "visits")] = "2"
+        self.db.columns[("public", "visits")] = ["patient_id", "dob"]
+        findings = incremental_scan(self.db, None, self.store, "target")
+        self.assertEqual(self.db.scanned, [None, ["visits"]])
+        self.assertEqual(sorted(finding.column for finding in findings), ["dob", "patient_id", "ssn"])
+
+    def test_dropped_tables_are_forgotten(self):
+        incremental_scan(self.db, None, self.store, "target")
+        del self.db.versions[("public", "patients")]
+        findings = incremental_scan(self.db, None, self.store, "target")
+        self.assertEqual([finding.table for finding in findings], ["visits"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,167 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from src.connectors import connection_pool, connector_factory
+from src.connectors.connection_pool import close_pools
+from src.connectors.export import Exporter
+from src.connectors.history import History
+from src.connectors.monitor import FAILURE_FACTOR, STABLE_GROWTH, Monitor
+from tests.test_fleet import FakeInstanceConnector
+
+
+def report(name, status="passed", error=None, **checks):
+    return {"name": name, "status": status, "error": error,
+            "checks": {check: {"status": verdict, "error": None} for check, verdict in checks.items()}}
+
+
+class ScriptedScan:
+    # Answers each scan of a target with the next of its scripted reports, repeating the last
+    def __init__(self, scripts):
+        self.scripts = scripts
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def __call__(self, target, timeout, **options):
+        with self.lock:
+            self.calls.append(target["name"])
+            script = self.scripts[target["name"]]
+            return script.pop(0) if len(script) > 1 else script[0]
+
+
+class TestMonitor(unittest.TestCase):
+    def monitor(self, scripts, **options):
+        targets = [{"name": name} for name in scripts]
+        events = []
+        options = dict({"interval": 100, "min_interval": 10, "max_interval": 1000, "seed": 1}, **options)
+        return Monitor(targets, on_event=events.append, scan=ScriptedScan(scripts), **options), events
+
+    def scan_once(self, monitor, schedule, now=0):
+        # Runs the scan synchronously the way a worker thread would
+        report = monitor.scan(schedule.target, monitor.timeout)
+        monitor.running += 1
+        return monitor.complete(schedule, report, now)
+
+    def test_first_sweep_is_spread_over_the_minimum_interval(self):
+        monitor, _ = self.monitor({f"db{i}": [report(f"db{i}")] for i in range(50)})
+        now = time.monotonic()
+        due = [at - now for at, _ in monitor.due()]
+        self.assertTrue(all(-1 < delay <= 10 for delay in due))
+        self.assertGreater(max(due) - min(due), 5)
+
+    def test_verdict_changes_are_events_and_reset_the_interval(self):
+        monitor, events = self.monitor({"ehr": [report("ehr", check_encryption="passed"),
+                                                report("ehr", "failed", check_encryption="failed")]})
+        schedule = monitor._queue[0][2]
+        self.assertEqual(self.scan_once(monitor, schedule), [])
+        self.assertEqual(schedule.interval, 100 * STABLE_GROWTH)
+        self.scan_once(monitor, schedule)
+        self.assertEqual([(event["check"], event["previous"], event["current"]) for event in events],
+                         [(None, "passed", "failed"), ("check_encryption", "passed", "failed")])
+        self.assertEqual(schedule.interval, 10)
+
+    def test_stable_targets_back_off_and_failures_come_back_sooner(self):
+        monitor, events = self.monitor({"ehr": [report("ehr", check_audit_trail="passed")] * 8
+                                        + [report("ehr", "error", "connection refused")] * 3})
+        schedule = monitor._queue[0][2]
+        for _ in range(8):
+            self.scan_once(monitor, schedule)
+        self.assertEqual(schedule.interval, 1000)
+        # The first failure is a change of the target's status; staying down halves the interval
+        self.scan_once(monitor, schedule)
+        self.assertEqual(schedule.interval, 10)
+        schedule.interval = 100
+        self.scan_once(monitor, schedule)
+        self.assertEqual(schedule.interval, 100 * FAILURE_FACTOR)
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0]["error"], "connection refused")
+
+    def test_checks_compare_against_their_last_verdict_across_errors(self):
+        monitor, events = self.monitor({"ehr": [report("ehr", check_encryption="passed"), report("ehr", "error"),
+                                                report("ehr", "failed", check_encryption="failed")]})
+        schedule = monitor._queue[0][2]
+        for _ in range(3):
+            self.scan_once(monitor, schedule)
+        self.assertIn(("check_encryption", "passed", "failed"),
+                      [(event["check"], event["previous"], event["current"]) for event in events])
+
+    def test_next_scan_is_jittered(self):
+        monitor, _ = self.monitor({"ehr": [report("ehr")]}, jitter=0.2)
+        delays = [monitor.jittered(100) for _ in range(200)]
+        self.assertTrue(all(80 <= delay <= 120 for delay in delays))
+        self.assertGreater(len(set(delays)), 100)
+
+    def test_dispatch_respects_the_concurrency_limit(self):
+        monitor, _ = self.monitor({f"db{i}": [report(f"db{i}")] for i in range(10)}, concurrency=3)
+        started = []
+        delay = monitor.dispatch(lambda fn, schedule: started.append(schedule), time.monotonic() + 20)
+        self.assertEqual(len(started), 3)
+        self.assertIsNone(delay)
+        monitor.complete(started[0], report(started[0].target["name"]), time.monotonic())
+        monitor.dispatch(lambda fn, schedule: started.append(schedule), time.monotonic() + 20)
+        self.assertEqual(len(started), 4)
+        self.assertEqual(monitor.running, 3)
+
+    def test_run_rescans_until_stopped(self):
+        scripts = {"ehr": [report("ehr", check_encryption="passed"), report("ehr", "failed", check_encryption="failed")],
+                   "billing": [report("billing", check_encryption="passed")]}
+        monitor, events = self.monitor(scripts, interval=0.02, min_interval=0.01, max_interval=0.05)
+        worker = threading.Thread(target=monitor.run)
+        worker.start()
+        deadline = time.monotonic() + 5
+        while len(monitor.scan.calls) < 10 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        monitor.stop()
+        worker.join(5)
+        self.assertFalse(worker.is_alive())
+        self.assertGreaterEqual(monitor.scan.calls.count("billing"), 3)
+        self.assertEqual([(event["target"], event["check"]) for event in events],
+                         [("ehr", None), ("ehr", "check_encryption")])
+
+
+class TestMonitorExports(unittest.TestCase):
+    def setUp(self):
+        connector_factory.register_database("FakeMonitored", FakeInstanceConnector)
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        connector_factory._registry.pop("FakeMonitored", None)
+        close_pools()
+        self.directory.cleanup()
+
+    def test_every_round_is_exported_as_a_run_of_its_own(self):
+        exports = os.path.join(self.directory.name, "exports")
+        history = os.path.join(self.directory.name, "history.db")
+        exporters = [Exporter(exports, per_target=True), Exporter(history, "sqlite")]
+        target = {"name": "ehr", "type": "FakeMonitored", "host": "h", "port": "1", "database": "ehr"}
+        monitor = Monitor([target], interval=100, min_interval=10, max_interval=1000, exporters=exporters)
+        schedule = monitor._queue[0][2]
+        for _ in range(2):
+            monitor.running += 1
+            monitor._scan(schedule)
+        for exporter in exporters:
+            exporter.close()
+        history = History(history)
+        runs = history.runs("ehr")
+        history.close()
+        self.assertEqual(len(runs), 2)
+        self.assertEqual({run["status"] for run in runs}, {"failed"})
+        with open(os.path.join(exports, "ehr.jsonl")) as f:
+            records = [json.loads(line) for line in f]
+        rounds = [record["scanned_at"] for record in records if record["record"] == "target"]
+        self.assertEqual(len(set(rounds)), 2)
+        latest = [record["record"] for record in records if record["scanned_at"] == max(rounds)]
+        self.assertEqual((latest.count("finding"), latest.count("verdict"), latest[-1]), (1, 5, "target"))
+
+    def test_no_session_is_kept_open_between_rounds(self):
+        target = {"name": "ehr", "type": "FakeMonitored", "host": "h", "port": "1", "database": "ehr"}
+        monitor = Monitor([target], interval=100, min_interval=10, max_interval=1000)
+        monitor.running += 1
+        monitor._scan(monitor._queue[0][2])
+        self.assertEqual(connection_pool._pools, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -65,7 +65,7 @@ class TestOracleConnector(unittest.TestCase):
         with self.conn.cursor() as cursor:
             audit_trail = self.oracle_connector.check_audit_trail(cursor)
         # Expecting a boolean value
-        self.assertFalse(isinstance(audit_trail, bool))
+        self.assertTrue(isinstance(audit_trail, bool))
 
     def test_check_encryption(self):
         # Happy path test for check_encryption
@@ -80,7 +80,7 @@ class TestOracleConnector(unittest.TestCase):
             activity_monitoring_status = self.oracle_connector.check_activity_monitoring(
                 cursor)
         # Expecting a boolean value
-        self.assertFalse(isinstance(activity_monitoring_status, bool))
+        self.assertTrue(isinstance(activity_monitoring_status, bool))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,101 @@
+import os
+import tempfile
+import unittest
+from src.connectors.check_runner import check_passed
+from src.connectors.db_connector import DBConnector
+from src.connectors.findings import Grant
+from src.connectors.privileges import EXPOSURE_CHECK, RoleGraph, check_role_exposure, transitive_closure
+from src.connectors.snapshot import SnapshotConnector, capture
+
+
+class RoleConnector(DBConnector):
+    dialect = "fake"
+    memberships = [("alice", "analyst"), ("analyst", "reader"), ("bob", "auditor"), ("auditor", "analyst"),
+                   ("carol", "clerk")]
+    grants = [("reader", "SELECT", "public", "patients"), ("clerk", "SELECT", "billing", None),
+              ("public", "SELECT", "public", "visits")]
+
+    def get_columns(self, cursor, tables=None, stream=False):
+        return iter([("public", "patients", "ssn"), ("billing", "cards", "card_number"),
+                     ("public", "visits", "patient_id"), ("public", "rooms", "name")])
+
+    def check_access_controls(self, cursor, stream=False):
+        return iter([])
+
+    def get_table_versions(self, cursor):
+        return []
+
+    def get_role_graph(self, cursor):
+        return self.memberships, self.grants
+
+
+class TestTransitiveClosure(unittest.TestCase):
+    def test_chains_and_cycles(self):
+        # 0 -> 1 -> 2 -> 1, 3 -> 0
+        closure = transitive_closure(4, [(0, 1), (1, 2), (2, 1), (3, 0)])
+        self.assertEqual(closure, [0b0111, 0b0110, 0b0110, 0b1111])
+
+    def test_deep_chains_do_not_recurse(self):
+        count = 50000
+        closure = transitive_closure(count, [(i, i + 1) for i in range(count - 1)])
+        self.assertEqual(closure[0], (1 << count) - 1)
+        self.assertEqual(closure[-1], 1 << (count - 1))
+
+
+class TestRoleGraph(unittest.TestCase):
+    def setUp(self):
+        self.graph = RoleGraph(RoleConnector.memberships, RoleConnector.grants)
+
+    def test_nested_roles_are_followed(self):
+        self.assertEqual(sorted(self.graph.readers("public", "patients")),
+                         ["alice", "analyst", "auditor", "bob", "reader"])
+        self.assertEqual(self.graph.readers("public", "rooms"), [])
+
+    def test_schema_grants_cover_their_tables(self):
+        self.assertEqual(sorted(self.graph.readers("billing", "cards")), ["carol", "clerk"])
+        self.assertEqual(self.graph.readers("public", "cards"), [])
+
+    def test_public_is_everyone(self):
+        self.assertEqual(self.graph.readers("public", "visits"), ["PUBLIC"])
+        self.assertEqual(list(self.graph.exposures([("public", "visits")])),
+                         [Grant("PUBLIC", "SELECT", "public", "visits", "direct")])
+
+    def test_exposures_name_the_grant_they_read_through(self):
+        exposures = {grant.grantee: grant.state for grant in self.graph.exposures([("public", "patients")])}
+        self.assertEqual(exposures, {"reader": "direct", "analyst": "via reader", "alice": "via reader",
+                                     "auditor": "via reader", "bob": "via reader"})
+
+    def test_database_wide_grants(self):
+        graph = RoleGraph([("dba", "dw_reader")], [("dw_reader", "SELECT ANY TABLE", None, None)])
+        self.assertEqual(list(graph.exposures([("hr", "staff")])), [
+            Grant("dw_reader", "SELECT ANY TABLE", "hr", "staff", "direct"),
+            Grant("dba", "SELECT ANY TABLE", "hr", "staff", "via dw_reader")])
+
+
+class TestRoleExposureCheck(unittest.TestCase):
+    def test_only_tables_with_sensitive_columns_are_reported(self):
+        exposures = check_role_exposure(RoleConnector(), None)
+        self.assertEqual(sorted({(grant.schema, grant.object) for grant in exposures}),
+                         [("billing", "cards"), ("public", "patients"), ("public", "visits")])
+
+    def test_any_exposure_fails_the_check(self):
+        exposures = check_role_exposure(RoleConnector(), None)
+        self.assertEqual(len(exposures), 8)
+        self.assertFalse(check_passed(EXPOSURE_CHECK, exposures))
+        self.assertTrue(check_passed(EXPOSURE_CHECK, []))
+
+    def test_role_graph_is_captured_in_snapshots(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "roles.hsnap")
+            capture(RoleConnector(), None, path)
+            db = SnapshotConnector()
+            conn = db.connect(None, None, path, None, None)
+            try:
+                offline = check_role_exposure(db, conn.cursor())
+            finally:
+                conn.close()
+        self.assertEqual(offline, check_role_exposure(RoleConnector(), None))
+
+
+if __name__ == "__main__":
+    unittest.main()
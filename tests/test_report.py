@@ -0,0 +1,45 @@
+import importlib.util
+import unittest
+from src.connectors.findings import Finding, Grant
+from src.connectors.report import FINDING_COUNTS, GRANT_COUNTS, ReportTable, page_count, split_values
+
+HAS_PANDAS = importlib.util.find_spec("pandas") is not None
+
+
+def findings():
+    return [Finding("public", "patients", "ssn", "ssn"),
+            Finding("public", "patients", "patient_dob", "dob, patient"),
+            Finding("billing", "claims", "member_id", "member")]
+
+
+class TestReportTable(unittest.TestCase):
+    def test_counts_per_schema_and_term(self):
+        table = ReportTable(iter(findings()), FINDING_COUNTS)
+        self.assertEqual(len(table), 3)
+        self.assertEqual(table.counts["schema"], {"public": 2, "billing": 1})
+        self.assertEqual(table.counts["terms"], {"ssn": 1, "dob": 1, "patient": 1, "member": 1})
+
+    def test_grant_counts(self):
+        table = ReportTable([Grant("PUBLIC", "SELECT"), Grant("PUBLIC", "UPDATE")], GRANT_COUNTS)
+        self.assertEqual(table.counts["grantee"], {"PUBLIC": 2})
+
+    def test_split_values(self):
+        self.assertEqual(split_values("dob, ssn"), ["dob", "ssn"])
+        self.assertEqual(split_values(None), [])
+
+    def test_page_count(self):
+        self.assertEqual(page_count(0, 50), 1)
+        self.assertEqual(page_count(101, 50), 3)
+
+    @unittest.skipUnless(HAS_PANDAS, "pandas is not installed")
+    def test_filter_sort_and_page(self):
+        from src.connectors.report import filter_frame, page_of, sort_frame
+        frame = ReportTable(findings(), FINDING_COUNTS).frame()
+        self.assertNotIn("hits", frame.columns)
+        self.assertEqual(len(filter_frame(frame, selected={"terms": ["dob"]})), 1)
+        self.assertEqual(len(filter_frame(frame, text="PATIENT")), 2)
+        self.assertEqual(list(page_of(sort_frame(frame, "column"), 1, 2)["column"]), ["member_id", "patient_dob"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import threading
+import time
+import unittest
+from src.connectors.result_cache import ResultCache
+
+
+class TestResultCache(unittest.TestCase):
+    def test_hit_after_compute(self):
+        cache = ResultCache()
+        first = cache.get_or_compute("target", lambda: [1])
+        second = cache.get_or_compute("target", lambda: [2])
+        self.assertFalse(first.hit)
+        self.assertTrue(second.hit)
+        self.assertEqual(second.value, [1])
+
+    def test_refresh_and_ttl(self):
+        cache = ResultCache(ttl=0)
+        cache.get_or_compute("target", lambda: 1)
+        self.assertEqual(cache.get_or_compute("target", lambda: 2).value, 2)
+        cache = ResultCache()
+        cache.get_or_compute("target", lambda: 1)
+        self.assertEqual(cache.get_or_compute("target", lambda: 2, refresh=True).value, 2)
+
+    def test_size_bound(self):
+        cache = ResultCache(max_entries=2)
+        for key in ("a", "b", "c"):
+            cache.get_or_compute(key, lambda: key)
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get("a"))
+
+    def test_not_cacheable(self):
+        cache = ResultCache()
+        cache.get_or_compute("target", lambda: None, cacheable=lambda value: value is not None)
+        self.assertIsNone(cache.get("target"))
+
+    def test_concurrent_requests_are_coalesced(self):
+        cache = ResultCache()
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.1)
+            return "report"
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute("target", compute)))
+                   for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual([result.value for result in results], ["report"] * 5)
+
+    def test_followers_take_over_when_the_leader_is_stopped(self):
+        class Stopped(BaseException):
+            pass
+
+        cache = ResultCache()
+        started = threading.Event()
+        calls = []
+
+        def stopped():
+            calls.append("leader")
+            started.set()
+            time.sleep(0.1)
+            raise Stopped()
+
+        def compute():
+            calls.append("follower")
+            return "report"
+
+        def lead():
+            try:
+                cache.get_or_compute("target", stopped)
+            except Stopped:
+                pass
+
+        leader = threading.Thread(target=lead)
+        leader.start()
+        started.wait()
+        result = cache.get_or_compute("target", compute)
+        leader.join()
+        self.assertEqual(calls, ["leader", "follower"])
+        self.assertEqual(result.value, "report")
+        self.assertFalse(result.hit)
+
+    def test_followers_share_the_leader_error(self):
+        cache = ResultCache()
+        started = threading.Event()
+
+        def failing():
+            started.set()
+            time.sleep(0.1)
+            raise RuntimeError("connection refused")
+
+        leader = threading.Thread(target=lambda: self.assertRaises(RuntimeError, cache.get_or_compute, "target",
+                                                                   failing))
+        leader.start()
+        started.wait()
+        with self.assertRaisesRegex(RuntimeError, "connection refused"):
+            cache.get_or_compute("target", lambda: "report")
+        leader.join()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+from src.connectors.db_connector import DBConnector
+from src.connectors.findings import Finding
+from src.connectors.sampling import SamplingBudget, detect, sample_for_sensitive_data
+
+
+class FakeCursor:
+    def __init__(self, tables):
+        self.tables = tables
+        self.queries = []
+        self.rows = []
+
+    def execute(self, query):
+        self.queries.append(query)
+        table = query.split(" FROM ")[1].split()[0]
+        self.rows = list(self.tables[table])
+
+    def fetchmany(self, size):
+        batch, self.rows = self.rows[:size], self.rows[size:]
+        return batch
+
+
+class FakeConnector(DBConnector):
+    def get_sampling_candidates(self, cursor):
+        return [("app", "notes", 5000000, "body"), ("app", "notes", 5000000, "misc1"), ("app", "tags", 10, "label")]
+
+    def sample_query(self, schema, table, columns, limit, percent=None):
+        sample = f" SAMPLE ({percent})" if percent else ""
+        return f"SELECT {', '.join(columns)} FROM {table}{sample} LIMIT {limit}"
+
+
+class TestSampling(unittest.TestCase):
+    def test_detectors(self):
+        self.assertEqual(detect("SSN 123-45-6789 on file"), ["ssn"])
+        self.assertEqual(detect("mail jane@example.org"), ["email address"])
+        self.assertEqual(detect("card 4111 1111 1111 1111"), ["payment information"])
+        self.assertEqual(detect("order 1234567890123"), [])
+
+    def test_largest_tables_first_with_sampling(self):
+        cursor = FakeCursor({
+            "notes": [("call back re 123-45-6789", "x")] * 50,
+            "tags": [("vip",)] * 10,
+        })
+        findings = sample_for_sensitive_data(FakeConnector(), cursor)
+        self.assertIn("FROM notes SAMPLE", cursor.queries[0])
+        self.assertNotIn("SAMPLE", cursor.queries[1])
+        self.assertEqual(findings, [Finding("app", "notes", "body", "ssn", 50)])
+
+    def test_budget_is_respected(self):
+        cursor = FakeCursor({"notes": [("x" * 100, "y")] * 1000, "tags": [("vip",)] * 10})
+        budget = SamplingBudget(max_rows=1000, max_bytes=1000, batch_size=5)
+        sample_for_sensitive_data(FakeConnector(), cursor, budget)
+        self.assertEqual(budget.rows, 10)
+        self.assertEqual(len(cursor.queries), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+import os
+import tempfile
+import unittest
+from src.connectors import connector_factory, fleet
+from src.connectors.check_runner import run_checks
+from src.connectors.connection_pool import close_pools
+from src.connectors.db_connector import DBConnector
+from src.connectors.findings import Finding, Grant
+from src.connectors.snapshot import Snapshot, SnapshotConnector, capture
+
+
+class CatalogConnector(DBConnector):
+    dialect = "fake"
+    columns = [("public", "patients", "ssn"), ("public", "patients", "name"), ("public", "visits", "patientId"),
+               ("billing", "cards", "card_number")]
+    grants = [Grant("PUBLIC", "SELECT", "public", "patients"), Grant("PUBLIC", "SELECT", "public", "visits")]
+
+    def get_columns(self, cursor, tables=None, stream=False):
+        return iter(self.columns)
+
+    def check_access_controls(self, cursor, stream=False):
+        return iter(self.grants)
+
+    def get_table_versions(self, cursor):
+        return [("public", "patients", "7"), ("public", "visits", "3")]
+
+    def probe_configuration(self, cursor):
+        return {"log_statement": "all", "ssl": False, "monitoring": 1}
+
+    def audit_trail_enabled(self, config):
+        return config["log_statement"] == "all"
+
+    def encryption_enabled(self, config):
+        return config["ssl"]
+
+    def activity_monitoring_enabled(self, config):
+        return bool(config["monitoring"])
+
+
+class StrictConnector(CatalogConnector):
+    # Re-evaluates the captured configuration under a stricter rule
+    def audit_trail_enabled(self, config):
+        return False
+
+
+class TestSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "target.hsnap")
+        capture(CatalogConnector(), None, self.path, "target", "Catalog")
+
+    def tearDown(self):
+        self.directory.cleanup()
+        connector_factory._registry.pop("Catalog", None)
+        close_pools()
+
+    def run_snapshot(self):
+        db = SnapshotConnector()
+        conn = db.connect(None, None, self.path, None, None)
+        try:
+            return run_checks(db, connections=[conn], max_workers=1)
+        finally:
+            conn.close()
+
+    def test_strings_are_stored_once(self):
+        snapshot = Snapshot(self.path)
+        try:
+            self.assertEqual(list(snapshot.columns()), CatalogConnector.columns)
+            self.assertEqual(list(snapshot.columns(["visits"])), [("public", "visits", "patientId")])
+            self.assertEqual(list(snapshot.grants()), CatalogConnector.grants)
+            self.assertEqual(snapshot.meta["dialect"], "fake")
+            # public, patients, ssn, name, visits, patientId, billing, cards, card_number, PUBLIC, SELECT, 7, 3
+            self.assertEqual(snapshot.count("strings"), 13)
+        finally:
+            snapshot.close()
+
+    def test_checks_run_against_the_snapshot(self):
+        results = self.run_snapshot()
+        self.assertEqual(results["scan_for_sensitive_data"].value, [
+            Finding("public", "patients", "ssn", "ssn"), Finding("public", "visits", "patientId", "patient"),
+            Finding("billing", "cards", "card_number", "payment information")])
+        self.assertEqual(len(results["check_access_controls"].value), 2)
+        self.assertEqual(results["check_audit_trail"].status, "passed")
+        self.assertEqual(results["check_encryption"].status, "failed")
+        self.assertEqual(results["check_activity_monitoring"].status, "passed")
+
+    def test_configuration_is_reevaluated_by_the_source_connector(self):
+        connector_factory.register_database("Catalog", StrictConnector)
+        self.assertEqual(self.run_snapshot()["check_audit_trail"].status, "failed")
+
+    def test_replaced_snapshot_is_not_reused(self):
+        db = SnapshotConnector()
+        conn = db.connect(None, None, self.path, None, None)
+        self.assertTrue(db.is_alive(conn))
+        capture(CatalogConnector(), None, self.path, "target", "Catalog")
+        self.assertFalse(db.is_alive(conn))
+        conn.close()
+
+    def test_fleet_scans_snapshot_targets(self):
+        target = {"name": "offline", "type": "Snapshot", "host": None, "port": None, "database": self.path}
+        report = fleet.scan_any(target, timeout=5)
+        self.assertEqual(report["checks"]["check_access_controls"]["status"], "failed")
+        self.assertEqual(len(report["checks"]["scan_for_sensitive_data"]["value"]), 3)
+
+    def test_other_files_are_rejected(self):
+        path = os.path.join(self.directory.name, "other.db")
+        with open(path, "wb") as f:
+            f.write(b"\0" * 64)
+        with self.assertRaises(RuntimeError):
+            Snapshot(path)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -81,7 +81,7 @@ class TestMsSqlServerConnector(unittest.TestCase):
             activity_monitoring_status = self.sql_server_connector.check_activity_monitoring(
                 cursor)
         # Expecting a boolean value
-        self.assertFalse(isinstance(activity_monitoring_status, bool))
+        self.assertTrue(isinstance(activity_monitoring_status, bool))
 
 
 if __name__ == "__main__":
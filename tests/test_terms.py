@@ -0,0 +1,101 @@
+import json
+import os
+import tempfile
+import unittest
+from src.connectors.db_connector import DBConnector
+from src.connectors.findings import Finding
+from src.connectors.terms import DEFAULT_DICTIONARY, TermDictionary, snake_name
+
+
+class CatalogConnector(DBConnector):
+    dialect = "fake"
+
+    def __init__(self, columns):
+        self.columns = columns
+        self.pulls = []
+
+    def get_columns(self, cursor, tables=None, stream=False):
+        self.pulls.append((tables, stream))
+        return iter([column for column in self.columns if tables is None or column[1] in tables])
+
+
+class TestTermMatcher(unittest.TestCase):
+    def setUp(self):
+        self.matcher = DEFAULT_DICTIONARY.compile()
+
+    def test_names_are_tokenized(self):
+        self.assertEqual(snake_name("patientId"), "_patient_id_")
+        self.assertEqual(snake_name("DOB_DT"), "_dob_dt_")
+        self.assertEqual(snake_name("PatientSSNs"), "_patient_ssns_")
+
+    def test_naming_styles_match_the_same_term(self):
+        for name in ("patientId", "PATIENT_ID", "outpatient_visits"):
+            self.assertEqual(self.matcher.match(name), "patient")
+        for name in ("date_of_birth", "DOB_DT", "dateOfBirth", "birthDt"):
+            self.assertEqual(self.matcher.match(name), "dob")
+        self.assertEqual(self.matcher.match("pt_ssn"), "patient, ssn")
+        self.assertEqual(self.matcher.match("MedicalConditionCode"), "medical condition")
+
+    def test_short_terms_only_match_whole_words(self):
+        self.assertIsNone(self.matcher.match("adobe_id"))
+        self.assertEqual(self.matcher.match("ssns"), "ssn")
+        for name in ("created_at", "name", "status", "description"):
+            self.assertIsNone(self.matcher.match(name))
+
+    def test_longer_phrases_hide_the_terms_inside_them(self):
+        self.assertEqual(self.matcher.match("email_address"), "email address")
+        for name in ("ip_address", "ipAddress", "MAC_ADDR", "server_address"):
+            self.assertIsNone(self.matcher.match(name))
+        self.assertEqual(self.matcher.match("patient_ip_address"), "patient")
+        self.assertEqual(self.matcher.match("home_address"), "address")
+        self.assertEqual(self.matcher.match("patientaddress"), "address, patient")
+
+    def test_batches_match_like_single_names(self):
+        names = ["patientId", "PATIENT_ID", "DOB_DT", "birthDt2", "HTTPServer2X", "Ärzt_Name", "pt\nssn", "a__b",
+                 "zip5", "PatientSSNs", "email_address", "created_at", "123", ""]
+        self.assertEqual(self.matcher.classify(names),
+                         {name: self.matcher.match(name) for name in names if self.matcher.match(name)})
+        self.assertEqual(snake_name("HTTPServer2X"), "_http_server_2_x_")
+        self.assertEqual(snake_name("Ärzt_Name"), "_rzt_name_")
+        self.assertEqual(self.matcher.classify(["pt\nssn"]), {"pt\nssn": "patient, ssn"})
+
+    def test_dialect_additions_and_exclusions(self):
+        dictionary = TermDictionary(["patient"], {"pt": "patient"}, dialects={
+            "oracle": {"abbreviations": {"mbr": "member"}, "exclude": [r"^_pt_ref_$"]}})
+        self.assertEqual(dictionary.compile("oracle").match("MBR_NO"), "member")
+        self.assertIsNone(dictionary.compile("oracle").match("PT_REF"))
+        self.assertEqual(dictionary.compile().match("PT_REF"), "patient")
+        self.assertIsNone(dictionary.compile().match("MBR_NO"))
+        self.assertIs(dictionary.compile("oracle"), dictionary.compile("oracle"))
+        self.assertNotEqual(dictionary.compile("oracle").digest, dictionary.compile().digest)
+
+    def test_dictionary_is_loaded_from_json(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "terms.json")
+            with open(path, "w") as f:
+                json.dump({"terms": ["diagnosis"], "patterns": {"dob": [r"_bd_"]}, "ignore": ["diagnosis code"]}, f)
+            matcher = TermDictionary.load(path).compile()
+        self.assertEqual(matcher.match("primaryDiagnosis"), "diagnosis")
+        self.assertEqual(matcher.match("bd"), "dob")
+        self.assertIsNone(matcher.match("ssn"))
+        self.assertIsNone(matcher.match("diagnosis_code"))
+
+
+class TestClientSideScan(unittest.TestCase):
+    def test_one_catalog_pull_is_classified(self):
+        db = CatalogConnector([("public", "patients", "ssn"), ("public", "patients", "name"),
+                               ("billing", "cards", "cardNumber")])
+        findings = db.scan_for_sensitive_data(None)
+        self.assertEqual(findings, [Finding("public", "patients", "ssn", "ssn"),
+                                    Finding("billing", "cards", "cardNumber", "payment information")])
+        self.assertEqual(db.pulls, [(None, True)])
+
+    def test_streaming_and_table_filter(self):
+        db = CatalogConnector([("public", "patients", "ssn"), ("public", "visits", "patient_id")])
+        findings = db.scan_for_sensitive_data(None, tables=["visits"], stream=True)
+        self.assertNotIsInstance(findings, list)
+        self.assertEqual(list(findings), [Finding("public", "visits", "patient_id", "patient")])
+
+
+if __name__ == "__main__":
+    unittest.main()
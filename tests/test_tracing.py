@@ -0,0 +1,74 @@
+import json
+import os
+import tempfile
+import unittest
+import urllib.request
+from src.connectors.tracing import Tracer, serve_metrics
+
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = rows
+        self.arraysize = 1
+
+    def execute(self, statement):
+        if "missing" in statement:
+            raise RuntimeError("relation does not exist")
+
+    def fetchall(self):
+        return self.rows
+
+    def fetchmany(self, size):
+        batch, self.rows = self.rows[:size], self.rows[size:]
+        return batch
+
+
+class TestTracing(unittest.TestCase):
+    def test_queries_are_recorded_per_check(self):
+        tracer = Tracer()
+        cursor = tracer.wrap(FakeCursor([("patients", "ssn")] * 3), "db1", "scan_for_sensitive_data")
+        cursor.execute("SELECT table_name, column_name\n   FROM information_schema.columns")
+        cursor.fetchmany(2)
+        cursor.fetchmany(2)
+        cursor.arraysize = 100
+        tracer.end_span("db1", "scan_for_sensitive_data", 0, 0.5)
+
+        [row] = tracer.breakdown()
+        self.assertEqual(row["queries"], 1)
+        self.assertEqual(row["round_trips"], 3)
+        self.assertEqual(row["rows"], 3)
+        self.assertEqual(row["bytes"], 3 * len("patientsssn"))
+        self.assertEqual(row["check_seconds"], 0.5)
+        self.assertEqual(tracer.records[0].statement,
+                         "SELECT table_name, column_name FROM information_schema.columns")
+
+    def test_errors_and_exports(self):
+        tracer = Tracer()
+        cursor = tracer.wrap(FakeCursor([]), 'db "2"', "check_audit_trail")
+        with self.assertRaises(RuntimeError):
+            cursor.execute("SELECT * FROM missing")
+        metrics = tracer.to_prometheus()
+        self.assertIn('hipaa_query_errors_total{target="db \\"2\\"",check="check_audit_trail"} 1', metrics)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "trace.json")
+            tracer.write_json(path)
+            with open(path) as f:
+                events = json.load(f)["traceEvents"]
+        self.assertEqual(events[0]["args"]["error"], "relation does not exist")
+
+
+    def test_metrics_are_served_on_loopback_by_default(self):
+        server = serve_metrics(Tracer(), 0)
+        try:
+            host, port = server.server_address
+            self.assertEqual(host, "127.0.0.1")
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5) as response:
+                self.assertEqual(response.status, 200)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+if __name__ == "__main__":
+    unittest.main()